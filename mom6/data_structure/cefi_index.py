@@ -0,0 +1,335 @@
+"""
+Metadata index of the local CEFI data structure
+(cefi_portal/ and cefi_derivative/)
+
+The indexer walks the local tree once and stores the
+header information of every netcdf file (dimensions,
+variables, cefi global attributes, time coverage, size)
+in an embedded SQLite database. Later updates only read
+the headers of new or modified files (size/mtime changed)
+and the query API replaces the os.walk/glob/open scans.
+
+usage:
+    python cefi_index.py /Projects/CEFI/regional_mom6/ [database path]
+"""
+import os
+import sys
+import json
+import sqlite3
+from typing import Optional, List, Dict
+from mom6.data_structure import portal_data
+from mom6.mom6_module.mom6_cache import default_cache_dir, hash_key
+from mom6.mom6_module.util import lazy_import
+
+netCDF4 = lazy_import('netCDF4')
+
+# columns storing the directory levels of the data structure
+LEVEL_COLUMNS = portal_data.DataStructureAttrOrder.dir_order
+
+_SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    {', '.join(f'{level} TEXT' for level in LEVEL_COLUMNS)},
+    variable TEXT,
+    filename TEXT,
+    size INTEGER,
+    mtime REAL,
+    start_date TEXT,
+    end_date TEXT,
+    dims TEXT,
+    variables TEXT,
+    attrs TEXT
+);
+CREATE INDEX IF NOT EXISTS files_lookup ON files (
+    {', '.join(LEVEL_COLUMNS[1:])}, variable
+);
+"""
+
+
+def default_index_path(local_top_dir:str) -> str:
+    """database file of the local tree under the default cache directory"""
+    key = hash_key(os.path.abspath(local_top_dir))[:16]
+    return os.path.join(default_cache_dir(), f'cefi_index_{key}.sqlite')
+
+
+def read_header(file_path:str) -> dict:
+    """read the header information of a netcdf file
+    (no data except the first and last time value)
+
+    Parameters
+    ----------
+    file_path : str
+        absolute path to the netcdf file
+
+    Returns
+    -------
+    dict
+        'dims' (dim name to size), 'variables' (variable name to dims),
+        'attrs' (cefi global attributes) and the 'start_date'/'end_date'
+        of the time coordinate when available
+    """
+    header = {'start_date': None, 'end_date': None}
+    with netCDF4.Dataset(file_path) as nc:
+        header['dims'] = {name: len(dim) for name, dim in nc.dimensions.items()}
+        header['variables'] = {
+            name: list(var.dimensions) for name, var in nc.variables.items()
+        }
+        header['attrs'] = {
+            name: str(nc.getncattr(name))
+            for name in nc.ncattrs() if name.startswith('cefi_')
+        }
+        if 'time' in nc.variables and len(nc.variables['time']) > 0:
+            time_var = nc.variables['time']
+            try:
+                dates = netCDF4.num2date(
+                    time_var[[0, -1]],
+                    time_var.units,
+                    getattr(time_var, 'calendar', 'standard')
+                )
+                header['start_date'] = dates[0].isoformat()
+                header['end_date'] = dates[-1].isoformat()
+            except (AttributeError, ValueError):
+                pass
+    return header
+
+
+class CefiIndex:
+    """
+    SQLite index of the netcdf files in the local CEFI data structure
+
+    Parameters
+    ----------
+    local_top_dir : str
+        the absolution path to the local CEFI data.
+        should be the absolute path before cefi_portal/...
+    db_path : str, optional
+        SQLite database file, by default a file under the
+        default cache directory unique to `local_top_dir`
+
+    Examples
+    --------
+    index = CefiIndex('/Projects/CEFI/regional_mom6/')
+    index.update()
+    files = index.files(variable='tos', region='northwest_atlantic', release='r20230520')
+    """
+    def __init__(self, local_top_dir:str, db_path:Optional[str] = None) -> None:
+        self.local_top_dir = os.path.abspath(local_top_dir)
+        if db_path is None:
+            db_path = default_index_path(self.local_top_dir)
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self.db_path = db_path
+        self.conn = sqlite3.connect(db_path)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.executescript(_SCHEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        """close the database connection"""
+        self.conn.close()
+
+    def update(
+        self,
+        top_directories : Optional[List[str]] = None,
+        verbose : bool = False
+    ) -> Dict[str, int]:
+        """scan the local tree and update the index incrementally
+
+        Only the files that are new or have a different size/mtime
+        are opened. Files removed from the tree are removed from the index.
+
+        Parameters
+        ----------
+        top_directories : List[str], optional
+            top directories to scan, by default cefi_portal and cefi_derivative
+        verbose : bool, optional
+            print each indexed file, by default False
+
+        Returns
+        -------
+        Dict[str, int]
+            number of 'added', 'updated', 'removed' and 'unchanged' files
+        """
+        if top_directories is None:
+            top_directories = [
+                portal_data.DataStructure.top_directory[0],
+                portal_data.DataStructure.top_directory_derivative[0]
+            ]
+
+        stats = {'added': 0, 'updated': 0, 'removed': 0, 'unchanged': 0}
+        for top_directory in top_directories:
+            existing = {
+                row['path']: (row['size'], row['mtime'])
+                for row in self.conn.execute(
+                    'SELECT path, size, mtime FROM files WHERE top_directory = ?',
+                    (top_directory,)
+                )
+            }
+            seen = set()
+            top_path = os.path.join(self.local_top_dir, top_directory)
+            for dirpath, _, filenames in os.walk(top_path):
+                for filename in filenames:
+                    if not filename.endswith('.nc'):
+                        continue
+                    file_path = os.path.join(dirpath, filename)
+                    rel_path = os.path.relpath(file_path, self.local_top_dir)
+                    seen.add(rel_path)
+                    try:
+                        file_stat = os.stat(file_path)
+                    except OSError:
+                        continue
+                    if existing.get(rel_path) == (file_stat.st_size, file_stat.st_mtime):
+                        stats['unchanged'] += 1
+                        continue
+                    try:
+                        self._upsert(rel_path, file_stat)
+                    except OSError as e:
+                        print(f'Skipping unreadable file {file_path}: {e}')
+                        continue
+                    stats['updated' if rel_path in existing else 'added'] += 1
+                    if verbose:
+                        print(f'indexed {rel_path}')
+
+            removed = [path for path in existing if path not in seen]
+            self.conn.executemany(
+                'DELETE FROM files WHERE path = ?', [(path,) for path in removed]
+            )
+            stats['removed'] += len(removed)
+            self.conn.commit()
+
+        return stats
+
+    def _upsert(self, rel_path:str, file_stat:os.stat_result):
+        """read the header and insert/replace the record"""
+        header = read_header(os.path.join(self.local_top_dir, rel_path))
+
+        path_seg = rel_path.split(os.sep)
+        levels = dict(zip(LEVEL_COLUMNS, path_seg[:-1]))
+        filename = path_seg[-1]
+
+        # filename period is preferred over the time coordinate
+        start_date, end_date = header['start_date'], header['end_date']
+        record = portal_data.parse_filename(filename)
+        if record is not None:
+            period_start, period_end = record.time_period
+            start_date = str(period_start)
+            end_date = str(period_end)
+
+        columns = ['path', *LEVEL_COLUMNS, 'variable', 'filename', 'size', 'mtime',
+                   'start_date', 'end_date', 'dims', 'variables', 'attrs']
+        values = [
+            rel_path,
+            *[levels.get(level) for level in LEVEL_COLUMNS],
+            filename.split('.')[0],
+            filename,
+            file_stat.st_size,
+            file_stat.st_mtime,
+            start_date,
+            end_date,
+            json.dumps(header['dims']),
+            json.dumps(header['variables']),
+            json.dumps(header['attrs'])
+        ]
+        self.conn.execute(
+            f"INSERT OR REPLACE INTO files ({', '.join(columns)}) "+
+            f"VALUES ({', '.join('?'*len(columns))})",
+            values
+        )
+
+    @staticmethod
+    def _where(filters:dict, start=None, end=None) -> tuple:
+        """sql where clause from the column filters and the time period"""
+        clauses = []
+        params = []
+        for column, value in filters.items():
+            if value is None:
+                continue
+            if column not in (*LEVEL_COLUMNS, 'variable', 'filename'):
+                raise ValueError(f'Invalid filter: {column}')
+            clauses.append(f'{column} = ?')
+            params.append(value)
+        # time period overlap (files without time information are kept)
+        # the filename end date is exclusive as in `filter_files_by_time`
+        # and the dates are normalized to 'YYYY-MM-DD' before comparing
+        if start is not None:
+            clauses.append('(end_date IS NULL OR end_date > ?)')
+            params.append(str(portal_data.to_datetime64(start)))
+        if end is not None:
+            clauses.append('(start_date IS NULL OR start_date <= ?)')
+            params.append(str(portal_data.to_datetime64(end)))
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ''
+        return where, params
+
+    def query(self, start=None, end=None, **filters) -> List[dict]:
+        """query the indexed files
+
+        Parameters
+        ----------
+        start : str, optional
+            only files covering time after start ex: '1993-01-01', by default None
+        end : str, optional
+            only files covering time before end ex: '1997-12-31', by default None
+            (forecast files are selected by the initialization date)
+        **filters : str, optional
+            column filters ex: variable='tos', region='northwest_atlantic',
+            release='r20230520' (any level of the data structure,
+            'variable' or 'filename')
+
+        Returns
+        -------
+        List[dict]
+            one record per file with the header information decoded
+        """
+        where, params = self._where(filters, start, end)
+        records = []
+        for row in self.conn.execute(f'SELECT * FROM files{where} ORDER BY path', params):
+            record = dict(row)
+            for column in ['dims', 'variables', 'attrs']:
+                record[column] = json.loads(record[column])
+            record['abs_path'] = os.path.join(self.local_top_dir, record['path'])
+            records.append(record)
+        return records
+
+    def files(self, start=None, end=None, **filters) -> List[str]:
+        """absolute path of the indexed files matching the filters
+        (see `query`)"""
+        where, params = self._where(filters, start, end)
+        return [
+            os.path.join(self.local_top_dir, row['path'])
+            for row in self.conn.execute(f'SELECT path FROM files{where} ORDER BY path', params)
+        ]
+
+    def distinct(self, column:str, **filters) -> List[str]:
+        """available values of a column ex: distinct('variable', region='northwest_atlantic')
+
+        Parameters
+        ----------
+        column : str
+            any level of the data structure or 'variable'
+
+        Returns
+        -------
+        List[str]
+            sorted unique values
+        """
+        if column not in (*LEVEL_COLUMNS, 'variable'):
+            raise ValueError(f'Invalid column: {column}')
+        where, params = self._where(filters)
+        return [
+            row[0] for row in self.conn.execute(
+                f'SELECT DISTINCT {column} FROM files{where} ORDER BY {column}', params
+            )
+        ]
+
+
+if __name__=="__main__":
+    if len(sys.argv) < 2:
+        sys.exit('Usage: python cefi_index.py <local_top_dir> [database path]')
+
+    with CefiIndex(sys.argv[1], db_path=sys.argv[2] if len(sys.argv) > 2 else None) as cefi_index:
+        update_stats = cefi_index.update(verbose=True)
+        print(f'Index updated at {cefi_index.db_path}: {update_stats}')
@@ -1,7 +1,9 @@
 import re
 import os
 from dataclasses import dataclass
-from typing import Tuple
+from typing import Tuple, Optional, Union
+import numpy as np
+import pandas as pd
 
 
 @dataclass(frozen=True)
@@ -134,6 +136,50 @@ class FileChunking:
     lead: int = 12
     member: int = 10
 
+    def dim_chunk(self, dim:str) -> int:
+        """chunk size of a dimension based on the dimension name"""
+        if 'z' in dim :
+            return self.vertical
+        elif 'time' in dim:
+            return self.time
+        elif 'lead' in dim:
+            return self.lead
+        elif 'member' in dim:
+            return self.member
+        elif 'init' in dim:
+            return self.init
+        return self.horizontal
+
+    def dim_chunks(self, dims, stored_chunks:dict=None) -> dict:
+        """chunk size of each dimension
+
+        Parameters
+        ----------
+        dims : Iterable[str]
+            dimension names
+        stored_chunks : dict, optional
+            chunk size of each dimension in the existing file.
+            The chunk size is rounded to a multiple of the stored
+            chunk size so one dask chunk never splits a stored chunk,
+            by default None
+
+        Returns
+        -------
+        dict
+            dimension name to chunk size
+        """
+        if stored_chunks is None:
+            stored_chunks = {}
+        chunks = {}
+        for dim in dims:
+            if isinstance(dim, str):
+                chunk = self.dim_chunk(dim)
+                stored = stored_chunks.get(dim)
+                if stored:
+                    chunk = max(stored, (chunk//stored)*stored)
+                chunks[dim] = chunk
+        return chunks
+
 @dataclass(frozen=True)
 class GlobalAttrs:
     """ global attribute to be in all cefi files"""
@@ -205,6 +251,36 @@ def validate_release(release_date:str):
     if not re.match(r"^r\d{8}$", release_date):
         raise ValueError("release_date must be in the format 'rYYYYMMDD', e.g., 'r20160902'")
 
+def date_range_period(date_range:str) -> Tuple[np.datetime64, np.datetime64]:
+    """time period covered by the 'YYYYMM-YYYYMM' date range
+
+    Parameters
+    ----------
+    date_range : str
+        date range in the filename ex: '199301-200304'
+
+    Returns
+    -------
+    Tuple[np.datetime64, np.datetime64]
+        first day of the start month and first day after
+        the end month (exclusive)
+    """
+    start, end = date_range.split('-')
+    start_month = np.datetime64(f'{start[:4]}-{start[4:]}', 'M')
+    end_month = np.datetime64(f'{end[:4]}-{end[4:]}', 'M')
+    return start_month.astype('datetime64[D]'), (end_month+1).astype('datetime64[D]')
+
+def initial_date_month(initial_date:str) -> np.datetime64:
+    """month of the 'iYYYYMM' initial date"""
+    return np.datetime64(f'{initial_date[1:5]}-{initial_date[5:7]}', 'M')
+
+def to_datetime64(date, unit:str = 'D') -> np.datetime64:
+    """convert the date input (str, datetime, np.datetime64 or
+    the 'iYYYYMM' initial date) to np.datetime64"""
+    if isinstance(date, str) and re.match(r"^i\d{6}$", date):
+        return initial_date_month(date).astype(f'datetime64[{unit}]')
+    return np.datetime64(pd.Timestamp(date).to_datetime64(), unit)
+
 @dataclass
 class DataPath:
     """constructing cefi file path
@@ -329,6 +405,11 @@ class HindcastFilename:
             f"{self.date_range}.nc"
         )
 
+    @property
+    def time_period(self) -> Tuple[np.datetime64, np.datetime64]:
+        """time period [start, end) covered by the file"""
+        return date_range_period(self.date_range)
+
 @dataclass
 class SeasonalForecastFilename:
     """constructing cefi filename for forecast and reforecast
@@ -384,6 +465,17 @@ class SeasonalForecastFilename:
             f"{self.ensemble_info}."+
             f"{self.initial_date}.nc"
         )
+
+    @property
+    def time_period(self) -> Tuple[np.datetime64, np.datetime64]:
+        """time period [init month, next month) of the initialization
+
+        The period is the initialization month only (not the
+        forecast leads) so the time filters select forecasts
+        by the initialization date.
+        """
+        init_month = initial_date_month(self.initial_date)
+        return init_month.astype('datetime64[D]'), (init_month+1).astype('datetime64[D]')
     
 @dataclass
 class DecadalForecastFilename:
@@ -441,6 +533,17 @@ class DecadalForecastFilename:
             f"{self.initial_date}.nc"
         )
 
+    @property
+    def time_period(self) -> Tuple[np.datetime64, np.datetime64]:
+        """time period [init month, next month) of the initialization
+
+        The period is the initialization month only (not the
+        forecast leads) so the time filters select forecasts
+        by the initialization date.
+        """
+        init_month = initial_date_month(self.initial_date)
+        return init_month.astype('datetime64[D]'), (init_month+1).astype('datetime64[D]')
+
 @dataclass
 class ProjectionFilename:
     """constructing cefi filename for projection run
@@ -473,7 +576,7 @@ class ProjectionFilename:
             self.output_frequency, filename_structure.output_frequency, "output_frequency"
         )
         validate_attribute(
-            self.forcing, filename_structure.ensemble_info, "ensemble_info"
+            self.forcing, filename_structure.forcing_info, "forcing"
         )
         validate_release(self.release)
 
@@ -497,3 +600,84 @@ class ProjectionFilename:
             f"{self.ensemble_info}."+
             f"{self.date_range}.nc"
         )
+
+    @property
+    def time_period(self) -> Tuple[np.datetime64, np.datetime64]:
+        """time period [start, end) covered by the file"""
+        return date_range_period(self.date_range)
+
+
+def parse_filename(
+    filename : str
+) -> Optional[Union[
+    HindcastFilename,
+    SeasonalForecastFilename,
+    DecadalForecastFilename,
+    ProjectionFilename
+]]:
+    """parse the cefi filename (netcdf or kerchunk json) to the
+    structured filename record
+
+    Parameters
+    ----------
+    filename : str
+        cefi filename or path/url to the file
+        ex: 'tos.nwa.full.hcast.monthly.raw.r20230520.199301-201912.nc'
+
+    Returns
+    -------
+    HindcastFilename, SeasonalForecastFilename, DecadalForecastFilename,
+    ProjectionFilename or None
+        None when the filename does not follow the cefi naming
+        (ex: ocean_static.nc or a combined kerchunk reference)
+    """
+    filename_seg = os.path.basename(filename).split('.')
+    if filename_seg[-1] not in ('nc', 'json'):
+        return None
+    filename_seg = filename_seg[:-1]
+    if len(filename_seg) < 4:
+        return None
+
+    experiment_type = filename_seg[3]
+    try:
+        if experiment_type == 'hcast' and len(filename_seg) == 8:
+            return HindcastFilename(
+                variable=filename_seg[0],
+                region=filename_seg[1],
+                subdomain=filename_seg[2],
+                output_frequency=filename_seg[4],
+                grid_type=filename_seg[5],
+                release=filename_seg[6],
+                date_range=filename_seg[7]
+            )
+        if experiment_type in ('ss_fcast', 'ss_refcast', 'dc_fcast') and len(filename_seg) == 9:
+            forecast_filename = (
+                DecadalForecastFilename if experiment_type == 'dc_fcast'
+                else SeasonalForecastFilename
+            )
+            return forecast_filename(
+                variable=filename_seg[0],
+                region=filename_seg[1],
+                subdomain=filename_seg[2],
+                experiment_type=experiment_type,
+                output_frequency=filename_seg[4],
+                grid_type=filename_seg[5],
+                release=filename_seg[6],
+                ensemble_info=filename_seg[7],
+                initial_date=filename_seg[8]
+            )
+        if experiment_type == 'ltm_proj' and len(filename_seg) == 10:
+            return ProjectionFilename(
+                variable=filename_seg[0],
+                region=filename_seg[1],
+                subdomain=filename_seg[2],
+                output_frequency=filename_seg[4],
+                grid_type=filename_seg[5],
+                release=filename_seg[6],
+                forcing=filename_seg[7],
+                ensemble_info=filename_seg[8],
+                date_range=filename_seg[9]
+            )
+    except ValueError:
+        return None
+    return None
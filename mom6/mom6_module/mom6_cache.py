@@ -0,0 +1,690 @@
+#!/usr/bin/env python
+"""
+The module provides the on-disk caches shared
+by the CEFI regional mom6 data access and
+processing modules.
+
+- CatalogCache : file listing of the remote storages
+- BlockCache : byte blocks of the remote files read through
+  the kerchunk references (GCS/S3, see `mom6_kerchunk.BlockCacheFileSystem`)
+- DerivedCache : derived arrays (climatology, quantile threshold,
+  detrend coefficients) keyed by the input data identity and
+  the calculation parameters
+
+The caches are stored under the directory given by
+the environment variable `MOM6_CACHE_DIR` or, when it
+is not set, under `~/.cache/mom6`.
+"""
+import os
+import json
+import time
+import hashlib
+from typing import Optional, List, Union
+import numpy as np
+import xarray as xr
+from mom6.mom6_module.util import sha256sum
+
+
+def default_cache_dir() -> str:
+    """find the top cache directory
+
+    Returns
+    -------
+    str
+        `MOM6_CACHE_DIR` if the environment variable is set,
+        otherwise `$XDG_CACHE_HOME/mom6` (`~/.cache/mom6`)
+    """
+    cache_dir = os.environ.get('MOM6_CACHE_DIR')
+    if cache_dir is None:
+        xdg_cache = os.environ.get(
+            'XDG_CACHE_HOME',
+            os.path.join(os.path.expanduser('~'), '.cache')
+        )
+        cache_dir = os.path.join(xdg_cache, 'mom6')
+    return cache_dir
+
+
+def hash_key(*parts) -> str:
+    """create a stable hex digest from the key parts
+
+    Returns
+    -------
+    str
+        sha256 hex digest of the joined key parts
+    """
+    key = '\x1f'.join(str(part) for part in parts)
+    return hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+
+def atomic_write_json(file_path:str, content:dict):
+    """write json file through a temporary file and an atomic move
+    so other processes never read a partially written file
+
+    Parameters
+    ----------
+    file_path : str
+        output json file
+    content : dict
+        json serializable dictionary
+    """
+    tmp_file = f'{file_path}.{os.getpid()}.tmp'
+    with open(tmp_file, 'w', encoding='utf-8') as f:
+        json.dump(content, f)
+    os.replace(tmp_file, file_path)
+
+
+def _file_mtime(file_path:str) -> float:
+    try:
+        return os.path.getmtime(file_path)
+    except OSError:
+        return 0.
+
+
+def _file_size(file_path:str) -> int:
+    try:
+        return os.path.getsize(file_path)
+    except OSError:
+        return 0
+
+
+def _remove_file(file_path:str):
+    try:
+        os.remove(file_path)
+    except OSError:
+        pass
+
+
+class CatalogCache:
+    """
+    Persistent cache of the file listing of each CEFI
+    data directory on the remote storages
+
+    Each entry is keyed by the store type ('opendap', 'gcs', 's3')
+    and the `portal_data.DataPath.cefi_dir` and saved as a single
+    json file so the listing is shared between processes.
+    Entries older than `ttl` are ignored and the least recently
+    used entries are evicted when more than `max_entries` exist.
+
+    Parameters
+    ----------
+    cache_dir : str, optional
+        top cache directory, by default `default_cache_dir()`
+    ttl : float, optional
+        time to live of an entry in seconds, by default 86400 (one day).
+        `ttl=0` disables the cache.
+    max_entries : int, optional
+        maximum number of directory listings kept on disk, by default 1000
+    """
+    def __init__(
+        self,
+        cache_dir : Optional[str] = None,
+        ttl : float = 86400.,
+        max_entries : int = 1000
+    ) -> None:
+        if cache_dir is None:
+            cache_dir = default_cache_dir()
+        self.cache_dir = os.path.join(cache_dir, 'catalog')
+        self.ttl = ttl
+        self.max_entries = max_entries
+
+    @property
+    def enabled(self) -> bool:
+        """cache is only used when ttl is positive"""
+        return self.ttl > 0
+
+    def _entry_file(self, store_type:str, cefi_dir:str) -> str:
+        """json file storing the listing of a single directory"""
+        return os.path.join(self.cache_dir, f'{hash_key(store_type, cefi_dir)}.json')
+
+    def _all_entry_files(self) -> List[str]:
+        """all json files in the cache directory"""
+        if not os.path.isdir(self.cache_dir):
+            return []
+        return [
+            os.path.join(self.cache_dir, file)
+            for file in os.listdir(self.cache_dir)
+            if file.endswith('.json')
+        ]
+
+    @staticmethod
+    def _read_entry(entry_file:str) -> Optional[dict]:
+        """read a single entry, broken or missing entry return None"""
+        try:
+            with open(entry_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return None
+
+    def get(self, store_type:str, cefi_dir:str) -> Optional[list]:
+        """get the cached listing
+
+        Parameters
+        ----------
+        store_type : str
+            'opendap', 'gcs' or 's3'
+        cefi_dir : str
+            the relative cefi data path from `portal_data.DataPath.cefi_dir`
+
+        Returns
+        -------
+        list or None
+            cached listing, None when the entry does not exist or expired
+        """
+        if not self.enabled:
+            return None
+
+        entry_file = self._entry_file(store_type, cefi_dir)
+        entry = self._read_entry(entry_file)
+        if entry is None:
+            return None
+
+        if time.time() - entry['created'] > self.ttl:
+            # expired entry
+            _remove_file(entry_file)
+            return None
+
+        # mark entry as recently used for the eviction
+        try:
+            os.utime(entry_file)
+        except OSError:
+            pass
+
+        return entry['listing']
+
+    def set(self, store_type:str, cefi_dir:str, listing:list):
+        """store the listing and evict old entries if needed
+
+        Parameters
+        ----------
+        store_type : str
+            'opendap', 'gcs' or 's3'
+        cefi_dir : str
+            the relative cefi data path from `portal_data.DataPath.cefi_dir`
+        listing : list
+            the file listing of the directory
+        """
+        if not self.enabled:
+            return
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        atomic_write_json(
+            self._entry_file(store_type, cefi_dir),
+            {
+                'store_type': store_type,
+                'cefi_dir': cefi_dir,
+                'created': time.time(),
+                'listing': list(listing)
+            }
+        )
+        self.evict()
+
+    def evict(self):
+        """remove the least recently used entries above `max_entries`"""
+        entry_files = self._all_entry_files()
+        if len(entry_files) <= self.max_entries:
+            return
+
+        entry_files.sort(key=_file_mtime)
+        for entry_file in entry_files[:len(entry_files)-self.max_entries]:
+            _remove_file(entry_file)
+
+    def invalidate(
+        self,
+        store_type : Optional[str] = None,
+        cefi_dir : Optional[str] = None
+    ) -> int:
+        """remove the cached listing matching the input,
+        no input clears the entire catalog cache
+
+        Parameters
+        ----------
+        store_type : str, optional
+            only remove entries of this store type, by default None
+        cefi_dir : str, optional
+            only remove entries of this cefi data path, by default None
+
+        Returns
+        -------
+        int
+            number of removed entries
+        """
+        nremoved = 0
+        for entry_file in self._all_entry_files():
+            entry = self._read_entry(entry_file)
+            if entry is not None:
+                if store_type is not None and entry['store_type'] != store_type:
+                    continue
+                if cefi_dir is not None and entry['cefi_dir'] != cefi_dir:
+                    continue
+            _remove_file(entry_file)
+            nremoved += 1
+        return nremoved
+
+    def clear(self) -> int:
+        """remove all cached listing"""
+        return self.invalidate()
+
+
+class BlockCache:
+    """
+    Size bounded on-disk cache of fixed size byte blocks of
+    remote files
+
+    Each block is stored as a single file with its sha256
+    checksum so a block damaged on disk (ex: interrupted write,
+    full disk) is detected, dropped and fetched again.
+    The least recently used blocks are evicted when the total
+    size is above `max_bytes`.
+
+    Parameters
+    ----------
+    cache_dir : str, optional
+        top cache directory, by default `default_cache_dir()`
+    max_bytes : int, optional
+        maximum total size of the cached blocks, by default 10 GB
+    block_size : int, optional
+        size of each block in bytes, by default 4 MB
+    verify : bool, optional
+        check the sha256 of the block on every read, by default True
+    """
+    def __init__(
+        self,
+        cache_dir : Optional[str] = None,
+        max_bytes : int = 10*2**30,
+        block_size : int = 4*2**20,
+        verify : bool = True
+    ) -> None:
+        if cache_dir is None:
+            cache_dir = default_cache_dir()
+        self.cache_dir = os.path.join(cache_dir, 'blocks')
+        self.max_bytes = max_bytes
+        self.block_size = block_size
+        self.verify = verify
+        # running total of the cached bytes (scanned on first use)
+        self._total_bytes = None
+
+    def _block_file(self, path:str, block:int) -> str:
+        key = hash_key(path, self.block_size, block)
+        return os.path.join(self.cache_dir, key[:2], f'{key}.blk')
+
+    def _all_block_files(self) -> List[str]:
+        block_files = []
+        if not os.path.isdir(self.cache_dir):
+            return block_files
+        for sub_dir in os.listdir(self.cache_dir):
+            sub_path = os.path.join(self.cache_dir, sub_dir)
+            if os.path.isdir(sub_path):
+                block_files.extend(
+                    os.path.join(sub_path, file)
+                    for file in os.listdir(sub_path)
+                    if file.endswith('.blk')
+                )
+        return block_files
+
+    @property
+    def total_bytes(self) -> int:
+        """total size of the cached blocks"""
+        if self._total_bytes is None:
+            self._total_bytes = sum(
+                _file_size(file) for file in self._all_block_files()
+            )
+        return self._total_bytes
+
+    def get(self, path:str, block:int) -> Optional[bytes]:
+        """get the cached block
+
+        Parameters
+        ----------
+        path : str
+            remote file url
+        block : int
+            block number (byte offset // block_size)
+
+        Returns
+        -------
+        bytes or None
+            block content, None when the block is not cached
+            or failed the integrity check
+        """
+        block_file = self._block_file(path, block)
+        try:
+            with open(f'{block_file}.sha256', 'r', encoding='utf-8') as f:
+                checksum = f.read().strip()
+            if self.verify and sha256sum(block_file) != checksum:
+                print(f'cached block of {path} is corrupted, fetching again')
+                self._remove_block(block_file)
+                return None
+            with open(block_file, 'rb') as f:
+                data = f.read()
+        except OSError:
+            return None
+
+        # mark block as recently used for the eviction
+        try:
+            os.utime(block_file)
+        except OSError:
+            pass
+        return data
+
+    def set(self, path:str, block:int, data:bytes):
+        """store the block and evict old blocks if needed
+
+        Parameters
+        ----------
+        path : str
+            remote file url
+        block : int
+            block number (byte offset // block_size)
+        data : bytes
+            block content
+        """
+        if len(data) > self.max_bytes:
+            return
+        block_file = self._block_file(path, block)
+        os.makedirs(os.path.dirname(block_file), exist_ok=True)
+        tmp_file = f'{block_file}.{os.getpid()}.tmp'
+        tmp_checksum = f'{block_file}.sha256.{os.getpid()}.tmp'
+        with open(tmp_file, 'wb') as f:
+            f.write(data)
+        with open(tmp_checksum, 'w', encoding='utf-8') as f:
+            f.write(hashlib.sha256(data).hexdigest())
+        total_bytes = self.total_bytes - _file_size(block_file)
+        # data first, a reader in between sees a checksum mismatch
+        # (refetched) and never a partial block or checksum
+        os.replace(tmp_file, block_file)
+        os.replace(tmp_checksum, f'{block_file}.sha256')
+        self._total_bytes = total_bytes + len(data)
+        if self._total_bytes > self.max_bytes:
+            self.evict()
+
+    def evict(self):
+        """remove the least recently used blocks above `max_bytes`"""
+        block_files = self._all_block_files()
+        block_files.sort(key=_file_mtime)
+        sizes = [_file_size(file) for file in block_files]
+        total = sum(sizes)
+        for block_file, size in zip(block_files, sizes):
+            if total <= self.max_bytes:
+                break
+            self._remove_block(block_file)
+            total -= size
+        self._total_bytes = total
+
+    def clear(self):
+        """remove all cached blocks"""
+        for block_file in self._all_block_files():
+            self._remove_block(block_file)
+        self._total_bytes = 0
+
+    def _remove_block(self, block_file:str):
+        if self._total_bytes is not None:
+            self._total_bytes = max(self._total_bytes - _file_size(block_file), 0)
+        _remove_file(block_file)
+        _remove_file(f'{block_file}.sha256')
+
+
+def file_identity(files:Optional[List[str]]) -> List[list]:
+    """identity of the input files used in the derived cache key
+
+    Parameters
+    ----------
+    files : List[str]
+        local file paths or remote urls
+
+    Returns
+    -------
+    List[list]
+        [path, size, mtime] of each local file,
+        [url] of each remote file (no stat available)
+    """
+    identity = []
+    for file in files or []:
+        file = str(file)
+        if os.path.exists(file):
+            stat = os.stat(file)
+            identity.append([os.path.abspath(file), stat.st_size, stat.st_mtime])
+        else:
+            identity.append([file])
+    return identity
+
+
+def source_files(ds:xr.Dataset) -> List[str]:
+    """files the dataset is opened from (`AccessFiles.open` keeps the
+    list in `ds.encoding['source_files']`, `xr.open_dataset` keeps the
+    single file in `ds.encoding['source']`)
+
+    Parameters
+    ----------
+    ds : xr.Dataset
+        opened dataset
+
+    Returns
+    -------
+    List[str]
+        source files, empty list when unknown
+    """
+    files = ds.encoding.get('source_files')
+    if files is None:
+        files = [ds.encoding['source']] if 'source' in ds.encoding else []
+    return list(files)
+
+
+def array_token(variable:xr.Variable) -> str:
+    """token of the array content without reading lazy data
+
+    The dask graph name is used for dask backed arrays (xarray
+    names the graph from the file path and mtime and dask names
+    every following operation from its inputs) and the sha256 of
+    the bytes for in-memory arrays.
+    """
+    if variable.chunks is not None:
+        return variable.data.name
+    values = np.asarray(variable.values)
+    if values.dtype.hasobject:
+        return hash_key(values.dtype, values.shape, values.tolist())
+    digest = hashlib.sha256(
+        np.ascontiguousarray(values).reshape(-1).view('uint8')
+    ).hexdigest()
+    return f'{values.dtype}-{values.shape}-{digest}'
+
+
+def dataarray_token(da_data:xr.DataArray) -> str:
+    """token of the data and coordinates of the dataarray"""
+    parts = [da_data.name, da_data.dims, array_token(da_data.variable)]
+    for name in sorted(da_data.coords, key=str):
+        coord = da_data.coords[name]
+        parts.append((name, coord.dims, array_token(coord.variable)))
+    return hash_key(*parts)
+
+
+class DerivedCache:
+    """
+    Size bounded on-disk cache of the derived arrays
+
+    Each entry is a netCDF file named by the hash of the kind of
+    derived array, the identity of the input files
+    (path, size, mtime), the token of the input data (see
+    `array_token`) and the calculation parameters (variable,
+    period, time frequency, ...). The same climatology or
+    threshold requested by another class or batch job is read
+    back instead of recalculated. The least recently used
+    entries are evicted when the total size is above `max_bytes`.
+
+    Parameters
+    ----------
+    cache_dir : str, optional
+        top cache directory, by default `default_cache_dir()`
+    max_bytes : int, optional
+        maximum total size of the cached arrays, by default 5 GB.
+        `max_bytes=0` disables the cache.
+
+    Examples
+    --------
+    key = cache.key('climatology', da_data, source_files(ds), tfreq='month')
+    da_climo = cache.get(key)
+    if da_climo is None:
+        da_climo = cache.set(key, da_data.groupby('time.month').mean())
+    """
+    # variable name of the stored dataarray
+    DATAARRAY_VARIABLE = '__xarray_dataarray_variable__'
+
+    def __init__(
+        self,
+        cache_dir : Optional[str] = None,
+        max_bytes : int = 5*2**30
+    ) -> None:
+        if cache_dir is None:
+            cache_dir = default_cache_dir()
+        self.cache_dir = os.path.join(cache_dir, 'derived')
+        self.max_bytes = max_bytes
+
+    @property
+    def enabled(self) -> bool:
+        """cache is only used when max_bytes is positive"""
+        return self.max_bytes > 0
+
+    def key(
+        self,
+        kind : str,
+        da_data : xr.DataArray,
+        files : Optional[List[str]] = None,
+        **params
+    ) -> str:
+        """create the cache key of a derived array
+
+        Parameters
+        ----------
+        kind : str
+            kind of derived array ex: 'forecast_climatology'
+        da_data : xr.DataArray
+            input data of the calculation (lazy data is not read)
+        files : List[str], optional
+            files the input data is read from, by default None
+        **params
+            calculation parameters
+
+        Returns
+        -------
+        str
+            sha256 hex digest
+        """
+        return hash_key(
+            kind,
+            dataarray_token(da_data),
+            file_identity(files),
+            sorted((name, str(value)) for name, value in params.items())
+        )
+
+    def _entry_file(self, key:str) -> str:
+        return os.path.join(self.cache_dir, f'{key}.nc')
+
+    def _all_entry_files(self) -> List[str]:
+        if not os.path.isdir(self.cache_dir):
+            return []
+        return [
+            os.path.join(self.cache_dir, file)
+            for file in os.listdir(self.cache_dir)
+            if file.endswith('.nc')
+        ]
+
+    def get(self, key:str) -> Optional[Union[xr.DataArray, xr.Dataset]]:
+        """get the cached derived array
+
+        Parameters
+        ----------
+        key : str
+            key from `DerivedCache.key`
+
+        Returns
+        -------
+        xr.DataArray, xr.Dataset or None
+            in-memory derived array, None when the entry
+            does not exist or can not be read
+        """
+        if not self.enabled:
+            return None
+
+        entry_file = self._entry_file(key)
+        if not os.path.exists(entry_file):
+            return None
+        try:
+            with xr.open_dataset(entry_file) as ds_entry:
+                ds_entry = ds_entry.load()
+        except (OSError, ValueError, RuntimeError):
+            print(f'cached derived array {entry_file} is unreadable, recalculating')
+            _remove_file(entry_file)
+            return None
+
+        # mark entry as recently used for the eviction
+        try:
+            os.utime(entry_file)
+        except OSError:
+            pass
+
+        if self.DATAARRAY_VARIABLE in ds_entry.data_vars:
+            da_entry = ds_entry[self.DATAARRAY_VARIABLE]
+            da_entry.name = ds_entry.attrs.get('dataarray_name') or None
+            return da_entry
+        return ds_entry
+
+    def set(
+        self,
+        key : str,
+        derived : Union[xr.DataArray, xr.Dataset]
+    ) -> Union[xr.DataArray, xr.Dataset]:
+        """compute and store the derived array and evict old entries if needed
+
+        Parameters
+        ----------
+        key : str
+            key from `DerivedCache.key`
+        derived : xr.DataArray or xr.Dataset
+            derived array (lazy array is computed)
+
+        Returns
+        -------
+        xr.DataArray or xr.Dataset
+            the computed derived array
+        """
+        if not self.enabled:
+            return derived
+
+        derived = derived.compute()
+        if isinstance(derived, xr.DataArray):
+            ds_entry = derived.to_dataset(name=self.DATAARRAY_VARIABLE)
+            ds_entry.attrs = {'dataarray_name': '' if derived.name is None else str(derived.name)}
+        else:
+            ds_entry = derived
+
+        entry_file = self._entry_file(key)
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp_file = f'{entry_file}.{os.getpid()}.tmp'
+        try:
+            ds_entry.to_netcdf(tmp_file)
+        except (OSError, ValueError, TypeError) as e:
+            print(f'derived array not cached: {e}')
+            _remove_file(tmp_file)
+            return derived
+        if _file_size(tmp_file) > self.max_bytes:
+            _remove_file(tmp_file)
+            return derived
+        os.replace(tmp_file, entry_file)
+        self.evict()
+        return derived
+
+    def evict(self):
+        """remove the least recently used entries above `max_bytes`"""
+        entry_files = self._all_entry_files()
+        entry_files.sort(key=_file_mtime)
+        sizes = [_file_size(file) for file in entry_files]
+        total = sum(sizes)
+        for entry_file, size in zip(entry_files, sizes):
+            if total <= self.max_bytes:
+                break
+            _remove_file(entry_file)
+            total -= size
+
+    def clear(self):
+        """remove all cached derived arrays"""
+        for entry_file in self._all_entry_files():
+            _remove_file(entry_file)
@@ -0,0 +1,242 @@
+#!/usr/bin/env python
+"""
+The module is created to crawl the entire
+CEFI regional mom6 THREDDS catalog tree
+concurrently and produce the complete
+file inventory in one run.
+"""
+import os
+import re
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, List, Dict
+from mom6.data_structure import portal_data
+from mom6.mom6_module.mom6_cache import CatalogCache
+from mom6.mom6_module.util import lazy_import
+from mom6.mom6_module.mom6_read import (
+    CATALOG_HEAD,
+    OPENDAP_HEAD,
+    REGIONAL_MOM6_PATH,
+    parse_catalog_html
+)
+
+aiohttp = lazy_import('aiohttp')
+
+
+class CatalogCrawler:
+    """
+    Class to crawl the CEFI THREDDS catalog following the
+    `portal_data.DataStructure` hierarchy
+    (region/subdomain/experiment_type/output_frequency/grid_type/release)
+
+    All catalog requests share one connection pool and
+    at most `max_concurrency` requests are in flight at
+    the same time.
+
+    Parameters
+    ----------
+    max_concurrency : int, optional
+        maximum number of simultaneous catalog requests, by default 16
+    timeout : float, optional
+        timeout of each catalog request in seconds, by default 30
+    catalog_cache : CatalogCache, optional
+        the listing of each release directory is stored in the cache
+        so the later OpenDapStore does not need to request the
+        catalog again, by default a `CatalogCache()` under the
+        default cache directory
+    catalog_head : str, optional
+        THREDDS catalog url head, by default the PSL THREDDS catalog
+    opendap_head : str, optional
+        THREDDS OPeNDAP url head, by default the PSL THREDDS OPeNDAP
+    regional_mom6_path : str, optional
+        path to the CEFI data structure on the THREDDS server
+    **filters : tuple of str, optional
+        limit the crawl to the given directory names of a level
+        ex: `region=('northwest_atlantic',)`. Levels not given
+        are crawled for all the names in `portal_data.DataStructure`
+
+    Examples
+    --------
+    crawler = CatalogCrawler(region=('northwest_atlantic',), max_concurrency=32)
+    inventory = crawler.crawl()
+    """
+    def __init__(
+        self,
+        max_concurrency : int = 16,
+        timeout : float = 30.,
+        catalog_cache : Optional[CatalogCache] = None,
+        catalog_head : str = CATALOG_HEAD,
+        opendap_head : str = OPENDAP_HEAD,
+        regional_mom6_path : str = REGIONAL_MOM6_PATH,
+        **filters
+    ) -> None:
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        if catalog_cache is None:
+            catalog_cache = CatalogCache()
+        self.catalog_cache = catalog_cache
+        self.catalog_head = catalog_head
+        self.opendap_head = opendap_head
+        self.regional_mom6_path = regional_mom6_path
+
+        # directory level order below the top directory
+        self.dir_order = portal_data.DataStructureAttrOrder.dir_order
+
+        # available directory names of each level
+        data_structure = portal_data.DataStructure()
+        self.level_options = {}
+        for level in self.dir_order[1:-1]:
+            options = getattr(data_structure, level)
+            if level in filters:
+                names = filters.pop(level)
+                if isinstance(names, str):
+                    names = (names,)
+                for name in names:
+                    portal_data.validate_attribute(name, options, level)
+                options = tuple(names)
+            self.level_options[level] = options
+        self.release_options = filters.pop('release', None)
+        if isinstance(self.release_options, str):
+            self.release_options = (self.release_options,)
+        if filters:
+            raise ValueError(
+                f"Invalid filter: {list(filters)}. "+
+                f"Must be one of {self.dir_order[1:]}."
+            )
+
+        self.errors = []
+
+    def _catalog_url(self, rel_dir:str) -> str:
+        return os.path.join(
+            self.catalog_head,
+            self.regional_mom6_path,
+            rel_dir,
+            'catalog.html'
+        )
+
+    def _valid_dir(self, level:str, name:str) -> bool:
+        """check if the sub directory belongs to the data structure"""
+        if level == 'release':
+            if not re.match(r"^r\d{8}$", name):
+                # skip "latest" and other non-release directory
+                return False
+            return self.release_options is None or name in self.release_options
+        return name in self.level_options[level]
+
+    async def _fetch_listing(
+        self,
+        session : 'aiohttp.ClientSession',
+        semaphore : asyncio.Semaphore,
+        rel_dir : str
+    ) -> Optional[list]:
+        """request and parse a single catalog.html"""
+        url = self._catalog_url(rel_dir)
+        try:
+            async with semaphore:
+                async with session.get(url) as response:
+                    if response.status != 200:
+                        self.errors.append((url, f'status code {response.status}'))
+                        return None
+                    html_text = await response.text()
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            self.errors.append((url, repr(e)))
+            return None
+
+        return parse_catalog_html(html_text)
+
+    async def _crawl_dir(
+        self,
+        session : 'aiohttp.ClientSession',
+        semaphore : asyncio.Semaphore,
+        rel_dir : str,
+        level_index : int
+    ) -> List[dict]:
+        """crawl one directory and all the sub directories"""
+        listing = await self._fetch_listing(session, semaphore, rel_dir)
+        if listing is None:
+            return []
+
+        # release directory (last level) contains the files
+        if level_index == len(self.dir_order):
+            self.catalog_cache.set('opendap', rel_dir, listing)
+            return self._file_records(rel_dir, listing)
+
+        level = self.dir_order[level_index]
+        sub_dirs = []
+        for item in listing:
+            name = item.rstrip('/')
+            if item.endswith('/') and self._valid_dir(level, name):
+                sub_dirs.append(os.path.join(rel_dir, name))
+
+        results = await asyncio.gather(*[
+            self._crawl_dir(session, semaphore, sub_dir, level_index+1)
+            for sub_dir in sub_dirs
+        ])
+
+        records = []
+        for result in results:
+            records.extend(result)
+        return records
+
+    def _file_records(self, rel_dir:str, listing:list) -> List[dict]:
+        """create the inventory records of the netcdf files in one release"""
+        dir_names = dict(zip(self.dir_order, rel_dir.split('/')))
+        records = []
+        for file in listing:
+            if 'nc' == file.split('.')[-1]:
+                record = {level: dir_names[level] for level in self.dir_order[1:]}
+                record['variable'] = file.split('.')[0]
+                record['filename'] = file
+                record['cefi_dir'] = rel_dir
+                record['opendap_url'] = os.path.join(
+                    self.opendap_head,
+                    self.regional_mom6_path,
+                    rel_dir,
+                    file
+                )
+                records.append(record)
+        return records
+
+    async def crawl_async(self) -> List[Dict[str, str]]:
+        """crawl the catalog tree (coroutine version of `crawl`)
+
+        Returns
+        -------
+        List[Dict[str, str]]
+            one record per netcdf file
+        """
+        self.errors = []
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        connector = aiohttp.TCPConnector(limit=self.max_concurrency)
+        timeout = aiohttp.ClientTimeout(total=self.timeout)
+
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+            records = await self._crawl_dir(
+                session,
+                semaphore,
+                portal_data.DataStructure().top_directory[0],
+                1
+            )
+
+        return sorted(records, key=lambda record: record['opendap_url'])
+
+    def crawl(self) -> List[Dict[str, str]]:
+        """crawl the catalog tree and return the complete file inventory
+
+        Catalog directories that failed to respond are skipped
+        and listed in `self.errors` as (url, reason).
+
+        Returns
+        -------
+        List[Dict[str, str]]
+            one record per netcdf file including the data structure
+            levels, 'variable', 'filename', 'cefi_dir' and 'opendap_url'
+        """
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return asyncio.run(self.crawl_async())
+
+        # already inside an event loop (ex: jupyter notebook)
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            return executor.submit(asyncio.run, self.crawl_async()).result()
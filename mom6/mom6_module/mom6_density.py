@@ -6,7 +6,9 @@ of state.
 
 from typing import Union
 import numpy as np
-import gsw
+from mom6.mom6_module.util import lazy_import
+
+gsw = lazy_import('gsw')
 
 # define typing used in the methods
 FloatType = Union[float, np.float64]
@@ -1,9 +1,149 @@
 """
 This is the module to implement the detrending
 
+The polynomial fit is solved in closed form from the normal
+equations of all grid points at once. The powers of the
+(centered and scaled) initialization time are computed once
+and the missing values only change the masked sums of each
+grid point so no per grid point least-squares loop is needed.
+
 """
-from typing import Tuple
+from typing import Optional, Tuple
+import numpy as np
+from numpy.polynomial import polynomial
 import xarray as xr
+from mom6.mom6_module.mom6_cache import DerivedCache
+
+def time_to_numeric(da_time : xr.DataArray) -> np.ndarray:
+    """time coordinate to the float x used by `xr.polyfit`/`xr.polyval`
+    (ns since 1970-01-01 for datetime)"""
+    values = da_time.values
+    if np.issubdtype(values.dtype, np.datetime64):
+        return (
+            values.astype('datetime64[ns]') - np.datetime64('1970-01-01', 'ns')
+        ).astype('float64')
+    return values.astype('float64')
+
+
+def normal_equation_basis(x : np.ndarray, deg : int) -> Tuple[np.ndarray, np.ndarray]:
+    """powers of the centered and scaled x and the matrix converting
+    the coefficients of the scaled x to the coefficients of x
+
+    Parameters
+    ----------
+    x : np.ndarray
+        1D sample positions
+    deg : int
+        polynomial degree
+
+    Returns
+    -------
+    Tuple[np.ndarray, np.ndarray]
+        (len(x), 2*deg+1) powers u**p (u = (x-center)/scale)
+        and the (deg+1, deg+1) matrix T with coef_x = T @ coef_u
+        (coefficients from degree 0 to deg)
+    """
+    center = x.mean()
+    scale = (x.max() - x.min())/2.
+    if scale == 0.:
+        scale = 1.
+    u = (x - center)/scale
+    powers = u[:, None]**np.arange(2*deg+1)
+
+    transform = np.zeros((deg+1, deg+1))
+    for k in range(deg+1):
+        # ((x - center)/scale)**k expanded in x
+        coef = polynomial.polypow([-center/scale, 1./scale], k)
+        transform[:len(coef), k] = coef
+    return powers, transform
+
+
+def lstsq_polyfit_kernel(
+    values : np.ndarray,
+    powers : np.ndarray,
+    transform : np.ndarray
+) -> np.ndarray:
+    """least-squares polynomial coefficients along the last axis
+    from the masked normal equations of all points at once
+
+    Parameters
+    ----------
+    values : np.ndarray
+        samples along the last axis (NaN skipped)
+    powers : np.ndarray
+        powers from `normal_equation_basis`
+    transform : np.ndarray
+        coefficient transform from `normal_equation_basis`
+
+    Returns
+    -------
+    np.ndarray
+        coefficients (..., deg+1) from the highest degree to degree 0,
+        NaN when less than deg+1 valid samples
+    """
+    ncoef = transform.shape[0]
+    valid = ~np.isnan(values)
+    filled = np.where(valid, values, 0.)
+
+    # masked power sums (..., 2*deg+1) and right hand side (..., deg+1)
+    power_sums = valid.astype('float64') @ powers
+    rhs = filled @ powers[:, :ncoef]
+    index = np.arange(ncoef)
+    lhs = power_sums[..., index[:, None] + index[None, :]]
+
+    nvalid = valid.sum(axis=-1)
+    solvable = nvalid >= ncoef
+    lhs[~solvable] = np.eye(ncoef)
+    # conditioning check (SVD) only of the points with very few samples
+    few = solvable & (nvalid <= 3*ncoef)
+    if few.any():
+        solvable[few] = np.linalg.cond(lhs[few]) < 1e12
+        lhs[~solvable] = np.eye(ncoef)
+    coef_u = np.linalg.solve(lhs, rhs[..., None])[..., 0]
+    coef = coef_u @ transform.T
+    coef[~solvable] = np.nan
+    return coef[..., ::-1]
+
+
+def lstsq_polyfit(
+    da_data : xr.DataArray,
+    dim : str,
+    deg : int = 1
+) -> xr.Dataset:
+    """vectorized replacement of `da_data.polyfit(dim, deg, skipna=True)`
+
+    Parameters
+    ----------
+    da_data : xr.DataArray
+        data (can be dask backed, chunks along `dim` are merged)
+    dim : str
+        dimension of the fit
+    deg : int, optional
+        polynomial degree, by default 1
+
+    Returns
+    -------
+    xr.Dataset
+        'polyfit_coefficients' with the 'degree' dimension
+        (same layout as `xr.DataArray.polyfit`)
+    """
+    powers, transform = normal_equation_basis(time_to_numeric(da_data[dim]), deg)
+    if da_data.chunks is not None:
+        da_data = da_data.chunk({dim: -1})
+
+    da_coef = xr.apply_ufunc(
+        lstsq_polyfit_kernel,
+        da_data,
+        kwargs={'powers': powers, 'transform': transform},
+        input_core_dims=[[dim]],
+        output_core_dims=[['degree']],
+        dask='parallelized',
+        output_dtypes=['float64'],
+        dask_gufunc_kwargs={'output_sizes': {'degree': deg+1}}
+    )
+    da_coef = da_coef.assign_coords(degree=np.arange(deg, -1, -1))
+    return xr.Dataset({'polyfit_coefficients': da_coef.transpose('degree', ...)})
+
 
 class ForecastDetrend:
     """
@@ -18,16 +158,21 @@ class ForecastDetrend:
         initialization dimension name, by default 'init'
     member_name : str, optional
         ensemble member dimension name, by default 'member'
+    derived_cache : DerivedCache, optional
+        on-disk cache of the polyfit coefficient, by default None
+        (no caching)
     """
     def __init__(
         self,
         da_data : xr.DataArray,
         initialization_name : str = 'init',
         member_name : str = 'member',
+        derived_cache : Optional[DerivedCache] = None
     ) -> None:
         self.data = da_data
         self.init = initialization_name
         self.mem = member_name
+        self.derived_cache = derived_cache
 
     def polyfit_coef(
         self,
@@ -48,10 +193,25 @@ class ForecastDetrend:
             coefficient of the polynomical fit
         """
 
+        # reuse the same coefficient calculated before
+        if self.derived_cache is not None:
+            cache_key = self.derived_cache.key(
+                'forecast_detrend_coefficient',
+                self.data,
+                initialization=self.init,
+                member=self.mem,
+                deg=deg
+            )
+            ds_p = self.derived_cache.get(cache_key)
+            if ds_p is not None:
+                return ds_p
+
         # calculate the ensemble mean of the anomaly
         da_ensmean = self.data.mean(dim=self.mem)
         # use the ensemble mean anomaly to determine lead time dependent trend
-        ds_p = da_ensmean.polyfit(dim=self.init, deg=deg, skipna=True).compute()
+        ds_p = lstsq_polyfit(da_ensmean, dim=self.init, deg=deg).compute()
+        if self.derived_cache is not None:
+            ds_p = self.derived_cache.set(cache_key, ds_p)
 
         return ds_p
 
@@ -59,7 +219,8 @@ class ForecastDetrend:
         self,
         precompute_coeff : bool = False,
         ds_coeff : xr.Dataset = None,
-        in_place_memory_replace : bool = False
+        in_place_memory_replace : bool = False,
+        persist : bool = False
     ) -> Tuple[xr.DataArray,xr.Dataset]:
         """detrend the original data by using the 
         degree 1 ployfit coeff
@@ -69,26 +230,56 @@ class ForecastDetrend:
         xr.DataArray
             the data with linear trend removed
         """
+        return self.detrend(
+            deg=1,
+            precompute_coeff=precompute_coeff,
+            ds_coeff=ds_coeff,
+            in_place_memory_replace=in_place_memory_replace,
+            persist=persist
+        )
+
+    def detrend(
+        self,
+        deg : int = 1,
+        precompute_coeff : bool = False,
+        ds_coeff : xr.Dataset = None,
+        in_place_memory_replace : bool = False,
+        persist : bool = False
+    ) -> Tuple[xr.DataArray,xr.Dataset]:
+        """detrend the original data by using the
+        polyfit coeff of degree `deg`
+
+        Parameters
+        ----------
+        deg : int, optional
+            degree of the polynomial trend, by default 1
+        precompute_coeff : bool, optional
+            use `ds_coeff` instead of calculating the coefficient, by default False
+        ds_coeff : xr.Dataset, optional
+            precomputed coefficient from `polyfit_coef`, by default None
+        in_place_memory_replace : bool, optional
+            replace the data of the class by the detrended data, by default False
+        persist : bool, optional
+            persist the detrended data, by default False
+            (lazy, the trend is removed chunk by chunk when used)
+
+        Returns
+        -------
+        Tuple[xr.DataArray,xr.Dataset]
+            the data with the trend removed and the coefficient
+        """
         if precompute_coeff:
             ds_p = ds_coeff
         else:
-            # get degree 1 polyfit coeff
-            ds_p = self.polyfit_coef(deg=1)
+            ds_p = self.polyfit_coef(deg=deg)
 
-        # # calculate linear trend based on polyfit coeff
-        # da_linear_trend = xr.polyval(self.data[self.init], ds_p.polyfit_coefficients)
-        # # remove the linear trend
-        # da_detrend = (self.data - da_linear_trend).persist()
+        da_detrend = (
+            self.data -
+            xr.polyval(self.data[self.init], ds_p.polyfit_coefficients)
+        )
+        if persist:
+            da_detrend = da_detrend.persist()
 
         if in_place_memory_replace:
-            self.data = (
-                self.data-
-                xr.polyval(self.data[self.init], ds_p.polyfit_coefficients)
-            ).persist()
-            return self.data, ds_p
-        else:
-            da_detrend = (
-                self.data -
-                xr.polyval(self.data[self.init], ds_p.polyfit_coefficients)
-            ).persist()
-            return da_detrend,ds_p
+            self.data = da_detrend
+        return da_detrend, ds_p
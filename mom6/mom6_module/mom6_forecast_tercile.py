@@ -12,6 +12,7 @@ import numpy as np
 import pandas as pd
 import xarray as xr
 from scipy.stats import norm as normal
+from mom6.mom6_module.mom6_quantile import grouped_quantile
 from mom6.mom6_module.mom6_types import TimeGroupByOptions
 
 warnings.simplefilter("ignore")
@@ -80,42 +81,21 @@ class Tercile:
             {
             self.init : slice(f'{start_year}-01',f'{end_year}-12')
             }
-        ).persist()
-
-        # find existing initial month
-        init_months = list(set(da_data[f'{self.init}.month'].data))
-
-        list_ds_terciles = []
-        for init_month in init_months:
-
-            # seperate based on initialization time
-            da_init = da_data.where(
-                da_data[f'{self.init}.month']==init_month,
-                drop=True
-            ).compute()
-
-            # calculate the tercile value
-            da_tercile = (
-                da_init
-                .stack(allens=(self.init,self.mem))
-                .quantile(
-                    [1./3.,2./3.],
-                    dim='allens',
-                    keep_attrs=True
-                )
-            )
+        )
 
-            # save to individal dataset
-            ds_tercile = xr.Dataset()
-            ds_tercile['month'] = init_month
-            ds_tercile = ds_tercile.set_coords('month')
-            ds_tercile['f_lowmid'] = da_tercile.isel(quantile=0)
-            ds_tercile['f_midhigh'] = da_tercile.isel(quantile=1)
-            ds_tercile = ds_tercile.drop_vars('quantile')
-            list_ds_terciles.append(ds_tercile)
-
-        # Concatenate all datasets along the 'month' coordinate
-        ds_terciles = xr.concat(list_ds_terciles, dim='month')
+        # calculate the tercile value of all initial months at once
+        da_tercile = grouped_quantile(
+            da_data,
+            [1./3.,2./3.],
+            group='month',
+            dim=self.init,
+            sample_dims=[self.mem]
+        ).compute()
+
+        ds_terciles = xr.Dataset()
+        ds_terciles['f_lowmid'] = da_tercile.isel(quantile=0)
+        ds_terciles['f_midhigh'] = da_tercile.isel(quantile=1)
+        ds_terciles = ds_terciles.drop_vars('quantile')
         ds_terciles.attrs = ds_data.attrs
 
         return ds_terciles
@@ -11,7 +11,8 @@ Indexes include:
 import warnings
 import numpy as np
 import xarray as xr
-import xesmf as xe
+from mom6.mom6_module.util import lon_to_360
+from mom6.mom6_module.mom6_regrid import get_regridder
 
 warnings.simplefilter("ignore")
 xr.set_options(keep_attrs=True)
@@ -123,20 +124,18 @@ class GulfStreamIndex:
         ds_data = self.dataset
 
         # change longitude range from -180 180 to 0 360
+        # (input dataset is not modified and not copied)
         try:
-            lon = ds_data['lon'].data
+            ds_data = lon_to_360(ds_data, 'lon')
         except KeyError as e:
             raise KeyError("Coordinates should have 'lon' and 'lat' with exact naming") from e
-        lon_ind = np.where(lon<0)
-        lon[lon_ind] += 360.
-        ds_data['lon'].data = lon
         # ds_data = ds_data.sortby('lon')
 
         # Define Regridding data structure
         ds_regrid = self.__region_focus()
 
-        # use xesmf to create regridder
-        regridder = xe.Regridder(ds_data, ds_regrid, "bilinear", unmapped_to_nan=True)
+        # use xesmf to create regridder (weights reused)
+        regridder = get_regridder(ds_data, ds_regrid, "bilinear", unmapped_to_nan=True)
 
         # perform regrid for each field
         ds_regrid = xr.Dataset()
@@ -234,7 +233,7 @@ class ColdPoolIndex:
         # Regrid the regional MOM6 data to GLORYS grid
         # Use xesmf to create regridder using bilinear method
         # !!!! Regridded only suited for geolon and geolat to x and y
-        regridder = xe.Regridder(
+        regridder = get_regridder(
             ds_data.rename({'geolon':'lon','geolat':'lat'}),
             ds_mask,
             "bilinear",
@@ -0,0 +1,490 @@
+#!/usr/bin/env python
+"""
+The module include the functions to generate and
+open the kerchunk references of the CEFI regional
+mom6 netcdf files.
+
+The reference of a netcdf file is a json file
+that records the location of each HDF5 chunk. Opening
+the reference skips the HDF5 metadata parsing and the
+combined reference of many files opens as one dataset
+in roughly constant time.
+
+Reference naming follows the netcdf filename
+- single file : <netcdf filename without .nc>.json
+- combined    : <netcdf filename with the date/init segment replaced by 'combined'>.json
+
+The combined reference records the netcdf filenames it was built
+from. Local references that do not match the current netcdf files
+(added, removed or rewritten files) are not opened.
+"""
+import os
+import glob
+import json
+from typing import Optional, List, Union
+import fsspec
+import xarray as xr
+from mom6.data_structure import portal_data
+from mom6.mom6_module.mom6_cache import atomic_write_json, BlockCache
+from mom6.mom6_module.mom6_types import (
+    ModelRegionOptions,
+    ModelSubdomainOptions,
+    ModelExperimentTypeOptions,
+    ModelOutputFrequencyOptions,
+    ModelGridTypeOptions
+)
+
+# experiment types with one file per initialization
+INIT_EXPERIMENT_TYPES = (
+    'seasonal_forecast',
+    'seasonal_reforecast',
+    'decadal_forecast'
+)
+COMBINED_SEGMENT = 'combined'
+# key of the netcdf filenames recorded in the combined reference
+SOURCE_FILES_KEY = 'cefi_source_files'
+
+
+class BlockCacheFileSystem(fsspec.AbstractFileSystem):
+    """
+    fsspec file system reading the byte ranges of a remote
+    file system through the `BlockCache`
+
+    Used as the remote file system of the kerchunk reference
+    file system so the HDF5 chunks read from GCS/S3 are fetched
+    once and read from the local disk afterward.
+
+    Parameters
+    ----------
+    target : fsspec.AbstractFileSystem
+        remote file system ex: `fsspec.filesystem('gcs', anon=True)`
+    block_cache : BlockCache
+        cache storing the fetched blocks
+    """
+    cachable = False
+
+    def __init__(self, target:fsspec.AbstractFileSystem, block_cache:BlockCache, **kwargs):
+        super().__init__(**kwargs)
+        self.target = target
+        self.block_cache = block_cache
+        self.protocol = target.protocol
+
+    def _fetch_blocks(self, path:str, blocks:List[int]) -> dict:
+        """get the blocks from the cache and request the missing ones"""
+        block_size = self.block_cache.block_size
+        data = {}
+        missing = []
+        for block in blocks:
+            cached = self.block_cache.get(path, block)
+            if cached is None:
+                missing.append(block)
+            else:
+                data[block] = cached
+        if missing:
+            fetched = self.target.cat_ranges(
+                [path]*len(missing),
+                [block*block_size for block in missing],
+                [(block+1)*block_size for block in missing]
+            )
+            for block, content in zip(missing, fetched):
+                if isinstance(content, Exception):
+                    raise content
+                self.block_cache.set(path, block, content)
+                data[block] = content
+        return data
+
+    def cat_file(self, path, start=None, end=None, **kwargs):
+        if start is None or end is None or start < 0 or end < 0:
+            # whole file or relative range is not cached
+            return self.target.cat_file(path, start=start, end=end, **kwargs)
+        if end <= start:
+            return b''
+
+        block_size = self.block_cache.block_size
+        blocks = list(range(start//block_size, (end-1)//block_size+1))
+        data = self._fetch_blocks(path, blocks)
+        content = b''.join(data[block] for block in blocks)
+        offset = blocks[0]*block_size
+        return content[start-offset:end-offset]
+
+    def cat_ranges(self, paths, starts, ends, max_gap=None, on_error="return", **kwargs):
+        out = []
+        for path, start, end in zip(paths, starts, ends):
+            try:
+                out.append(self.cat_file(path, start, end))
+            except Exception as e:  # pylint: disable=broad-exception-caught
+                if on_error == "raise":
+                    raise
+                out.append(e)
+        return out
+
+    def info(self, path, **kwargs):
+        return self.target.info(path, **kwargs)
+
+    def ls(self, path, detail=True, **kwargs):
+        return self.target.ls(path, detail=detail, **kwargs)
+
+    def _open(self, path, mode="rb", **kwargs):
+        return self.target._open(path, mode=mode, **kwargs)
+
+
+def concat_dim_name(experiment_type:str) -> str:
+    """dimension used to combine the files of a variable
+
+    Parameters
+    ----------
+    experiment_type : str
+        experiment type in `portal_data.DataStructure`
+
+    Returns
+    -------
+    str
+        'init' for the forecast type of files, 'time' for the rest
+    """
+    if experiment_type in INIT_EXPERIMENT_TYPES:
+        return 'init'
+    return 'time'
+
+
+def reference_filename(nc_filename:str) -> str:
+    """single file reference filename"""
+    return f'{os.path.splitext(os.path.basename(nc_filename))[0]}.json'
+
+
+def combined_reference_filename(nc_filename:str) -> str:
+    """combined reference filename based on one of the combined files"""
+    filename_seg = os.path.basename(nc_filename).split('.')
+    # last segment before ".nc" is the date range or the initial date
+    filename_seg[-2] = COMBINED_SEGMENT
+    filename_seg[-1] = 'json'
+    return '.'.join(filename_seg)
+
+
+def is_combined_reference(reference:str) -> bool:
+    """check if the reference file is a combined reference"""
+    return os.path.basename(reference).split('.')[-2] == COMBINED_SEGMENT
+
+
+def _newer(file:str, than:str) -> bool:
+    """check if `file` is modified after `than`"""
+    return os.path.getmtime(file) > os.path.getmtime(than)
+
+
+def current_references(references:List[str], nc_files:List[str]) -> List[str]:
+    """references of local netcdf files that are up to date
+
+    The combined reference is current when it was built from
+    the same netcdf filenames (recorded in the reference) and
+    no netcdf file changed after it. A single file reference is
+    current when its netcdf file did not change after it.
+
+    Parameters
+    ----------
+    references : List[str]
+        local reference json files of one variable
+    nc_files : List[str]
+        current netcdf files of the variable
+
+    Returns
+    -------
+    List[str]
+        the combined reference when current, otherwise the
+        single file references of all netcdf files
+
+    Raises
+    ------
+    FileNotFoundError
+        When the references are missing or out of date
+        (rebuild with `build_release_references`)
+    """
+    nc_names = sorted(os.path.basename(nc_file) for nc_file in nc_files)
+    for reference in references:
+        if is_combined_reference(reference):
+            with open(reference, 'r', encoding='utf-8') as f:
+                sources = json.load(f).get(SOURCE_FILES_KEY)
+            if sources == nc_names and not any(
+                _newer(nc_file, reference) for nc_file in nc_files
+            ):
+                return [reference]
+
+    single = {os.path.basename(ref): ref for ref in references if not is_combined_reference(ref)}
+    current = []
+    for nc_file in nc_files:
+        reference = single.get(reference_filename(nc_file))
+        if reference is None or _newer(nc_file, reference):
+            raise FileNotFoundError(
+                f'kerchunk reference of {nc_file} is missing or out of date'
+            )
+        current.append(reference)
+    return current
+
+
+def single_file_reference(nc_file:str, inline_threshold:int = 100) -> dict:
+    """generate the kerchunk reference of a single netcdf file
+
+    Parameters
+    ----------
+    nc_file : str
+        absolute path to the netcdf file
+    inline_threshold : int, optional
+        chunks smaller than this number of bytes are stored
+        inside the reference, by default 100
+
+    Returns
+    -------
+    dict
+        kerchunk reference
+    """
+    # lazy import to avoid loading h5py when only opening references
+    from kerchunk.hdf import SingleHdf5ToZarr
+
+    with fsspec.open(nc_file, 'rb') as f:
+        return SingleHdf5ToZarr(f, nc_file, inline_threshold=inline_threshold).translate()
+
+
+def _array_dims(reference:dict) -> dict:
+    """dimension names of each array in the reference"""
+    refs = reference['refs']
+    array_dims = {}
+    for key, value in refs.items():
+        if key.endswith('/.zattrs'):
+            attrs = json.loads(value) if isinstance(value, str) else value
+            array_dims[key.split('/')[0]] = attrs.get('_ARRAY_DIMENSIONS', [])
+    return array_dims
+
+
+def combine_references(
+    references : List[Union[str, dict]],
+    concat_dim : str,
+    storage_options : Optional[dict] = None
+) -> dict:
+    """combine the single file references along `concat_dim`
+
+    Coordinate variables (1D variable named after its dimension)
+    other than the `concat_dim` are assumed identical in all files.
+    The `concat_dim` value is decoded with the CF time units
+    so the per-file "days since <init>" style encoding is preserved.
+
+    Parameters
+    ----------
+    references : List[Union[str, dict]]
+        list of references (json paths/urls or reference dict)
+    concat_dim : str
+        dimension to concatenate the files ex: 'time' or 'init'
+    storage_options : dict, optional
+        fsspec storage options to read the json references, by default None
+
+    Returns
+    -------
+    dict
+        combined kerchunk reference
+    """
+    from kerchunk.combine import MultiZarrToZarr
+
+    first = references[0]
+    if not isinstance(first, dict):
+        with fsspec.open(first, 'r', **(storage_options or {})) as f:
+            first = json.load(f)
+
+    identical_dims = [
+        var for var, dims in _array_dims(first).items()
+        if list(dims) == [var] and var != concat_dim
+    ]
+
+    combine_kwargs = {}
+    if storage_options:
+        combine_kwargs['target_options'] = storage_options
+        combine_kwargs['remote_options'] = storage_options
+
+    return MultiZarrToZarr(
+        references,
+        concat_dims=[concat_dim],
+        identical_dims=identical_dims,
+        coo_map={concat_dim: f'cf:{concat_dim}'},
+        **combine_kwargs
+    ).translate()
+
+
+def build_release_references(
+    local_top_dir : str,
+    region : ModelRegionOptions,
+    subdomain : ModelSubdomainOptions,
+    experiment_type : ModelExperimentTypeOptions,
+    output_frequency : ModelOutputFrequencyOptions,
+    grid_type : ModelGridTypeOptions,
+    release : str,
+    output_dir : Optional[str] = None,
+    overwrite : bool = False
+) -> List[str]:
+    """build the kerchunk references of all netcdf files in a local
+    CEFI release directory and the combined reference of each variable
+    (combined along 'init' for forecast/reforecast and 'time' for the rest)
+
+    Parameters
+    ----------
+    local_top_dir : str
+        the absolution path to the local CEFI data.
+        should be the absolute path before cefi_portal/...
+    region : ModelRegionOptions
+        region name
+    subdomain : ModelSubdomainOptions
+        subdomain name
+    experiment_type : ModelExperimentTypeOptions
+        experiment type
+    output_frequency : ModelOutputFrequencyOptions
+        data output frequency
+    grid_type : ModelGridTypeOptions
+        model grid type
+    release : str
+        release date in the format of "rYYYYMMDD"
+    output_dir : str, optional
+        directory to store the references, by default the release directory
+        (same as the json references in the cloud buckets)
+    overwrite : bool, optional
+        regenerate the existing references, by default False
+
+    Returns
+    -------
+    List[str]
+        all reference files (single and combined) of the release
+
+    Raises
+    ------
+    FileNotFoundError
+        When no netcdf file exist in the release directory
+    """
+    cefi_data_path = portal_data.DataPath(
+        region=region,
+        subdomain=subdomain,
+        experiment_type=experiment_type,
+        output_frequency=output_frequency,
+        grid_type=grid_type,
+        release=release
+    )
+    cefi_local_dir = os.path.join(local_top_dir, cefi_data_path.cefi_dir)
+    if output_dir is None:
+        output_dir = cefi_local_dir
+    os.makedirs(output_dir, exist_ok=True)
+
+    nc_files = sorted(glob.glob(os.path.join(cefi_local_dir, '*.nc')))
+    if not nc_files:
+        raise FileNotFoundError(f'No netcdf file available in {cefi_local_dir}')
+
+    # single file references grouped by variable
+    dict_var_refs = {}
+    all_refs = []
+    for nc_file in nc_files:
+        ref_file = os.path.join(output_dir, reference_filename(nc_file))
+        if overwrite or not os.path.exists(ref_file) or _newer(nc_file, ref_file):
+            print(f'generating reference {ref_file}')
+            atomic_write_json(ref_file, single_file_reference(nc_file))
+        variable = os.path.basename(nc_file).split('.')[0]
+        dict_var_refs.setdefault(variable, []).append((nc_file, ref_file))
+        all_refs.append(ref_file)
+
+    # combined references of variables with more than one file
+    concat_dim = concat_dim_name(experiment_type)
+    for variable, var_refs in dict_var_refs.items():
+        if len(var_refs) < 2:
+            continue
+        combined_file = os.path.join(output_dir, combined_reference_filename(var_refs[0][0]))
+        try:
+            current = current_references(
+                [combined_file], [nc_file for nc_file, _ in var_refs]
+            ) == [combined_file]
+        except (OSError, ValueError):
+            current = False
+        newest_ref = max(os.path.getmtime(ref_file) for _, ref_file in var_refs)
+        if (
+            overwrite or
+            not current or
+            os.path.getmtime(combined_file) < newest_ref
+        ):
+            print(f'generating combined reference {combined_file}')
+            combined = combine_references([ref_file for _, ref_file in var_refs], concat_dim)
+            combined[SOURCE_FILES_KEY] = sorted(
+                os.path.basename(nc_file) for nc_file, _ in var_refs
+            )
+            atomic_write_json(combined_file, combined)
+        all_refs.append(combined_file)
+
+    return all_refs
+
+
+def open_references(
+    references : Union[str, List[str]],
+    concat_dim : Optional[str] = None,
+    storage_options : Optional[dict] = None,
+    chunks : Optional[dict] = None,
+    block_cache : Optional[BlockCache] = None
+) -> xr.Dataset:
+    """lazily open the kerchunk references as one dataset
+
+    A combined reference is used when it exists in `references`,
+    otherwise the single file references are combined in memory.
+
+    Parameters
+    ----------
+    references : Union[str, List[str]]
+        reference json path/url or a list of them
+    concat_dim : str, optional
+        dimension to combine multiple single file references, by default None
+    storage_options : dict, optional
+        fsspec storage options for both the json and the referenced
+        netcdf files ex: `{'anon': True}` for the public buckets, by default None
+    chunks : dict, optional
+        dask chunks used to open the dataset, by default {} (on-disk chunks)
+    block_cache : BlockCache, optional
+        local cache of the byte blocks read from the remote
+        netcdf files, by default None (no cache)
+
+    Returns
+    -------
+    xr.Dataset
+        lazily loaded dataset
+
+    Raises
+    ------
+    ValueError
+        When multiple single file references are given without concat_dim
+    """
+    if isinstance(references, str):
+        references = [references]
+    if chunks is None:
+        chunks = {}
+
+    combined = [ref for ref in references if is_combined_reference(ref)]
+    if combined:
+        reference = combined[0]
+    elif len(references) == 1:
+        reference = references[0]
+    else:
+        if concat_dim is None:
+            raise ValueError('concat_dim is needed to combine multiple references')
+        reference = combine_references(references, concat_dim, storage_options)
+
+    fs_kwargs = {}
+    if storage_options:
+        fs_kwargs['target_options'] = storage_options
+        fs_kwargs['remote_options'] = storage_options
+
+    remote_protocol = fsspec.utils.get_protocol(references[0])
+    if block_cache is not None and remote_protocol != 'file':
+        # all protocol alias (ex: gs/gcs) read through the same cache
+        remote_fs = BlockCacheFileSystem(
+            fsspec.filesystem(remote_protocol, **(storage_options or {})),
+            block_cache
+        )
+        protocols = remote_fs.protocol
+        if isinstance(protocols, str):
+            protocols = (protocols,)
+        fs_kwargs['fs'] = {protocol: remote_fs for protocol in protocols}
+        fs_kwargs.pop('remote_options', None)
+
+    fs = fsspec.filesystem('reference', fo=reference, **fs_kwargs)
+    return xr.open_dataset(
+        fs.get_mapper(''),
+        engine='zarr',
+        consolidated=False,
+        chunks=chunks
+    )
@@ -9,6 +9,7 @@ that is generated by Andrew Ross at GFDL.
 
 """
 import warnings
+from typing import Optional
 import xarray as xr
 from mom6.mom6_module.mom6_statistics import (
     ForecastClimatology,
@@ -19,6 +20,7 @@ from mom6.mom6_module.mom6_types import (
     TimeGroupByOptions
 )
 from mom6.mom6_module.mom6_detrend import ForecastDetrend
+from mom6.mom6_module.mom6_cache import DerivedCache, source_files
 
 warnings.simplefilter("ignore")
 xr.set_options(keep_attrs=True)
@@ -50,6 +52,9 @@ class MarineHeatwaveForecast:
     time_frequency : TimeGroupByOptions, optional
         name in time frequency to do the time group, by default 'month'
         'year', 'month', 'dayofyear' are the available options.
+    derived_cache : DerivedCache, optional
+        on-disk cache of the climatology, threshold and detrend
+        coefficient, by default None (no caching)
     """
 
     def __init__(
@@ -58,7 +63,8 @@ class MarineHeatwaveForecast:
         sst_name : str = 'tos',
         initialization_name : str = 'init',
         member_name : str = 'member',
-        time_frequency : TimeGroupByOptions = 'month'
+        time_frequency : TimeGroupByOptions = 'month',
+        derived_cache : Optional[DerivedCache] = None
     ) -> None:
 
         self.dataset = CoordinateWrangle(ds_data).to_360()
@@ -66,6 +72,7 @@ class MarineHeatwaveForecast:
         self.init = initialization_name
         self.mem = member_name
         self.tfreq = time_frequency
+        self.derived_cache = derived_cache
 
     def generate_forecast_batch(
         self,
@@ -100,7 +107,11 @@ class MarineHeatwaveForecast:
         """
 
         # calculate anomaly based on climatology
-        class_forecast_climo = ForecastClimatology(self.dataset,self.varname)
+        class_forecast_climo = ForecastClimatology(
+            self.dataset,
+            self.varname,
+            derived_cache=self.derived_cache
+        )
         dict_anom_thres = class_forecast_climo.generate_anom_batch(
             climo_start_year,
             climo_end_year,
@@ -111,7 +122,10 @@ class MarineHeatwaveForecast:
 
         # detrend or not
         if detrend:
-            class_detrend_thres = ForecastDetrend(dict_anom_thres['anomaly'])
+            class_detrend_thres = ForecastDetrend(
+                dict_anom_thres['anomaly'],
+                derived_cache=self.derived_cache
+            )
             dict_anom_thres['anomaly'], ds_p = class_detrend_thres.detrend_linear(
                 precompute_coeff=False,
                 in_place_memory_replace=True
@@ -137,13 +151,19 @@ class MarineHeatwaveForecast:
         #         dask_obj=False
         #     )
         # else:
-        class_forecast_quantile = ForecastQuantile(ds_anom_thres,f'{self.varname}_anom')
+        class_forecast_quantile = ForecastQuantile(
+            ds_anom_thres,
+            f'{self.varname}_anom',
+            derived_cache=self.derived_cache
+        )
         ### in memery result not lazy-loaded (same as climo period)
         da_threshold = class_forecast_quantile.generate_quantile(
             climo_start_year,
             climo_end_year,
             quantile_threshold,
-            dask_obj=True
+            dask_obj=True,
+            # input files identity for the cached threshold
+            files=source_files(self.dataset)
         )
 
         # anomaly that need to find MHW
@@ -159,7 +179,7 @@ class MarineHeatwaveForecast:
         da_anom = dict_anom['anomaly']
 
         if detrend:
-            class_detrend = ForecastDetrend(da_anom)
+            class_detrend = ForecastDetrend(da_anom, derived_cache=self.derived_cache)
             da_anom,_ = class_detrend.detrend_linear(
                 precompute_coeff=True,
                 ds_coeff=ds_p,
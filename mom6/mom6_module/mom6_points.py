@@ -0,0 +1,289 @@
+#!/usr/bin/env python
+"""
+The module is created to extract the time series
+(hindcast) or the forecast arrays (init/lead/member)
+at many station locations from the CEFI regional
+mom6 tracer grid in one vectorized gather.
+
+The station index (nearest wet point or bilinear
+weights) is built with the KD-tree of `mom6_subset.GridIndex`
+and cached per grid so repeated extraction at the same
+stations only does the gather.
+"""
+import weakref
+from collections import OrderedDict
+from typing import Optional, Union
+import numpy as np
+import xarray as xr
+from mom6.mom6_module.mom6_subset import GridIndex, lonlat_to_xyz
+from mom6.mom6_module.util import lazy_import
+
+spatial = lazy_import('scipy.spatial')
+
+EARTH_RADIUS_KM = 6371.
+# maximum number of station sets cached per grid
+MAX_CACHED_STATION_SETS = 32
+
+# station index cached per grid index object
+_POINT_INDEX_CACHE : 'weakref.WeakKeyDictionary[GridIndex, OrderedDict]' = (
+    weakref.WeakKeyDictionary()
+)
+
+
+class _WetTree:
+    """KD-tree of the wet grid points"""
+    def __init__(self, grid_index:GridIndex) -> None:
+        self.flat_index = np.flatnonzero(
+            grid_index.wet & np.isfinite(grid_index.lon) & np.isfinite(grid_index.lat)
+        )
+        self.tree = spatial.cKDTree(lonlat_to_xyz(
+            grid_index.lon.ravel()[self.flat_index],
+            grid_index.lat.ravel()[self.flat_index]
+        ))
+
+    def query(self, xyz:np.ndarray) -> tuple:
+        return self.tree.query(xyz)
+
+
+_WET_TREE_CACHE : 'weakref.WeakKeyDictionary[GridIndex, _WetTree]' = weakref.WeakKeyDictionary()
+
+
+def _wet_tree(grid_index:GridIndex) -> _WetTree:
+    """cached KD-tree of the wet grid points of the grid"""
+    if grid_index not in _WET_TREE_CACHE:
+        _WET_TREE_CACHE[grid_index] = _WetTree(grid_index)
+    return _WET_TREE_CACHE[grid_index]
+
+
+class PointExtractor:
+    """
+    Vectorized station extraction on the model tracer grid
+
+    Parameters
+    ----------
+    grid_index : GridIndex
+        grid index of the data (`AccessFiles.grid_index()`)
+    lon : array_like
+        station longitude (either -180~180 or 0~360)
+    lat : array_like
+        station latitude
+    method : str, optional
+        'nearest' for the nearest wet grid point or 'bilinear'
+        for the bilinear weights of the surrounding grid points
+        (land points are excluded and the weights renormalized),
+        by default 'nearest'
+    max_distance : float, optional
+        stations farther than this distance (km) from the nearest
+        wet grid point return NaN, by default None (no limit)
+
+    Examples
+    --------
+    extractor = PointExtractor(local_access.grid_index(), lon, lat, method='bilinear')
+    ds_station = extractor.extract(local_access.open('tos'))
+    """
+    def __init__(
+        self,
+        grid_index : GridIndex,
+        lon,
+        lat,
+        method : str = 'nearest',
+        max_distance : Optional[float] = None
+    ) -> None:
+        if method not in ('nearest', 'bilinear'):
+            raise ValueError("method should be 'nearest' or 'bilinear'")
+
+        self.grid_index = grid_index
+        self.lon = np.atleast_1d(np.asarray(lon, dtype='float64'))
+        self.lat = np.atleast_1d(np.asarray(lat, dtype='float64'))
+        if self.lon.shape != self.lat.shape or self.lon.ndim != 1:
+            raise ValueError('lon and lat should be 1D arrays with the same length')
+        self.method = method
+        self.max_distance = max_distance
+
+        cache = _POINT_INDEX_CACHE.setdefault(grid_index, OrderedDict())
+        key = (
+            method,
+            max_distance,
+            self.lon.tobytes(),
+            self.lat.tobytes()
+        )
+        if key in cache:
+            cache.move_to_end(key)
+        else:
+            cache[key] = self._build_index()
+            if len(cache) > MAX_CACHED_STATION_SETS:
+                cache.popitem(last=False)
+        self.j_index, self.i_index, self.weights, self.distance = cache[key]
+
+    def _nearest_wet(self) -> tuple:
+        """index and distance (km) of the nearest wet grid point"""
+        grid = self.grid_index
+        wet_tree = _wet_tree(grid)
+        chord, index = wet_tree.query(lonlat_to_xyz(self.lon, self.lat))
+        flat_index = wet_tree.flat_index[index]
+        jj, ii = np.unravel_index(flat_index, (grid.ny, grid.nx))
+        distance = 2.*EARTH_RADIUS_KM*np.arcsin(np.clip(chord/2., 0., 1.))
+        return jj, ii, distance
+
+    def _build_index(self) -> tuple:
+        """station index (j, i), weights and distance to the nearest wet point"""
+        jw, iw, distance = self._nearest_wet()
+        npoint = len(self.lon)
+
+        if self.method == 'nearest':
+            j_index = jw[:, None]
+            i_index = iw[:, None]
+            weights = np.ones((npoint, 1))
+        else:
+            j_index, i_index, weights = self._bilinear_weights()
+            # no wet corner or outside the grid => nearest wet point
+            fallback = ~(weights.sum(axis=1) > 0.)
+            j_index[fallback] = jw[fallback, None]
+            i_index[fallback] = iw[fallback, None]
+            weights[fallback] = np.array([1., 0., 0., 0.])
+
+        if self.max_distance is not None:
+            weights[distance > self.max_distance] = 0.
+
+        return j_index, i_index, weights, distance
+
+    def _bilinear_weights(self) -> tuple:
+        """bilinear weights of the grid cell containing each station
+
+        The curvilinear cell is mapped to the unit square by solving
+        the inverse bilinear mapping (Newton iterations) in a local
+        plane centered at the station.
+        """
+        grid = self.grid_index
+        ny, nx = grid.ny, grid.nx
+        npoint = len(self.lon)
+
+        # nearest tracer point (wet or not) is a corner of the cell
+        _, index = grid.tree.query(lonlat_to_xyz(self.lon, self.lat))
+        j0, i0 = np.unravel_index(grid._valid_index[index], (ny, nx))
+
+        # four candidate cells (lower left corner index)
+        jc = j0[:, None] + np.array([-1, -1, 0, 0])
+        ic = i0[:, None] + np.array([-1, 0, -1, 0])
+        valid_cell = (jc >= 0) & (jc < ny-1) & (ic >= 0) & (ic < nx-1)
+        jc = np.clip(jc, 0, max(ny-2, 0))
+        ic = np.clip(ic, 0, max(nx-2, 0))
+
+        # corner order (j,i), (j,i+1), (j+1,i), (j+1,i+1)
+        cj = jc[..., None] + np.array([0, 0, 1, 1])
+        ci = ic[..., None] + np.array([0, 1, 0, 1])
+        cj = np.clip(cj, 0, ny-1)
+        ci = np.clip(ci, 0, nx-1)
+
+        # local plane coordinate (degree) with station at the origin
+        coslat = np.cos(np.deg2rad(self.lat))[:, None, None]
+        x = ((grid.lon[cj, ci] - self.lon[:, None, None] + 180.) % 360. - 180.)*coslat
+        y = grid.lat[cj, ci] - self.lat[:, None, None]
+
+        a = np.stack([x[..., 0], y[..., 0]], axis=-1)
+        b = np.stack([x[..., 1]-x[..., 0], y[..., 1]-y[..., 0]], axis=-1)
+        c = np.stack([x[..., 2]-x[..., 0], y[..., 2]-y[..., 0]], axis=-1)
+        d = np.stack([
+            x[..., 3]-x[..., 1]-x[..., 2]+x[..., 0],
+            y[..., 3]-y[..., 1]-y[..., 2]+y[..., 0]
+        ], axis=-1)
+
+        s = np.full(jc.shape, 0.5)
+        t = np.full(jc.shape, 0.5)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            for _ in range(10):
+                f = a + b*s[..., None] + c*t[..., None] + d*(s*t)[..., None]
+                j11 = b[..., 0] + d[..., 0]*t
+                j12 = c[..., 0] + d[..., 0]*s
+                j21 = b[..., 1] + d[..., 1]*t
+                j22 = c[..., 1] + d[..., 1]*s
+                det = j11*j22 - j12*j21
+                det = np.where(np.abs(det) < 1e-14, 1e-14, det)
+                s = s - (j22*f[..., 0] - j12*f[..., 1])/det
+                t = t - (-j21*f[..., 0] + j11*f[..., 1])/det
+
+        tol = 1e-6
+        inside = (
+            valid_cell &
+            np.isfinite(s) & np.isfinite(t) &
+            (s >= -tol) & (s <= 1.+tol) &
+            (t >= -tol) & (t <= 1.+tol)
+        )
+        found = inside.any(axis=1)
+        kcell = np.argmax(inside, axis=1)
+        rows = np.arange(npoint)
+
+        s = np.clip(s[rows, kcell], 0., 1.)
+        t = np.clip(t[rows, kcell], 0., 1.)
+        j_index = cj[rows, kcell]
+        i_index = ci[rows, kcell]
+        weights = np.stack([(1.-s)*(1.-t), s*(1.-t), (1.-s)*t, s*t], axis=-1)
+
+        # exclude land corners and renormalize
+        weights = weights*grid.wet[j_index, i_index]
+        weights[~found] = 0.
+        total = weights.sum(axis=1, keepdims=True)
+        weights = np.divide(weights, total, out=np.zeros_like(weights), where=total > 0.)
+
+        return j_index, i_index, weights
+
+    def extract(
+        self,
+        data : Union[xr.Dataset, xr.DataArray]
+    ) -> Union[xr.Dataset, xr.DataArray]:
+        """extract all stations from the (lazy) data in one gather
+
+        Only the variables on the tracer grid (ex: yh, xh) are extracted,
+        other variables are kept unchanged. All other dimensions
+        (time or init/lead/member, z_l) are preserved.
+
+        Parameters
+        ----------
+        data : Union[xr.Dataset, xr.DataArray]
+            data on the grid of the `grid_index`
+
+        Returns
+        -------
+        Union[xr.Dataset, xr.DataArray]
+            data with the horizontal dimensions replaced by 'station'
+        """
+        ydim, xdim = self.grid_index.ydim, self.grid_index.xdim
+
+        if isinstance(data, xr.Dataset):
+            ds_out = xr.Dataset(attrs=data.attrs)
+            for var in data.data_vars:
+                if ydim in data[var].dims and xdim in data[var].dims:
+                    ds_out[var] = self._extract_dataarray(data[var])
+                else:
+                    ds_out[var] = data[var]
+            return self._station_coords(ds_out)
+
+        return self._station_coords(self._extract_dataarray(data))
+
+    def _extract_dataarray(self, da:xr.DataArray) -> xr.DataArray:
+        """gather and weight the station values of a single variable"""
+        ydim, xdim = self.grid_index.ydim, self.grid_index.xdim
+        # drop the horizontal index coordinates (replaced by station)
+        da = da.drop_vars([ydim, xdim], errors='ignore')
+        da_points = da.isel({
+            ydim: xr.DataArray(self.j_index, dims=('station', 'corner')),
+            xdim: xr.DataArray(self.i_index, dims=('station', 'corner'))
+        })
+        da_weights = xr.DataArray(self.weights, dims=('station', 'corner'))
+        # renormalize the weights over the corners with valid values
+        # (missing values at wet corners ex: sea ice or masked data)
+        da_weights = da_weights.where((da_weights > 0.) & da_points.notnull(), 0.)
+        da_total = da_weights.sum(dim='corner')
+        da_station = (
+            (da_points.fillna(0.)*da_weights).sum(dim='corner')
+            / da_total.where(da_total > 0.)
+        )
+        da_station.attrs = da.attrs
+        return da_station
+
+    def _station_coords(self, data):
+        return data.assign_coords(
+            station_lon=('station', self.lon),
+            station_lat=('station', self.lat),
+            station_distance=('station', self.distance)
+        )
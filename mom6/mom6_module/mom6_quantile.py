@@ -0,0 +1,557 @@
+#!/usr/bin/env python
+"""
+The module is created to calculate the quantile of
+each time group (month, dayofyear, ...) of the CEFI
+regional mom6 data for all groups at once.
+
+- grouped_quantile : exact quantiles of all groups from
+  one vectorized sort of the samples (dask parallel over space)
+- windowed_dayofyear_quantile : exact quantiles of each dayofyear
+  pooled over a circular +-N day window (marine heatwave threshold)
+- sketch_grouped_quantile : approximate quantiles from the
+  P-square estimators of each grid cell and time group updated
+  in one sequential pass over the time axis. The state is five
+  markers per cell and group whatever the number of samples.
+"""
+from typing import List, Optional, Union
+import numpy as np
+import xarray as xr
+
+# default memory (bytes) used by the estimators of one block of cells
+DEFAULT_SKETCH_MEMORY = 2**30
+# bytes of the P-square state of one cell and group (5 float64 + 5 int32)
+P2_STATE_BYTES = 60
+
+
+def pad_groups(
+    values : np.ndarray,
+    group_index : np.ndarray,
+    ngroups : int
+) -> np.ndarray:
+    """place the samples of each group in a NaN padded array
+
+    Parameters
+    ----------
+    values : np.ndarray
+        samples along the last axis
+    group_index : np.ndarray
+        group index (0 to ngroups-1) of each sample
+    ngroups : int
+        number of groups
+
+    Returns
+    -------
+    np.ndarray
+        array of shape (..., ngroups, max group size)
+    """
+    group_index = np.asarray(group_index)
+    counts = np.bincount(group_index, minlength=ngroups)
+    order = np.argsort(group_index, kind='stable')
+    # position of each sample in its group
+    position = np.arange(len(order)) - np.repeat(np.cumsum(counts) - counts, counts)
+
+    padded = np.full(
+        values.shape[:-1] + (ngroups, max(counts.max(), 1)), np.nan, dtype='float64'
+    )
+    padded[..., group_index[order], position] = values[..., order]
+    return padded
+
+
+def sorted_quantile(padded : np.ndarray, q : np.ndarray) -> np.ndarray:
+    """'linear' quantiles of the NaN padded samples sorted along the last axis
+    (NaN at the end)
+
+    Parameters
+    ----------
+    padded : np.ndarray
+        sorted samples from `pad_groups`
+    q : np.ndarray
+        1D array of quantiles between 0 and 1
+
+    Returns
+    -------
+    np.ndarray
+        array of shape (padded.shape[:-1], len(q)), NaN when no valid sample
+    """
+    nvalid = (~np.isnan(padded)).sum(axis=-1)
+    rank = np.maximum(nvalid - 1, 0)[..., None]*np.asarray(q, dtype='float64')
+    rank_low = np.floor(rank).astype('int64')
+    rank_high = np.minimum(rank_low + 1, np.maximum(nvalid - 1, 0)[..., None])
+    value_low = np.take_along_axis(padded, rank_low, axis=-1)
+    value_high = np.take_along_axis(padded, rank_high, axis=-1)
+    result = value_low + (rank - rank_low)*(value_high - value_low)
+    result[nvalid == 0] = np.nan
+    return result
+
+
+def grouped_quantile_kernel(
+    values : np.ndarray,
+    group_index : np.ndarray,
+    ngroups : int,
+    q : np.ndarray
+) -> np.ndarray:
+    """NaN-aware 'linear' quantiles of all groups along the last axis
+
+    The samples are placed in a (..., ngroups, max group size) array
+    padded with NaN and sorted once along the last axis.
+
+    Parameters
+    ----------
+    values : np.ndarray
+        samples along the last axis
+    group_index : np.ndarray
+        group index (0 to ngroups-1) of each sample
+    ngroups : int
+        number of groups
+    q : np.ndarray
+        1D array of quantiles between 0 and 1
+
+    Returns
+    -------
+    np.ndarray
+        array of shape (..., ngroups, len(q)), NaN when the group
+        has no valid sample
+    """
+    padded = pad_groups(values, group_index, ngroups)
+    padded.sort(axis=-1)
+    return sorted_quantile(padded, q)
+
+
+def grouped_quantile(
+    da_data : xr.DataArray,
+    q : Union[float, List[float]],
+    group : str,
+    dim : str = 'time',
+    sample_dims : Optional[List[str]] = None
+) -> xr.DataArray:
+    """exact quantiles of each time group in one vectorized call
+
+    Same result as looping over the groups with
+    `where(drop=True).quantile(q, method='linear', skipna=True)`
+    but the samples are sorted once for all groups and the
+    calculation is dask parallel over the non-sample dimensions.
+
+    Parameters
+    ----------
+    da_data : xr.DataArray
+        data (can be dask backed) with the `dim` dimension
+    q : Union[float, List[float]]
+        quantile(s) between 0 and 1
+    group : str
+        datetime component of `dim` defining the groups ex: 'month', 'dayofyear'
+    dim : str, optional
+        time dimension name, by default 'time'
+    sample_dims : List[str], optional
+        other dimensions pooled in the samples ex: ['member'], by default None
+
+    Returns
+    -------
+    xr.DataArray
+        quantile with `group` as the first dimension (after 'quantile'
+        when `q` is a list) replacing the sample dimensions
+    """
+    sample_dims = list(sample_dims or [])
+    group_labels, group_index = np.unique(
+        da_data[f'{dim}.{group}'].values, return_inverse=True
+    )
+    ngroups = len(group_labels)
+    nsample_other = int(np.prod([da_data.sizes[d] for d in sample_dims]))
+    # samples are flattened with the dim axis first
+    sample_group_index = np.repeat(group_index, nsample_other)
+    quantiles = np.atleast_1d(np.asarray(q, dtype='float64'))
+
+    def _kernel(values):
+        values = values.reshape(values.shape[:-(1+len(sample_dims))] + (-1,))
+        return grouped_quantile_kernel(values, sample_group_index, ngroups, quantiles)
+
+    core_dims = [dim] + sample_dims
+    if da_data.chunks is not None:
+        da_data = da_data.chunk({d: -1 for d in core_dims})
+
+    da_quantile = xr.apply_ufunc(
+        _kernel,
+        da_data,
+        input_core_dims=[core_dims],
+        output_core_dims=[[group, 'quantile']],
+        dask='parallelized',
+        output_dtypes=['float64'],
+        dask_gufunc_kwargs={'output_sizes': {group: ngroups, 'quantile': len(quantiles)}},
+        keep_attrs=True
+    )
+    da_quantile = da_quantile.assign_coords({group: group_labels, 'quantile': quantiles})
+    da_quantile = da_quantile.transpose('quantile', group, ...)
+    if np.ndim(q) == 0:
+        da_quantile = da_quantile.isel(quantile=0)
+    return da_quantile
+
+
+def dayofyear_window(
+    values : np.ndarray,
+    dayofyear : np.ndarray,
+    half_width : int = 5
+) -> np.ndarray:
+    """pool the samples of the days within `half_width` days of each
+    dayofyear (circular buffer wrapping across the year boundary)
+
+    Parameters
+    ----------
+    values : np.ndarray
+        samples along the last axis
+    dayofyear : np.ndarray
+        dayofyear (1 to 366) of each sample
+    half_width : int, optional
+        number of days on each side of the dayofyear, by default 5
+
+    Returns
+    -------
+    np.ndarray
+        array of shape (..., 366, (2*half_width+1)*max samples per day)
+        padded with NaN
+    """
+    padded = pad_groups(values, np.asarray(dayofyear) - 1, 366)
+    return np.concatenate(
+        [np.roll(padded, -offset, axis=-2) for offset in range(-half_width, half_width+1)],
+        axis=-1
+    )
+
+
+def _apply_dayofyear_window(
+    da_data : xr.DataArray,
+    kernel,
+    output_dims : List[str],
+    output_sizes : dict,
+    dim : str = 'time'
+) -> xr.DataArray:
+    """apply the kernel on the windowed samples of each spatial chunk"""
+    dayofyear = da_data[f'{dim}.dayofyear'].values
+    present = np.unique(dayofyear)
+    if da_data.chunks is not None:
+        da_data = da_data.chunk({dim: -1})
+
+    da_result = xr.apply_ufunc(
+        lambda values: kernel(values, dayofyear),
+        da_data,
+        input_core_dims=[[dim]],
+        output_core_dims=[['dayofyear'] + output_dims],
+        dask='parallelized',
+        output_dtypes=['float64'],
+        dask_gufunc_kwargs={'output_sizes': {'dayofyear': 366, **output_sizes}},
+        keep_attrs=True
+    )
+    da_result = da_result.assign_coords(dayofyear=np.arange(1, 367))
+    return da_result.sel(dayofyear=present).transpose(*output_dims, 'dayofyear', ...)
+
+
+def windowed_dayofyear_quantile(
+    da_data : xr.DataArray,
+    q : Union[float, List[float]],
+    dim : str = 'time',
+    half_width : int = 5
+) -> xr.DataArray:
+    """quantile of each dayofyear pooled over all years and the days
+    within `half_width` days (Hobday et al. 2016 style threshold)
+
+    The window wraps across the year boundary (day 1 pools the
+    last days of the year). The samples of each window are sorted
+    once, no subset of the data is created for each dayofyear.
+
+    Parameters
+    ----------
+    da_data : xr.DataArray
+        daily data (can be dask backed) with the `dim` dimension
+    q : Union[float, List[float]]
+        quantile(s) between 0 and 1
+    dim : str, optional
+        time dimension name, by default 'time'
+    half_width : int, optional
+        number of days on each side of the dayofyear, by default 5
+
+    Returns
+    -------
+    xr.DataArray
+        quantile with 'dayofyear' as the first dimension (after
+        'quantile' when `q` is a list) replacing `dim`
+    """
+    quantiles = np.atleast_1d(np.asarray(q, dtype='float64'))
+
+    def _kernel(values, dayofyear):
+        window = dayofyear_window(values, dayofyear, half_width)
+        window.sort(axis=-1)
+        return sorted_quantile(window, quantiles)
+
+    da_quantile = _apply_dayofyear_window(
+        da_data, _kernel, ['quantile'], {'quantile': len(quantiles)}, dim=dim
+    ).assign_coords(quantile=quantiles)
+    if np.ndim(q) == 0:
+        da_quantile = da_quantile.isel(quantile=0)
+    return da_quantile
+
+
+def windowed_dayofyear_mean(
+    da_data : xr.DataArray,
+    dim : str = 'time',
+    half_width : int = 5
+) -> xr.DataArray:
+    """mean of each dayofyear pooled over all years and the days
+    within `half_width` days (window wraps across the year boundary)
+
+    Parameters
+    ----------
+    da_data : xr.DataArray
+        daily data (can be dask backed) with the `dim` dimension
+    dim : str, optional
+        time dimension name, by default 'time'
+    half_width : int, optional
+        number of days on each side of the dayofyear, by default 5
+
+    Returns
+    -------
+    xr.DataArray
+        climatology with 'dayofyear' as the first dimension replacing `dim`
+    """
+    def _kernel(values, dayofyear):
+        window = dayofyear_window(values, dayofyear, half_width)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return (
+                np.nansum(window, axis=-1)/(~np.isnan(window)).sum(axis=-1)
+            )[..., None]
+
+    return _apply_dayofyear_window(
+        da_data, _kernel, ['window'], {'window': 1}, dim=dim
+    ).isel(window=0)
+
+
+class GroupedP2Quantile:
+    """
+    P-square quantile estimators (Jain and Chlamtac 1985) of
+    many cells and time groups
+
+    Each group and cell keeps five marker heights and positions
+    (60 bytes) whatever the number of samples, so the state is
+    smaller than the samples as soon as a group has more than
+    about eight samples per cell (a 30-year dayofyear threshold
+    keeps 22 KB per cell instead of 88 KB of float64 samples).
+    Groups with less than five samples use the exact quantile
+    of the stored samples. The estimate is approximate (for the
+    0.9 quantile of normal samples the mean error is about 0.07,
+    0.02 and 0.003 standard deviation with 120, 1000 and 10000
+    samples), use the exact method for short records.
+
+    Parameters
+    ----------
+    q : float
+        quantile between 0 and 1
+    ncell : int
+        number of cells
+    ngroups : int
+        number of time groups
+
+    Examples
+    --------
+    sketch = GroupedP2Quantile(0.9, ncell, ngroups=366)
+    for values, groups in slabs:
+        sketch.update(values, groups)
+    threshold = sketch.quantile()
+    """
+    def __init__(
+        self,
+        q : float,
+        ncell : int,
+        ngroups : int
+    ) -> None:
+        self.q = q
+        self.ncell = ncell
+        self.ngroups = ngroups
+        # marker increments of the desired positions
+        self.increment = np.array([0., q/2., q, (1.+q)/2., 1.])
+        # marker heights and positions (1-based, the last position
+        # is the sample count) stored marker first so that each
+        # marker of a group is contiguous over the cells
+        self.heights = np.zeros((5, ngroups, ncell), dtype='float64')
+        self.positions = np.zeros((5, ngroups, ncell), dtype='int32')
+
+    def update(self, values:np.ndarray, groups:np.ndarray):
+        """add the values of a time slab to the estimators
+
+        Parameters
+        ----------
+        values : np.ndarray
+            values of shape (ntime, ncell), NaN are skipped
+        groups : np.ndarray
+            group index (0 to ngroups-1) of each time step
+        """
+        values = np.asarray(values, dtype='float64').reshape(-1, self.ncell)
+        for value, group in zip(values, np.asarray(groups)):
+            self._add(value, group)
+
+    def _add(self, value:np.ndarray, group:int):
+        """add one time step (value of all cells) to its group"""
+        heights = self.heights[:, group]
+        positions = self.positions[:, group]
+        valid = np.isfinite(value)
+        count = positions[4].copy()
+
+        # first five samples are stored and sorted
+        fill = np.nonzero(valid & (count < 5))[0]
+        if fill.size:
+            heights[count[fill], fill] = value[fill]
+            positions[4, fill] += 1
+            full = fill[positions[4, fill] == 5]
+            heights[:, full] = np.sort(heights[:, full], axis=0)
+            positions[:, full] = np.arange(1, 6)[:, None]
+
+        update = valid & (count >= 5)
+        if update.all():
+            cell = slice(None)
+        else:
+            cell = np.nonzero(update)[0]
+            if cell.size == 0:
+                return
+        x = value[cell]
+        h = [heights[j, cell] for j in range(5)]
+        n = [positions[j, cell].astype('float64') for j in range(5)]
+
+        # marker interval k with h[k] <= x < h[k+1] (extremes extended)
+        above = [x >= h[j] for j in range(1, 4)]
+        h[0] = np.minimum(h[0], x)
+        h[4] = np.maximum(h[4], x)
+        for j in range(1, 4):
+            n[j] += ~above[j-1]
+        n[4] += 1.
+
+        # adjust the middle markers with the piecewise parabolic formula
+        for i in range(1, 4):
+            delta = 1. + (n[4] - 1.)*self.increment[i] - n[i]
+            up = (delta >= 1.) & (n[i+1] - n[i] > 1.)
+            down = (delta <= -1.) & (n[i-1] - n[i] < -1.)
+            if not (up.any() or down.any()):
+                continue
+            sign = up.astype('float64') - down
+            parabolic = h[i] + sign/(n[i+1] - n[i-1])*(
+                (n[i] - n[i-1] + sign)*(h[i+1] - h[i])/(n[i+1] - n[i])
+                + (n[i+1] - n[i] - sign)*(h[i] - h[i-1])/(n[i] - n[i-1])
+            )
+            linear = np.where(
+                up,
+                h[i] + (h[i+1] - h[i])/(n[i+1] - n[i]),
+                h[i] - (h[i-1] - h[i])/(n[i-1] - n[i])
+            )
+            in_order = (h[i-1] < parabolic) & (parabolic < h[i+1])
+            h[i] = np.where(up | down, np.where(in_order, parabolic, linear), h[i])
+            n[i] += sign
+
+        for j in range(5):
+            heights[j, cell] = h[j]
+            positions[j, cell] = n[j]
+
+    def quantile(self) -> np.ndarray:
+        """estimated quantile of each group and cell
+
+        Returns
+        -------
+        np.ndarray
+            array of shape (ngroups, ncell), NaN when no valid value
+        """
+        count = self.positions[4]
+        result = self.heights[2].copy()
+
+        # exact 'linear' quantile of the groups with less than five samples
+        small = (count > 0) & (count < 5)
+        stored = np.sort(np.where(
+            np.arange(5)[:, None] < count[small][None, :], self.heights[:, small], np.inf
+        ), axis=0)
+        rank = (count[small] - 1)*self.q
+        rank_low = np.floor(rank).astype('int64')
+        rank_high = np.minimum(rank_low + 1, count[small] - 1)
+        columns = np.arange(stored.shape[1])
+        value_low = stored[rank_low, columns]
+        value_high = stored[rank_high, columns]
+        result[small] = value_low + (rank - rank_low)*(value_high - value_low)
+        result[count == 0] = np.nan
+        return result
+
+
+def sketch_grouped_quantile(
+    da_data : xr.DataArray,
+    q : float,
+    group : str,
+    dim : str = 'time',
+    slab_size : int = 365,
+    max_memory : int = DEFAULT_SKETCH_MEMORY
+) -> xr.DataArray:
+    """approximate quantile of each time group from the P-square
+    estimators (see `GroupedP2Quantile`)
+
+    The time axis is read once in slabs of `slab_size` and the
+    estimators of all groups are updated in the same pass. When the
+    estimators of all cells do not fit in `max_memory`, the cells are
+    processed in blocks along the first non-time dimension (each block
+    reads only its own part of the data, no separate min/max pass).
+
+    Parameters
+    ----------
+    da_data : xr.DataArray
+        data (can be dask backed) with the `dim` dimension
+    q : float
+        quantile between 0 and 1
+    group : str
+        datetime component of `dim` defining the groups ex: 'month', 'dayofyear'
+    dim : str, optional
+        time dimension name, by default 'time'
+    slab_size : int, optional
+        number of time steps read at once, by default 365
+    max_memory : int, optional
+        bytes of estimator state kept in memory, by default 1 GiB
+
+    Returns
+    -------
+    xr.DataArray
+        quantile with `group` as the first dimension replacing `dim`
+    """
+    group_values = da_data[f'{dim}.{group}'].values
+    group_labels, group_index = np.unique(group_values, return_inverse=True)
+    ngroups = len(group_labels)
+
+    da_data = da_data.transpose(dim, ...)
+    other_dims = list(da_data.dims[1:])
+    ntime = da_data.sizes[dim]
+
+    # block of cells along the first non-time dimension
+    if other_dims:
+        block_dim = other_dims[0]
+        cells_per_row = int(np.prod([da_data.sizes[d] for d in other_dims[1:]]))
+        bytes_per_row = ngroups*cells_per_row*P2_STATE_BYTES
+        rows_per_block = max(int(max_memory//max(bytes_per_row, 1)), 1)
+        blocks = [
+            {block_dim: slice(start, start+rows_per_block)}
+            for start in range(0, da_data.sizes[block_dim], rows_per_block)
+        ]
+    else:
+        blocks = [{}]
+
+    results = []
+    for block in blocks:
+        da_block = da_data.isel(block)
+        block_shape = da_block.shape[1:]
+        sketch = GroupedP2Quantile(q, int(np.prod(block_shape)), ngroups)
+        for start in range(0, ntime, slab_size):
+            time_slice = slice(start, start+slab_size)
+            sketch.update(
+                da_block.isel({dim: time_slice}).values,
+                group_index[time_slice]
+            )
+        results.append(sketch.quantile().reshape((ngroups,) + block_shape))
+
+    coords = {
+        name: coord for name, coord in da_data.coords.items()
+        if dim not in coord.dims
+    }
+    coords[group] = group_labels
+    coords['quantile'] = q
+    return xr.DataArray(
+        np.concatenate(results, axis=1) if other_dims else results[0],
+        dims=[group] + other_dims,
+        coords=coords,
+        attrs=da_data.attrs,
+        name=da_data.name
+    )
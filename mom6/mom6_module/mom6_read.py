@@ -7,12 +7,14 @@ data structure.
 import os
 import glob
 import warnings
-from typing import Optional
-import requests
-import fsspec
-from bs4 import BeautifulSoup, NavigableString
+from typing import Optional, List, Tuple, Dict
 import xarray as xr
 from mom6.data_structure import portal_data
+from mom6.data_structure.cefi_index import CefiIndex
+from mom6.mom6_module.mom6_cache import CatalogCache, BlockCache
+from mom6.mom6_module import mom6_subset
+from mom6.mom6_module import mom6_points
+from mom6.mom6_module import mom6_static
 from mom6.mom6_module.mom6_types import (
     ModelRegionOptions,
     ModelSubdomainOptions,
@@ -21,10 +23,50 @@ from mom6.mom6_module.mom6_types import (
     ModelGridTypeOptions,
     DataSourceOptions
 )
+from mom6.mom6_module.util import lazy_import
+
+# remote access backends loaded on first use
+requests = lazy_import('requests')
+fsspec = lazy_import('fsspec')
+bs4 = lazy_import('bs4')
+mom6_kerchunk = lazy_import('mom6.mom6_module.mom6_kerchunk')
 
 warnings.simplefilter("ignore")
 xr.set_options(keep_attrs=True)
 
+# PSL THREDDS server of the CEFI regional mom6 data
+CATALOG_HEAD = 'https://psl.noaa.gov/thredds/catalog/'
+OPENDAP_HEAD = 'https://psl.noaa.gov/thredds/dodsC/'
+REGIONAL_MOM6_PATH = 'Projects/CEFI/regional_mom6'
+
+
+def parse_catalog_html(html_text:str) -> Optional[list]:
+    """parse the THREDDS catalog.html to get all the
+    listed items (files and sub-directories)
+
+    Parameters
+    ----------
+    html_text : str
+        the html text of the catalog.html
+
+    Returns
+    -------
+    list or None
+        all listed names in the catalog,
+        None when the catalog content is not found
+    """
+    # Parse the html response
+    soup = bs4.BeautifulSoup(html_text, 'html.parser')
+    # get all div tag with class name including "content"
+    div_content = soup.find('div', class_='content')
+    if div_content and not isinstance(div_content, bs4.NavigableString):
+        # get all a tag within the subset div_content
+        a_tags = div_content.find_all('a')
+        # get all code tag within the subset a_tags
+        return [a_tag.find_all('code')[0].text for a_tag in a_tags]
+    return None
+
+
 class OpenDapStore:
     """class to handle the OPeNDAP request
 
@@ -42,6 +84,9 @@ class OpenDapStore:
         model grid type
     release_date : str
         release date in the format of "rYYYYMMDD"
+    catalog_cache : CatalogCache, optional
+        persistent cache of the catalog listing, by default
+        a `CatalogCache()` under the default cache directory
     """
     def __init__(
         self,
@@ -50,7 +95,8 @@ class OpenDapStore:
         experiment_type : ModelExperimentTypeOptions,
         output_frequency : ModelOutputFrequencyOptions,
         grid_type : ModelGridTypeOptions,
-        release : str
+        release : str,
+        catalog_cache : Optional[CatalogCache] = None
     ) -> None:
         self.region = region
         self.subdomain = subdomain
@@ -72,10 +118,6 @@ class OpenDapStore:
         self.cefi_rel_dir = cefi_data_path.cefi_dir
 
         # construct the catalog/opendap url
-        CATALOG_HEAD = 'https://psl.noaa.gov/thredds/catalog/'
-        OPENDAP_HEAD = 'https://psl.noaa.gov/thredds/dodsC/'
-        REGIONAL_MOM6_PATH = 'Projects/CEFI/regional_mom6'
-
         self.catalog_url = os.path.join(
             CATALOG_HEAD,
             REGIONAL_MOM6_PATH,
@@ -89,6 +131,32 @@ class OpenDapStore:
             self.cefi_rel_dir
         )
 
+        if catalog_cache is None:
+            catalog_cache = CatalogCache()
+        self.catalog_cache = catalog_cache
+
+        # use the cached catalog listing before requesting the server
+        self.all_file_list = self.catalog_cache.get('opendap', self.cefi_rel_dir)
+        if self.all_file_list is None:
+            self.all_file_list = self.fetch_catalog()
+
+    def fetch_catalog(self) -> Optional[list]:
+        """request the catalog listing from the THREDDS server
+        and store the listing in the catalog cache
+
+        Returns
+        -------
+        list or None
+            all listed names in the catalog,
+            None when the catalog content is not found
+
+        Raises
+        ------
+        FileNotFoundError
+            When the release is not available
+        ConnectionError
+            When the server does not respond
+        """
         try:
             # Make the request
             html_response = requests.get(self.catalog_url, timeout=10)
@@ -96,6 +164,10 @@ class OpenDapStore:
             if html_response.status_code == 200:
                 # Response is OK
                 print(f"Success: URL {self.catalog_url} responded with status 200.")
+                all_file_list = parse_catalog_html(html_response.text)
+                if all_file_list is not None:
+                    self.catalog_cache.set('opendap', self.cefi_rel_dir, all_file_list)
+                return all_file_list
 
             else:
                 # dealing with the non-200 response due to the release date
@@ -110,14 +182,8 @@ class OpenDapStore:
                 # find the parent before release exist
                 if release_response.status_code == 200:
                     # Parse the html response
-                    soup = BeautifulSoup(release_response.text, 'html.parser')
-                    # get all div tag with class name including "content"
-                    div_content = soup.find('div', class_='content')
-                    if div_content and not isinstance(div_content, NavigableString):
-                        # get all a tag within the subset div_content
-                        a_tags = div_content.find_all('a')
-                        # get all code tag within the subset a_tags
-                        all_release_list = [a_tag.find_all('code')[0].text for a_tag in a_tags]
+                    all_release_list = parse_catalog_html(release_response.text)
+                    if all_release_list is not None:
                         print('--------------------------------')
                         print('Current release data is not valid. Available releases are:')
                         for release_dir in all_release_list:
@@ -141,6 +207,11 @@ class OpenDapStore:
             # Handle connection failure here
             raise ConnectionError('Error: Server not responding.') from e
 
+    def refresh_catalog(self):
+        """drop the cached catalog listing and request the listing again"""
+        self.catalog_cache.invalidate('opendap', self.cefi_rel_dir)
+        self.all_file_list = self.fetch_catalog()
+
     def get_files(self,variable:Optional[str]=None)-> list:
         """Getting file opendap urls
 
@@ -164,18 +235,9 @@ class OpenDapStore:
             needed.
         """
 
-        html_response = requests.get(self.catalog_url, timeout=10)
-
-        # Parse the html response
-        soup = BeautifulSoup(html_response.text, 'html.parser')
-
-        # get all div tag with class name including "content"
-        div_content = soup.find('div', class_='content')
-        if div_content and not isinstance(div_content, NavigableString):
-            # get all a tag within the subset div_content
-            a_tags = div_content.find_all('a')
-            # get all code tag within the subset a_tags
-            all_file_list = [a_tag.find_all('code')[0].text for a_tag in a_tags]
+        # catalog listing from the cache or from the request in __init__
+        all_file_list = self.all_file_list
+        if all_file_list is not None:
 
             # include only netcdf file
             files = []
@@ -221,6 +283,9 @@ class GCSStore:
         model grid type
     release_date : str
         release date in the format of "rYYYYMMDD"
+    catalog_cache : CatalogCache, optional
+        persistent cache of the bucket listing, by default
+        a `CatalogCache()` under the default cache directory
     """
     def __init__(
         self,
@@ -229,7 +294,8 @@ class GCSStore:
         experiment_type : ModelExperimentTypeOptions,
         output_frequency : ModelOutputFrequencyOptions,
         grid_type : ModelGridTypeOptions,
-        release : str
+        release : str,
+        catalog_cache : Optional[CatalogCache] = None
     ) -> None:
         self.region = region
         self.subdomain = subdomain
@@ -250,6 +316,7 @@ class GCSStore:
 
         # remove "cefi_portal" dir at the top rel path
         parse_path = cefi_data_path.cefi_dir
+        self.cefi_dir = parse_path
         self.cefi_rel_dir = os.path.join(*parse_path.split('/')[1:])
 
 
@@ -263,15 +330,45 @@ class GCSStore:
         )
         # print(self.cefi_rel_dir)
 
+        if catalog_cache is None:
+            catalog_cache = CatalogCache()
+        self.catalog_cache = catalog_cache
+
+        # use the cached bucket listing before requesting the bucket
+        self.all_objs = self.catalog_cache.get('gcs', self.cefi_dir)
+        if self.all_objs is None:
+            self.all_objs = self.fetch_catalog()
+
+    def fetch_catalog(self) -> list:
+        """list the objects in the bucket directory
+        and store the listing in the catalog cache
+
+        Returns
+        -------
+        list
+            all object names in the bucket directory
+
+        Raises
+        ------
+        FileNotFoundError
+            When the release is not available
+        """
         try:
             # Make the request
             fs = fsspec.filesystem("gcs", anon=True)
-            self.all_objs = fs.ls(self.cloud_obj_parent_name, detail=False)
+            all_objs = fs.ls(self.cloud_obj_parent_name, detail=False)
             print(f"Files are available on GCS ({self.cloud_obj_parent_name})")
         except FileNotFoundError as e:
             gcs_url = 'https://console.cloud.google.com/storage/browser/noaa-oar-cefi-regional-mom6'
             raise FileNotFoundError(f"Please check if the release number is available at {gcs_url}.") from e
 
+        self.catalog_cache.set('gcs', self.cefi_dir, all_objs)
+        return all_objs
+
+    def refresh_catalog(self):
+        """drop the cached bucket listing and list the bucket again"""
+        self.catalog_cache.invalidate('gcs', self.cefi_dir)
+        self.all_objs = self.fetch_catalog()
 
     def get_files(self,variable:Optional[str]=None)-> list:
         """Getting file GCS links
@@ -346,6 +443,9 @@ class S3Store:
         model grid type
     release_date : str
         release date in the format of "rYYYYMMDD"
+    catalog_cache : CatalogCache, optional
+        persistent cache of the bucket listing, by default
+        a `CatalogCache()` under the default cache directory
     """
     def __init__(
         self,
@@ -354,7 +454,8 @@ class S3Store:
         experiment_type : ModelExperimentTypeOptions,
         output_frequency : ModelOutputFrequencyOptions,
         grid_type : ModelGridTypeOptions,
-        release : str
+        release : str,
+        catalog_cache : Optional[CatalogCache] = None
     ) -> None:
         self.region = region
         self.subdomain = subdomain
@@ -375,6 +476,7 @@ class S3Store:
 
         # remove "cefi_portal" dir at the top rel path
         parse_path = cefi_data_path.cefi_dir
+        self.cefi_dir = parse_path
         self.cefi_rel_dir = os.path.join(*parse_path.split('/')[1:])
 
 
@@ -388,15 +490,42 @@ class S3Store:
         )
         # print(self.cefi_rel_dir)
 
+        if catalog_cache is None:
+            catalog_cache = CatalogCache()
+        self.catalog_cache = catalog_cache
+
+        # use the cached bucket listing before requesting the bucket
+        self.all_objs = self.catalog_cache.get('s3', self.cefi_dir)
+        if self.all_objs is None:
+            self.all_objs = self.fetch_catalog()
+
+    def fetch_catalog(self) -> Optional[list]:
+        """list the objects in the bucket directory
+        and store the listing in the catalog cache
+
+        Returns
+        -------
+        list or None
+            all object names in the bucket directory,
+            None when the release is not available
+        """
         try:
             # Make the request
             fs = fsspec.filesystem("s3", anon=True)
-            self.all_objs = fs.ls(self.cloud_obj_parent_name, detail=False)
+            all_objs = fs.ls(self.cloud_obj_parent_name, detail=False)
             print(f"Files are available on S3 ({self.cloud_obj_parent_name})")
         except FileNotFoundError :
             s3_url = 'https://noaa-oar-cefi-regional-mom6-pds.s3.amazonaws.com/index.html'
             print(f"Please check if the release number is available at {s3_url}.")
+            return None
 
+        self.catalog_cache.set('s3', self.cefi_dir, all_objs)
+        return all_objs
+
+    def refresh_catalog(self):
+        """drop the cached bucket listing and list the bucket again"""
+        self.catalog_cache.invalidate('s3', self.cefi_dir)
+        self.all_objs = self.fetch_catalog()
 
     def get_files(self,variable:Optional[str]=None)-> list:
         """Getting file S3 links
@@ -477,6 +606,9 @@ class LocalStore:
         model grid type
     release_date : str
         release date in the format of "rYYYYMMDD"
+    metadata_index : CefiIndex, optional
+        SQLite index of the local tree used to list the files
+        instead of scanning the directory, by default None
 
     Raises
     ------
@@ -492,10 +624,12 @@ class LocalStore:
         experiment_type : ModelExperimentTypeOptions,
         output_frequency : ModelOutputFrequencyOptions,
         grid_type : ModelGridTypeOptions,
-        release : str
+        release : str,
+        metadata_index : Optional[CefiIndex] = None
     ) -> None:
 
         self.local_top_dir = local_top_dir
+        self.metadata_index = metadata_index
         self.region = region
         self.subdomain = subdomain
         self.experiment_type = experiment_type
@@ -571,6 +705,21 @@ class LocalStore:
             or code must have some incorrect pairing. Debug possibly 
             needed.
         """
+        if self.metadata_index is not None:
+            filtered_files = self.metadata_index.files(
+                top_directory=portal_data.DataStructure.top_directory[0],
+                region=self.region,
+                subdomain=self.subdomain,
+                experiment_type=self.experiment_type,
+                output_frequency=self.output_frequency,
+                grid_type=self.grid_type,
+                release=self.release,
+                variable=variable
+            )
+            if not filtered_files :
+                raise FileNotFoundError('No files available based on input')
+            return filtered_files
+
         # include only netcdf file
         files = sorted(glob.glob(
             os.path.join(self.cefi_local_dir,'*.nc')
@@ -591,6 +740,116 @@ class LocalStore:
 
         return filtered_files
 
+    def get_references(self,variable:Optional[str]=None)-> list:
+        """Getting kerchunk json reference in local storage
+        (created by `mom6_kerchunk.build_release_references`)
+
+        Parameters
+        ----------
+        variable : str
+            variable short name ex:'tos' for sea surface temperature
+
+        Returns
+        -------
+        list
+            a list of json reference path
+
+        Raises
+        ------
+        FileNotFoundError
+            When no reference exists for the input
+        """
+        files = sorted(glob.glob(
+            os.path.join(self.cefi_local_dir,'*.json')
+        ))
+
+        filtered_files = []
+        for file in files:
+            if variable is None or variable == file.split('/')[-1].split('.')[0] :
+                filtered_files.append(file)
+
+        if not filtered_files :
+            raise FileNotFoundError('Kerchunk json file not ready')
+
+        return filtered_files
+
+def filter_files_by_time(
+    files : List[str],
+    start = None,
+    end = None,
+    inits : Optional[list] = None
+) -> List[str]:
+    """keep only the files overlapping the time period based on
+    the date range ('YYYYMM-YYYYMM') or the initialization ('iYYYYMM')
+    in the cefi filename. No file is opened.
+
+    The forecast files are filtered on the initialization date
+    (the initialization month overlapping the period), not on
+    the period covered by the forecast leads.
+
+    Parameters
+    ----------
+    files : List[str]
+        cefi file paths/urls (netcdf or kerchunk json)
+    start : str, datetime or np.datetime64, optional
+        start of the period ex: '1993-01-01', by default None
+    end : str, datetime or np.datetime64, optional
+        end of the period (inclusive) ex: '1997-12-31', by default None
+    inits : list, optional
+        initialization months ex: ['1993-03', 'i199403'], by default None
+
+    Returns
+    -------
+    List[str]
+        files overlapping the period. Files without the cefi date
+        information in the filename are kept.
+
+    Raises
+    ------
+    FileNotFoundError
+        When no file overlaps the period
+    """
+    if start is None and end is None and inits is None:
+        return files
+
+    start = None if start is None else portal_data.to_datetime64(start)
+    end = None if end is None else portal_data.to_datetime64(end)
+    init_months = None
+    if inits is not None:
+        init_months = {portal_data.to_datetime64(init, 'M') for init in inits}
+
+    filtered_files = []
+    for file in files:
+        record = portal_data.parse_filename(file)
+        if record is None:
+            if not mom6_kerchunk.is_combined_reference(file):
+                filtered_files.append(file)
+            continue
+        period_start, period_end = record.time_period
+        if start is not None and period_end <= start:
+            continue
+        if end is not None and period_start > end:
+            continue
+        if init_months is not None and period_start.astype('datetime64[M]') not in init_months:
+            continue
+        filtered_files.append(file)
+
+    if not filtered_files:
+        raise FileNotFoundError('No files available based on the time period')
+
+    return filtered_files
+
+
+def _stored_chunks(ds:xr.Dataset) -> dict:
+    """chunk size of each dimension stored in the file
+    (from the encoding of the opened variables)"""
+    stored_chunks = {}
+    for var in ds.data_vars:
+        preferred = ds[var].encoding.get('preferred_chunks', {})
+        for dim, size in preferred.items():
+            stored_chunks.setdefault(dim, size)
+    return stored_chunks
+
 class AccessFiles:
     """
     Frontend Class for user to get various mom6 simulation
@@ -617,6 +876,20 @@ class AccessFiles:
     local_top_dir : str
         the absolution path to the local CEFI data.
         should be the absolute path before cefi_porta/...
+    catalog_cache : CatalogCache, optional
+        persistent cache of the remote listing used by 'opendap', 's3'
+        and 'gcs', by default a `CatalogCache()` under the default
+        cache directory. Use `CatalogCache(ttl=0)` to always request
+        the listing from the server.
+    block_cache : BlockCache, optional
+        local cache of the byte blocks read from 's3' and 'gcs'
+        through the kerchunk references, by default None (no cache).
+        OPeNDAP requests are made by the netCDF library and are
+        not cached.
+    metadata_index : CefiIndex, optional
+        SQLite index of the local tree (`CefiIndex(local_top_dir)`)
+        used by 'local' to list the files without scanning the
+        directory, by default None
     """
     def __init__(
         self,
@@ -628,9 +901,13 @@ class AccessFiles:
         release : str,
         data_source : DataSourceOptions,
         local_top_dir : Optional[str] = None,
+        catalog_cache : Optional[CatalogCache] = None,
+        block_cache : Optional[BlockCache] = None,
+        metadata_index : Optional[CefiIndex] = None
     ) -> None:
 
         self.storage = None
+        self.block_cache = block_cache
 
         # check data source
         if data_source == 'local':
@@ -644,7 +921,8 @@ class AccessFiles:
                     experiment_type,
                     output_frequency,
                     grid_type,
-                    release
+                    release,
+                    metadata_index=metadata_index
                 )
         elif data_source == 'opendap':
             self.storage = OpenDapStore(
@@ -653,7 +931,8 @@ class AccessFiles:
                 experiment_type,
                 output_frequency,
                 grid_type,
-                release
+                release,
+                catalog_cache=catalog_cache
             )
         elif data_source == 's3':
             self.storage = S3Store(
@@ -662,7 +941,8 @@ class AccessFiles:
                 experiment_type,
                 output_frequency,
                 grid_type,
-                release
+                release,
+                catalog_cache=catalog_cache
             )
         elif data_source == 'gcs':
             self.storage = GCSStore(
@@ -671,19 +951,38 @@ class AccessFiles:
                 experiment_type,
                 output_frequency,
                 grid_type,
-                release
+                release,
+                catalog_cache=catalog_cache
             )
         else :
             raise ValueError('only "local", "opendap", "s3", and "gcs" are available')
 
-    def get(self,variable:Optional[str]=None, print_list=False)-> list:
+    def get(
+        self,
+        variable : Optional[str] = None,
+        print_list : bool = False,
+        start = None,
+        end = None,
+        inits : Optional[list] = None
+    )-> list:
         """Getting files from storage
 
         Parameters
         ----------
         variable : str
             variable short name ex:'tos' for sea surface temperature
-        
+        print_list : bool, optional
+            print the file list, by default False
+        start : str, datetime or np.datetime64, optional
+            only files covering time after start ex: '1993-01-01', by default None
+            (forecast files by the initialization date, not the lead times)
+        end : str, datetime or np.datetime64, optional
+            only files covering time before end (inclusive), by default None
+            (forecast files by the initialization date, not the lead times)
+        inits : list, optional
+            only the forecast files of the initialization months
+            ex: ['1993-03', 'i199403'], by default None
+
         Returns
         -------
         list
@@ -693,11 +992,373 @@ class AccessFiles:
 
         """
         if self.storage:
-            files = self.storage.get_files(variable)
+            files = filter_files_by_time(
+                self.storage.get_files(variable), start, end, inits
+            )
             if print_list :
                 print('--------- All available files ------------')
                 for file in files:
                     print(file)
             return files
         else:
-            raise FileNotFoundError('the storage is not assigned')
\ No newline at end of file
+            raise FileNotFoundError('the storage is not assigned')
+
+    def refresh_catalog(self):
+        """Drop the cached remote listing of the storage and
+        request the listing again. Local storage is always listed
+        from the disk so nothing is refreshed.
+        """
+        if self.storage is None:
+            raise FileNotFoundError('the storage is not assigned')
+        if isinstance(self.storage, LocalStore):
+            return
+        self.storage.refresh_catalog()
+
+    def open(
+        self,
+        variable : str,
+        chunks : Optional[dict] = None,
+        merge_static : bool = True,
+        use_references : bool = True,
+        bbox : Optional[Tuple[float, float, float, float]] = None,
+        polygon : Optional[List[Tuple[float, float]]] = None,
+        z_range : Optional[Tuple[float, float]] = None,
+        start = None,
+        end = None,
+        inits : Optional[list] = None
+    ) -> xr.Dataset:
+        """Open all files of the variable lazily as one dataset
+
+        The files are combined along 'init' for the forecast type of
+        data and along 'time' for the rest. The dask chunks follow
+        `portal_data.FileChunking` rounded to a multiple of the chunks
+        stored in the files so one dask task never reads a partial
+        HDF5 chunk or a chunk twice.
+
+        The spatial (bbox/polygon) and depth (z_range) subset are
+        converted to index slices of xh/yh/xq/yq/z_l/z_i by
+        `mom6_subset` and applied before reading so only the
+        hyperslab is requested from the file or the OPeNDAP server.
+
+        Parameters
+        ----------
+        variable : str
+            variable short name ex:'tos' for sea surface temperature
+        chunks : dict, optional
+            dask chunks of each dimension, by default the
+            chunking from `portal_data.FileChunking`
+        merge_static : bool, optional
+            merge the grid information in ocean_static file
+            (geolon, geolat, deptho, wet, ...), by default True.
+            The merged variables are writable copies of the shared
+            read-only `static_grid`.
+        use_references : bool, optional
+            open the kerchunk references when available
+            (always used for 's3' and 'gcs'), by default True
+        bbox : Tuple[float, float, float, float], optional
+            (lon_min, lon_max, lat_min, lat_max) bounding box, by default None
+        polygon : List[Tuple[float, float]], optional
+            (lon, lat) vertices of a polygon. The index box covering
+            the polygon is read, use `GridIndex.polygon_mask` to mask
+            the cells outside the polygon, by default None
+        z_range : Tuple[float, float], optional
+            (z_min, z_max) depth range in meter, by default None
+        start : str, datetime or np.datetime64, optional
+            only open the files covering time after start, by default None
+        end : str, datetime or np.datetime64, optional
+            only open the files covering time before end (inclusive), by default None
+        inits : list, optional
+            only open the forecast files of the initialization months
+            ex: ['1993-03', 'i199403'], by default None
+
+        Returns
+        -------
+        xr.Dataset
+            lazily loaded dataset. The time filter selects files
+            so the dataset covers the whole period of the selected files.
+            The opened files are listed in `ds.encoding['source_files']`.
+        """
+        if self.storage is None:
+            raise FileNotFoundError('the storage is not assigned')
+
+        time_filter = {'start': start, 'end': end, 'inits': inits}
+        slices = None
+        if bbox is not None or polygon is not None or z_range is not None:
+            grid_index = None
+            if bbox is not None or polygon is not None:
+                grid_index = self.grid_index(use_references)
+            ds_vertical = None
+            if z_range is not None:
+                # only the vertical coordinate is read
+                ds_vertical = self._open_variable(
+                    variable, {}, use_references, time_filter=time_filter
+                )
+            slices = mom6_subset.subset_slices(
+                grid_index, bbox=bbox, polygon=polygon, z_range=z_range, ds=ds_vertical
+            )
+
+        ds = self._open_variable(variable, chunks, use_references, slices, time_filter)
+        files = ds.encoding['source_files']
+
+        if merge_static and variable != 'ocean_static':
+            try:
+                ds_static = self.static_grid(use_references).dataset
+            except FileNotFoundError:
+                print('ocean_static not available, grid information not merged')
+            else:
+                if slices:
+                    ds_static = ds_static.isel(
+                        {dim: slices[dim] for dim in slices if dim in ds_static.dims}
+                    )
+                # the shared static arrays stay read-only
+                ds = xr.merge([ds, ds_static.copy(deep=True)], combine_attrs='override')
+
+        # input identity of the derived array cache (mom6_cache.DerivedCache)
+        ds.encoding['source_files'] = files
+
+        return ds
+
+    def static_grid(
+        self,
+        use_references : bool = True,
+        mmap : bool = False
+    ) -> mom6_static.StaticGrid:
+        """Static grid (ocean_static and the rotation angle in ice_static)
+        of the release. The grid is loaded once per process and shared
+        by all `AccessFiles` with the same region, subdomain, grid type
+        and release.
+
+        Parameters
+        ----------
+        use_references : bool, optional
+            open the kerchunk references when available, by default True
+        mmap : bool, optional
+            memory-map the read-only arrays from the cache directory,
+            by default False
+
+        Returns
+        -------
+        mom6_static.StaticGrid
+            read-only static grid
+
+        Raises
+        ------
+        FileNotFoundError
+            When the ocean_static file is not available
+        """
+        static_files = self.storage.get_files('ocean_static')
+        try:
+            rotation_files = self.storage.get_files('ice_static')
+        except FileNotFoundError:
+            rotation_files = []
+        signature = tuple(static_files + rotation_files)
+        if isinstance(self.storage, LocalStore):
+            # local static file can be regenerated
+            signature = tuple(
+                (file, os.path.getmtime(file), os.path.getsize(file))
+                for file in signature
+            )
+
+        def _load():
+            ds_static = self._open_variable('ocean_static', {}, use_references)
+            ds_rotation = None
+            if rotation_files:
+                ds_rotation = self._open_variable('ice_static', {}, use_references)
+            return ds_static, ds_rotation
+
+        key = (
+            self.storage.region,
+            self.storage.subdomain,
+            self.storage.grid_type,
+            self.storage.release
+        )
+        return mom6_static.get_static_grid(key, _load, signature=signature, mmap=mmap)
+
+    def grid_index(self, use_references : bool = True) -> mom6_subset.GridIndex:
+        """Spatial index of the grid in the ocean_static file.
+        The index is built once per static grid and cached in the process.
+
+        Parameters
+        ----------
+        use_references : bool, optional
+            open the kerchunk references when available, by default True
+
+        Returns
+        -------
+        mom6_subset.GridIndex
+            grid index used to convert the geographical subset to index slices
+        """
+        return self.static_grid(use_references).grid_index
+
+    def point_extractor(
+        self,
+        lon,
+        lat,
+        method : str = 'nearest',
+        max_distance : Optional[float] = None
+    ) -> mom6_points.PointExtractor:
+        """Station extractor on the grid of the ocean_static file.
+        The station index is cached per grid so only the gather is
+        repeated for the same stations.
+
+        Parameters
+        ----------
+        lon : array_like
+            station longitude
+        lat : array_like
+            station latitude
+        method : str, optional
+            'nearest' or 'bilinear', by default 'nearest'
+        max_distance : float, optional
+            stations farther than this distance (km) from the nearest
+            wet grid point return NaN, by default None
+
+        Returns
+        -------
+        mom6_points.PointExtractor
+            use `extract(self.open(variable))` to get the station data
+        """
+        return mom6_points.PointExtractor(
+            self.grid_index(), lon, lat, method=method, max_distance=max_distance
+        )
+
+    def _open_variable(
+        self,
+        variable : str,
+        chunks : Optional[dict],
+        use_references : bool,
+        slices : Optional[Dict[str, slice]] = None,
+        time_filter : Optional[dict] = None
+    ) -> xr.Dataset:
+        """open the files of one variable with the aligned chunks
+        and the index slices applied before reading
+
+        The opened files are listed in `ds.encoding['source_files']`.
+        """
+        if time_filter is None:
+            time_filter = {}
+        chunk_info = portal_data.FileChunking()
+        remote_refs = isinstance(self.storage, (GCSStore, S3Store))
+
+        def _isel(ds):
+            if not slices:
+                return ds
+            return ds.isel({dim: slices[dim] for dim in slices if dim in ds.dims})
+
+        if remote_refs or (use_references and isinstance(self.storage, LocalStore)):
+            try:
+                ds = self.open_references(variable, chunks={}, **time_filter)
+            except FileNotFoundError:
+                if remote_refs:
+                    raise
+            else:
+                files = ds.encoding['source_files']
+                if chunks is None:
+                    chunks = chunk_info.dim_chunks(ds.dims, _stored_chunks(ds))
+                # dask only reads the stored chunks overlapping the slices
+                ds = _isel(ds)
+                ds = ds.chunk({dim: chunks[dim] for dim in chunks if dim in ds.dims})
+                ds.encoding['source_files'] = files
+                return ds
+
+        files = self.get(variable, **time_filter)
+        if chunks is None:
+            # stored chunking from the first file
+            with xr.open_dataset(files[0], chunks={}) as ds_first:
+                chunks = chunk_info.dim_chunks(
+                    list(ds_first.dims)+['init'],
+                    _stored_chunks(ds_first)
+                )
+
+        concat_dim = mom6_kerchunk.concat_dim_name(self.storage.experiment_type)
+
+        if slices:
+            # lazily indexed backend array is sliced before the dask
+            # chunking so only the hyperslab is requested
+            datasets = []
+            for file in files:
+                ds = _isel(xr.open_dataset(file))
+                datasets.append(ds.chunk({dim: chunks[dim] for dim in chunks if dim in ds.dims}))
+            if len(datasets) == 1:
+                ds = datasets[0]
+            elif concat_dim == 'init':
+                ds = xr.combine_nested(datasets, concat_dim='init')
+            else:
+                ds = xr.combine_by_coords(datasets, combine_attrs='override')
+        elif len(files) == 1:
+            ds = xr.open_dataset(files[0], chunks=chunks)
+        elif concat_dim == 'init':
+            ds = xr.open_mfdataset(
+                files, combine='nested', concat_dim='init', chunks=chunks
+            )
+        else:
+            ds = xr.open_mfdataset(files, combine='by_coords', chunks=chunks)
+        ds.encoding['source_files'] = list(files)
+        return ds
+
+    def open_references(
+        self,
+        variable : str,
+        chunks : Optional[dict] = None,
+        start = None,
+        end = None,
+        inits : Optional[list] = None
+    ) -> xr.Dataset:
+        """Open all files of the variable lazily as one dataset
+        through the kerchunk json references. The combined reference
+        is used when available, otherwise the single file references
+        are combined along 'init' (forecast) or 'time' (the rest).
+
+        Parameters
+        ----------
+        variable : str
+            variable short name ex:'tos' for sea surface temperature
+        chunks : dict, optional
+            dask chunks used to open the dataset, by default the
+            on-disk chunks
+        start, end, inits : optional
+            time filter of the single file references
+            (see `filter_files_by_time`), the combined
+            reference is not used when filtering, by default None
+
+        Returns
+        -------
+        xr.Dataset
+            lazily loaded dataset, the files behind the references
+            are listed in `ds.encoding['source_files']`
+
+        Raises
+        ------
+        ValueError
+            When the storage is 'opendap' which has no kerchunk reference
+        FileNotFoundError
+            When the local references are missing or older than the
+            netcdf files (`open` falls back to the netcdf files)
+        """
+        if self.storage is None:
+            raise FileNotFoundError('the storage is not assigned')
+
+        if isinstance(self.storage, LocalStore):
+            # references older than the netcdf files are not used
+            files = self.storage.get_files(variable)
+            references = mom6_kerchunk.current_references(
+                self.storage.get_references(variable), files
+            )
+            storage_options = None
+        elif isinstance(self.storage, (GCSStore, S3Store)):
+            references = files = self.storage.get_files(variable)
+            storage_options = {'anon': True}
+        else:
+            raise ValueError('kerchunk references are only available for "local", "s3", and "gcs"')
+
+        references = filter_files_by_time(references, start, end, inits)
+
+        ds = mom6_kerchunk.open_references(
+            references,
+            concat_dim=mom6_kerchunk.concat_dim_name(self.storage.experiment_type),
+            storage_options=storage_options,
+            chunks=chunks,
+            block_cache=self.block_cache
+        )
+        ds.encoding['source_files'] = filter_files_by_time(files, start, end, inits)
+        return ds
@@ -3,10 +3,571 @@
 The module include Regridding class
 for regional mom6 field
 
+The ESMF weights are the expensive part of the regridding.
+`get_regridder` saves the weights under the hash of the
+source and destination grids (see `grid_fingerprint`) and
+the method so the same weights are read back by later calls
+and later processes, and keeps the recently used regridders
+alive in the process.
+
+`SparseRegridder` applies the saved weights as a
+`scipy.sparse` matrix product over the flattened horizontal
+grid chunk by chunk of the leading dimensions, so the
+regridding itself does not need ESMF.
+
+The conservative methods need the cell bounds ('lon_b' and
+'lat_b'). The bounds of the MOM6 grid are the corner (q point)
+coordinates in ocean_static.nc (`geolon_c`/`geolat_c`, see
+`add_corner_bounds`).
 """
+import os
+from collections import OrderedDict
+from typing import Optional, Tuple, Union
 import numpy as np
 import xarray as xr
-import xesmf as xe
+from mom6.mom6_module.util import lazy_import
+from mom6.mom6_module.mom6_cache import default_cache_dir, hash_key, array_token
+from mom6.mom6_module.mom6_types import RegridEngineOptions, RegridMethodOptions
+
+# xesmf (and ESMF) loaded on first use
+xe = lazy_import('xesmf')
+sparse = lazy_import('scipy.sparse')
+
+# live regridders in the process (least recently used dropped first)
+_REGRIDDER_CACHE : 'OrderedDict[str, xe.Regridder]' = OrderedDict()
+MAX_LIVE_REGRIDDERS = 8
+
+# variables xesmf reads from the grid dataset
+GRID_VARIABLES = ['lon', 'lat', 'lon_b', 'lat_b', 'mask']
+
+# methods needing the cell bounds (lon_b, lat_b)
+BOUNDS_METHODS = ['conservative', 'conservative_normed']
+
+
+def grid_fingerprint(ds_grid : xr.Dataset) -> str:
+    """hash of the grid variables used by xesmf
+
+    The values are hashed (not the dask graph name) so the
+    same grid read from different files has the same fingerprint.
+
+    Parameters
+    ----------
+    ds_grid : xr.Dataset
+        dataset with 'lon' and 'lat' (and optionally
+        'lon_b', 'lat_b' and 'mask')
+
+    Returns
+    -------
+    str
+        sha256 hex digest of the grid
+    """
+    parts = []
+    for name in GRID_VARIABLES:
+        if name in ds_grid.variables:
+            var = ds_grid[name].variable
+            values = xr.Variable(var.dims, np.asarray(var.values))
+            parts.append((name, var.dims, array_token(values)))
+    return hash_key(*parts)
+
+
+def add_corner_bounds(
+    ds_grid : xr.Dataset,
+    xname_c : str = 'geolon_c',
+    yname_c : str = 'geolat_c',
+    ds_corner : Optional[xr.Dataset] = None
+) -> xr.Dataset:
+    """add the corner coordinates as the cell bounds
+    'lon_b' and 'lat_b' used by the conservative methods
+
+    Parameters
+    ----------
+    ds_grid : xr.Dataset
+        dataset with the cell center 'lon' and 'lat'
+    xname_c : str, optional
+        corner longitude name, by default 'geolon_c'
+    yname_c : str, optional
+        corner latitude name, by default 'geolat_c'
+    ds_corner : xr.Dataset, optional
+        dataset with the corner coordinates (ocean_static),
+        by default `ds_grid`
+
+    Returns
+    -------
+    xr.Dataset
+        `ds_grid` with the 'lon_b' and 'lat_b' coordinates
+
+    Raises
+    ------
+    KeyError
+        if the corner coordinates are not found
+    ValueError
+        if the corners are not one point larger than the
+        centers on both axes (non-symmetric grid)
+    """
+    if ds_corner is None:
+        ds_corner = ds_grid
+    try:
+        lon_b = ds_corner[xname_c]
+        lat_b = ds_corner[yname_c]
+    except KeyError as e:
+        raise KeyError(
+            f"Cell bounds need the corner coordinates {xname_c} & {yname_c}"
+        ) from e
+
+    shape_b = tuple(size + 1 for size in ds_grid['lon'].shape)
+    if lon_b.shape != shape_b or lat_b.shape != shape_b:
+        raise ValueError(
+            f'corner coordinates shape {lon_b.shape} should be {shape_b} '
+            '(one more point than the centers on both axes)'
+        )
+    return ds_grid.assign_coords(lon_b=lon_b.variable, lat_b=lat_b.variable)
+
+
+def regrid_call_kwargs(method : RegridMethodOptions, na_thres : float = 1.0) -> dict:
+    """keyword arguments of the regridder call for the method
+
+    Only the conservative methods (with the land mask on the
+    source grid) skip the missing values. The other methods keep
+    the missing values so the destination points next to land
+    stay NaN.
+
+    Parameters
+    ----------
+    method : RegridMethodOptions
+        xesmf regridding method
+    na_thres : float, optional
+        with skipna, maximum fraction of the weight from
+        missing source points, by default 1.0
+
+    Returns
+    -------
+    dict
+        'skipna' and 'na_thres' for the conservative methods,
+        empty otherwise
+    """
+    if method in BOUNDS_METHODS:
+        return {'skipna': True, 'na_thres': na_thres}
+    return {}
+
+
+def center_bounds(center : np.ndarray) -> np.ndarray:
+    """bounds of the 1D cell centers (mid points, half a
+    spacing outside the first and last centers)"""
+    mid = (center[1:] + center[:-1])/2.
+    return np.concatenate([
+        [center[0] - (mid[0] - center[0])],
+        mid,
+        [center[-1] + (center[-1] - mid[-1])]
+    ])
+
+
+def regrid_key(
+    ds_ori : xr.Dataset,
+    ds_regrid : xr.Dataset,
+    method : str = 'bilinear',
+    **kwargs
+) -> str:
+    """key of the regridding weights from the grids,
+    the method and the other `xe.Regridder` options"""
+    return hash_key(
+        grid_fingerprint(ds_ori),
+        grid_fingerprint(ds_regrid),
+        method,
+        sorted(kwargs.items())
+    )
+
+
+def weight_file_path(key : str, cache_dir : Optional[str] = None) -> str:
+    """path of the saved weights of the regridding key"""
+    if cache_dir is None:
+        cache_dir = default_cache_dir()
+    return os.path.join(cache_dir, 'regrid_weights', f'{key}.nc')
+
+
+def _evict_weights(weight_dir : str, max_bytes : int):
+    """remove the least recently used weight files above `max_bytes`"""
+    weight_files = [
+        os.path.join(weight_dir, file)
+        for file in os.listdir(weight_dir) if file.endswith('.nc')
+    ]
+    weight_files.sort(key=os.path.getmtime)
+    total = sum(os.path.getsize(file) for file in weight_files)
+    for weight_file in weight_files:
+        if total <= max_bytes:
+            break
+        total -= os.path.getsize(weight_file)
+        os.remove(weight_file)
+
+
+def get_regridder(
+    ds_ori : xr.Dataset,
+    ds_regrid : xr.Dataset,
+    method : str = 'bilinear',
+    cache_dir : Optional[str] = None,
+    max_bytes : int = 2*2**30,
+    **kwargs
+) -> 'xe.Regridder':
+    """create the regridder once and reuse it
+
+    The regridder is looked up in the process first, then the
+    weights in `{cache_dir}/regrid_weights/{key}.nc` and only
+    generated by ESMF when both are missing.
+
+    Parameters
+    ----------
+    ds_ori : xr.Dataset
+        original dataset that need interpolation
+    ds_regrid : xr.Dataset
+        the dataset contains coordinate that need to be interpolated to
+    method : str, optional
+        xesmf regridding method, by default 'bilinear'
+    cache_dir : str, optional
+        top cache directory, by default `default_cache_dir()`
+    max_bytes : int, optional
+        maximum total size of the saved weights, by default 2 GB.
+        `max_bytes=0` does not save the weights.
+    **kwargs
+        other keyword arguments of `xe.Regridder`
+        (part of the key)
+
+    Returns
+    -------
+    xe.Regridder
+        regridder object used for regridding
+    """
+    key = regrid_key(ds_ori, ds_regrid, method, **kwargs)
+
+    regridder = _REGRIDDER_CACHE.get(key)
+    if regridder is not None:
+        _REGRIDDER_CACHE.move_to_end(key)
+        return regridder
+
+    weight_file = weight_file_path(key, cache_dir)
+    weight_dir = os.path.dirname(weight_file)
+
+    if os.path.exists(weight_file):
+        try:
+            regridder = xe.Regridder(
+                ds_ori, ds_regrid, method, weights=weight_file, **kwargs
+            )
+            # mark as recently used for the eviction
+            os.utime(weight_file)
+        except (OSError, ValueError, KeyError):
+            # incomplete or incompatible weight file
+            print(f'regenerating regridding weights {weight_file}')
+            regridder = None
+
+    if regridder is None:
+        regridder = xe.Regridder(ds_ori, ds_regrid, method, **kwargs)
+        if max_bytes > 0:
+            os.makedirs(weight_dir, exist_ok=True)
+            tmp_file = f'{weight_file}.{os.getpid()}.tmp'
+            regridder.to_netcdf(tmp_file)
+            os.replace(tmp_file, weight_file)
+            _evict_weights(weight_dir, max_bytes)
+
+    _REGRIDDER_CACHE[key] = regridder
+    while len(_REGRIDDER_CACHE) > MAX_LIVE_REGRIDDERS:
+        _REGRIDDER_CACHE.popitem(last=False)
+    return regridder
+
+
+def clear_regridders():
+    """drop all live regridders"""
+    _REGRIDDER_CACHE.clear()
+
+
+def horizontal_grid(ds_grid : xr.Dataset) -> Tuple[tuple, tuple, dict]:
+    """horizontal dims, shape and coordinates of the grid
+    in the (y, x) order used to flatten the grid by xesmf
+
+    Parameters
+    ----------
+    ds_grid : xr.Dataset
+        dataset with 1D or 2D 'lon' and 'lat'
+
+    Returns
+    -------
+    Tuple[tuple, tuple, dict]
+        dims, shape and {'lon', 'lat'} coordinates
+    """
+    lon = ds_grid['lon']
+    lat = ds_grid['lat']
+    if lon.ndim == 2:
+        dims = lon.dims
+    else:
+        dims = (lat.dims[0], lon.dims[0])
+    shape = tuple(ds_grid.sizes[dim] for dim in dims)
+    coords = {'lon': lon.variable, 'lat': lat.variable}
+    return dims, shape, coords
+
+
+def sparse_regrid_kernel(
+    values : np.ndarray,
+    weights : 'sparse.csr_matrix',
+    shape_out : tuple,
+    unmapped : Optional[np.ndarray] = None,
+    skipna : bool = False,
+    na_thres : float = 1.0
+) -> np.ndarray:
+    """apply the weights to the last two axes
+
+    Parameters
+    ----------
+    values : np.ndarray
+        data (..., ny_in, nx_in)
+    weights : sparse.csr_matrix
+        (ny_out*nx_out, ny_in*nx_in) weights
+    shape_out : tuple
+        (ny_out, nx_out)
+    unmapped : np.ndarray, optional
+        destination points without weight set to NaN, by default None
+    skipna : bool, optional
+        renormalize the weights over the valid source points, by default False
+    na_thres : float, optional
+        with skipna, maximum fraction of the weight from
+        missing source points, by default 1.0
+
+    Returns
+    -------
+    np.ndarray
+        regridded data (..., ny_out, nx_out)
+    """
+    lead_shape = values.shape[:-2]
+    flat = values.reshape(-1, values.shape[-2]*values.shape[-1]).T
+
+    if skipna:
+        valid = ~np.isnan(flat)
+        regridded = weights @ np.where(valid, flat, 0.)
+        weight_sum = weights @ valid.astype('float64')
+        keep = (weight_sum > 0.) & (weight_sum >= 1. - na_thres - 1e-8)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            regridded = np.where(keep, regridded/weight_sum, np.nan)
+    else:
+        regridded = weights @ flat
+
+    if unmapped is not None:
+        regridded[unmapped] = np.nan
+    return regridded.T.reshape(lead_shape + tuple(shape_out))
+
+
+class SparseRegridder:
+    """apply regridding weights with `scipy.sparse`
+
+    The horizontal dims are flattened and the leading dims
+    (time, z_l, init, lead, member, ...) keep their dask chunks
+    so every chunk is regridded independently with the memory
+    of the chunk and the weights only.
+
+    Parameters
+    ----------
+    weights : sparse.spmatrix
+        (ny_out*nx_out, ny_in*nx_in) weights
+    ds_ori : xr.Dataset
+        dataset with the source 'lon' and 'lat'
+    ds_regrid : xr.Dataset
+        dataset with the destination 'lon' and 'lat'
+    unmapped_to_nan : bool, optional
+        set the destination points without weight to NaN, by default True
+
+    Examples
+    --------
+    regridder = get_sparse_regridder(ds_ori, ds_regrid, unmapped_to_nan=True)
+    ds_regrid = regridder(ds_ori[['tos', 'sos']])
+    """
+    def __init__(
+        self,
+        weights : 'sparse.spmatrix',
+        ds_ori : xr.Dataset,
+        ds_regrid : xr.Dataset,
+        unmapped_to_nan : bool = True
+    ) -> None:
+        self.dims_in, self.shape_in, _ = horizontal_grid(ds_ori)
+        self.dims_out, self.shape_out, self.coords_out = horizontal_grid(ds_regrid)
+        self.weights = sparse.csr_matrix(weights, copy=True)
+        expected = (np.prod(self.shape_out), np.prod(self.shape_in))
+        if self.weights.shape != expected:
+            raise ValueError(
+                f'weights shape {self.weights.shape} does not match the grids {expected}'
+            )
+        # NaN entries of the unmapped points (xesmf `add_nans_to_weights`)
+        nan_entries = np.isnan(self.weights.data)
+        if nan_entries.any():
+            self.weights.data[nan_entries] = 0.
+            self.weights.eliminate_zeros()
+        self.unmapped = None
+        if unmapped_to_nan:
+            self.unmapped = np.diff(self.weights.indptr) == 0
+
+    @classmethod
+    def from_file(
+        cls,
+        weight_file : str,
+        ds_ori : xr.Dataset,
+        ds_regrid : xr.Dataset,
+        unmapped_to_nan : bool = True
+    ) -> 'SparseRegridder':
+        """read the weights saved by `xe.Regridder.to_netcdf`
+        (1-based 'row', 'col' and the weight 'S')"""
+        with xr.open_dataset(weight_file) as ds_weights:
+            row = ds_weights['row'].values - 1
+            col = ds_weights['col'].values - 1
+            weight = ds_weights['S'].values
+        _, shape_in, _ = horizontal_grid(ds_ori)
+        _, shape_out, _ = horizontal_grid(ds_regrid)
+        weights = sparse.coo_matrix(
+            (weight, (row, col)),
+            shape=(np.prod(shape_out), np.prod(shape_in))
+        )
+        return cls(weights, ds_ori, ds_regrid, unmapped_to_nan=unmapped_to_nan)
+
+    @classmethod
+    def from_regridder(
+        cls,
+        regridder : 'xe.Regridder',
+        ds_ori : xr.Dataset,
+        ds_regrid : xr.Dataset,
+        unmapped_to_nan : bool = True
+    ) -> 'SparseRegridder':
+        """take the weights of an existing `xe.Regridder`"""
+        # DataArray of sparse.COO in recent xesmf, scipy matrix before
+        weights = getattr(regridder.weights, 'data', regridder.weights)
+        if hasattr(weights, 'tocsr'):
+            weights = weights.tocsr()
+        return cls(weights, ds_ori, ds_regrid, unmapped_to_nan=unmapped_to_nan)
+
+    def regrid_dataarray(
+        self,
+        da_data : xr.DataArray,
+        skipna : bool = False,
+        na_thres : float = 1.0
+    ) -> xr.DataArray:
+        """regrid the dataarray (see `__call__`)"""
+        # source coordinates on the horizontal dims are replaced
+        drop_coords = [
+            name for name in da_data.coords
+            if set(da_data[name].dims) & set(self.dims_in)
+        ]
+        da_data = da_data.drop_vars(drop_coords)
+        if da_data.chunks is not None:
+            da_data = da_data.chunk({dim: -1 for dim in self.dims_in})
+        if np.issubdtype(da_data.dtype, np.floating):
+            dtype = da_data.dtype
+        else:
+            dtype = np.dtype('float64')
+
+        da_regrid = xr.apply_ufunc(
+            sparse_regrid_kernel,
+            da_data,
+            kwargs={
+                'weights': self.weights,
+                'shape_out': self.shape_out,
+                'unmapped': self.unmapped,
+                'skipna': skipna,
+                'na_thres': na_thres
+            },
+            input_core_dims=[list(self.dims_in)],
+            output_core_dims=[list(self.dims_out)],
+            exclude_dims=set(self.dims_in),
+            dask='parallelized',
+            output_dtypes=[dtype],
+            dask_gufunc_kwargs={'output_sizes': dict(zip(self.dims_out, self.shape_out))},
+            keep_attrs=True
+        )
+        return da_regrid.astype(dtype, copy=False).assign_coords(self.coords_out)
+
+    def __call__(
+        self,
+        data : Union[xr.DataArray, xr.Dataset],
+        skipna : bool = False,
+        na_thres : float = 1.0
+    ) -> Union[xr.DataArray, xr.Dataset]:
+        """regrid the dataarray or all variables on the
+        horizontal grid of the dataset
+
+        Parameters
+        ----------
+        data : Union[xr.DataArray, xr.Dataset]
+            data on the source grid (lazy data stays lazy)
+        skipna : bool, optional
+            renormalize the weights over the valid source points, by default False
+        na_thres : float, optional
+            with skipna, maximum fraction of the weight from
+            missing source points, by default 1.0
+
+        Returns
+        -------
+        Union[xr.DataArray, xr.Dataset]
+            data on the destination grid
+        """
+        if isinstance(data, xr.DataArray):
+            return self.regrid_dataarray(data, skipna=skipna, na_thres=na_thres)
+
+        ds_regrid = xr.Dataset(attrs=data.attrs)
+        for name, da_data in data.data_vars.items():
+            if set(self.dims_in).issubset(da_data.dims):
+                ds_regrid[name] = self.regrid_dataarray(
+                    da_data, skipna=skipna, na_thres=na_thres
+                )
+        return ds_regrid
+
+
+def get_sparse_regridder(
+    ds_ori : xr.Dataset,
+    ds_regrid : xr.Dataset,
+    method : str = 'bilinear',
+    cache_dir : Optional[str] = None,
+    **kwargs
+) -> SparseRegridder:
+    """create the sparse regridder from the saved weights
+
+    ESMF is only needed when the weights of the grids,
+    method and options are not saved yet (see `get_regridder`).
+
+    Parameters
+    ----------
+    ds_ori : xr.Dataset
+        original dataset that need interpolation
+    ds_regrid : xr.Dataset
+        the dataset contains coordinate that need to be interpolated to
+    method : str, optional
+        xesmf regridding method, by default 'bilinear'
+    cache_dir : str, optional
+        top cache directory, by default `default_cache_dir()`
+    **kwargs
+        other keyword arguments of `xe.Regridder`
+        ('unmapped_to_nan' by default True as `SparseRegridder`)
+
+    Returns
+    -------
+    SparseRegridder
+        regridder applying the weights with scipy.sparse
+    """
+    kwargs.setdefault('unmapped_to_nan', True)
+    key = regrid_key(ds_ori, ds_regrid, method, **kwargs)
+    sparse_key = f'sparse-{key}'
+    regridder = _REGRIDDER_CACHE.get(sparse_key)
+    if regridder is not None:
+        _REGRIDDER_CACHE.move_to_end(sparse_key)
+        return regridder
+
+    unmapped_to_nan = kwargs['unmapped_to_nan']
+    weight_file = weight_file_path(key, cache_dir)
+    if os.path.exists(weight_file):
+        regridder = SparseRegridder.from_file(
+            weight_file, ds_ori, ds_regrid, unmapped_to_nan=unmapped_to_nan
+        )
+    else:
+        regridder = SparseRegridder.from_regridder(
+            get_regridder(ds_ori, ds_regrid, method, cache_dir=cache_dir, **kwargs),
+            ds_ori, ds_regrid, unmapped_to_nan=unmapped_to_nan
+        )
+
+    _REGRIDDER_CACHE[sparse_key] = regridder
+    while len(_REGRIDDER_CACHE) > MAX_LIVE_REGRIDDERS:
+        _REGRIDDER_CACHE.popitem(last=False)
+    return regridder
+
 
 class Regridding:
     """class to handle regridding 
@@ -24,6 +585,10 @@ class Regridding:
         x coordinate name
     yname : str
         y coordinate name
+    ori_xname_c : str
+        x corner coordinate name (conservative methods only)
+    ori_yname_c : str
+        y corner coordinate name (conservative methods only)
 
     Raises
     ------
@@ -42,6 +607,9 @@ class Regridding:
     
     # perform regridding to a specific grid used in ds_specific
     ds_regrid = class_regrid.regrid_specific(ds_specific)
+
+    # conservative regridding (ds_var with geolon_c and geolat_c)
+    ds_regrid = class_regrid.regrid_regular(900, 800, method='conservative')
     """
     def  __init__(
         self,
@@ -49,6 +617,8 @@ class Regridding:
         varname : str,
         ori_xname : str = 'lon',
         ori_yname : str = 'lat',
+        ori_xname_c : str = 'geolon_c',
+        ori_yname_c : str = 'geolat_c'
     ):
 
         # prepare dataset for interpolation
@@ -60,14 +630,17 @@ class Regridding:
             ) from e
 
         self.varname = varname
+        self.xname_c = ori_xname_c
+        self.yname_c = ori_yname_c
 
     @staticmethod
     def generate_regridder(
         ds_ori : xr.Dataset,
-        ds_regrid :xr.Dataset
-    )->xe.Regridder:
+        ds_regrid :xr.Dataset,
+        method : RegridMethodOptions = 'bilinear'
+    )->'xe.Regridder':
         """create regridder for interpolation
-        fixed to bilinear interpolation at the moment
+        (weights reused through `get_regridder`)
 
         Parameters
         ----------
@@ -75,24 +648,49 @@ class Regridding:
             original dataset that need interpolation
         ds_regrid : xr.Dataset
             the dataset contains coordinate that need to be interpolated to
+        method : RegridMethodOptions, optional
+            regridding method, by default 'bilinear'. The conservative
+            methods need 'lon_b' and 'lat_b' in both datasets.
 
         Returns
         -------
         xe.Regridder
             regridder object used for regridding
         """
-        regridder = xe.Regridder(
-            ds_ori, ds_regrid, "bilinear", unmapped_to_nan=True
+        regridder = get_regridder(
+            ds_ori, ds_regrid, method, unmapped_to_nan=True
         )
         return regridder
 
-    def regular_grid(self,nx:int,ny:int)->xr.Dataset:
+    def source_grid(self, method:RegridMethodOptions = 'bilinear')->xr.Dataset:
+        """original dataset with the cell bounds
+        from the corner coordinates when the method needs them
+
+        Parameters
+        ----------
+        method : RegridMethodOptions, optional
+            regridding method, by default 'bilinear'
+
+        Returns
+        -------
+        xr.Dataset
+            original dataset
+        """
+        if method in BOUNDS_METHODS:
+            return add_corner_bounds(self.ori_dataset, self.xname_c, self.yname_c)
+        return self.ori_dataset
+
+    def regular_grid(self,nx:int,ny:int,bounds:bool = False)->xr.Dataset:
         """create a regular grid for regridding
         
         Parameters
         ----------
-        ds : xr.Dataset
-            original dataset
+        nx : int
+            number of longitude
+        ny : int
+            number of latitude
+        bounds : bool, optional
+            include the cell bounds 'lon_b' and 'lat_b', by default False
 
         Returns
         -------
@@ -120,11 +718,31 @@ class Regridding:
 
         # Create an xarray dataset with empty dataarray
         ds = xr.Dataset({'var': data})
+        if bounds:
+            ds = ds.assign_coords(lon_b=center_bounds(x), lat_b=center_bounds(y))
         return ds
 
-    def regrid_regular(self,nx:int,ny:int)->xr.Dataset:
+    def regrid_regular(
+        self,
+        nx:int,
+        ny:int,
+        engine:RegridEngineOptions = 'xesmf',
+        method:RegridMethodOptions = 'bilinear'
+    )->xr.Dataset:
         """regrid the data
 
+        Parameters
+        ----------
+        nx : int
+            number of longitude
+        ny : int
+            number of latitude
+        engine : RegridEngineOptions, optional
+            'xesmf' or 'sparse' (weights applied with scipy.sparse
+            chunk by chunk), by default 'xesmf'
+        method : RegridMethodOptions, optional
+            regridding method, by default 'bilinear'
+
         Returns
         -------
         xr.Dataset
@@ -133,25 +751,18 @@ class Regridding:
         # create regular grid
         ds_regrid = self.regular_grid(
             nx=nx,
-            ny=ny
+            ny=ny,
+            bounds=method in BOUNDS_METHODS
         )
 
-        # generate regridder
-        regridder = self.generate_regridder(self.ori_dataset, ds_regrid)
+        return self.regrid_specific(ds_regrid, engine=engine, method=method)
 
-        # regrid to tracer point(memory intensive if the whole dataset is big)
-        da = regridder(self.ori_dataset[self.varname])
-        if hasattr(da.data, "persist"):
-            print('.persisting data...')
-            da = da.persist() #type: ignore
-
-
-        # create dataset
-        ds = xr.Dataset({self.varname: da})
-
-        return ds
-
-    def regrid_specific(self,ds_specific)->xr.Dataset:
+    def regrid_specific(
+        self,
+        ds_specific:xr.Dataset,
+        engine:RegridEngineOptions = 'xesmf',
+        method:RegridMethodOptions = 'bilinear'
+    )->xr.Dataset:
         """regrid the data to the same grid as ds_specific
         ds_specific should have the dim name 'lon' and 'lat'
 
@@ -159,6 +770,14 @@ class Regridding:
         ----------
         ds_specific : xr.Dataset
             dataset that contains the coordinate for regridding
+        engine : RegridEngineOptions, optional
+            'xesmf' or 'sparse' (weights applied with scipy.sparse
+            chunk by chunk), by default 'xesmf'
+        method : RegridMethodOptions, optional
+            regridding method, by default 'bilinear'. The conservative
+            methods need the corner coordinates in the original dataset
+            and 'lon_b' and 'lat_b' in ds_specific (added from 1D
+            'lon' and 'lat' when missing)
         
         Returns
         -------
@@ -166,8 +785,26 @@ class Regridding:
             regridded dataset
         """
 
+        ds_ori = self.source_grid(method)
+        if (
+            method in BOUNDS_METHODS and
+            'lon_b' not in ds_specific.variables and
+            ds_specific['lon'].ndim == 1
+        ):
+            ds_specific = ds_specific.assign_coords(
+                lon_b=center_bounds(ds_specific['lon'].values),
+                lat_b=center_bounds(ds_specific['lat'].values)
+            )
+
         # generate regridder
-        regridder = self.generate_regridder(self.ori_dataset, ds_specific)
+        if engine == 'sparse':
+            regridder = get_sparse_regridder(
+                ds_ori, ds_specific, method, unmapped_to_nan=True
+            )
+        elif engine == 'xesmf':
+            regridder = self.generate_regridder(ds_ori, ds_specific, method)
+        else:
+            raise ValueError("engine must be 'xesmf' or 'sparse'")
 
         # regrid to tracer point(memory intensive if the whole dataset is big)
         da = regridder(self.ori_dataset[self.varname])
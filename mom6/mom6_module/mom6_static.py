@@ -0,0 +1,220 @@
+#!/usr/bin/env python
+"""
+The module is created to load the static grid
+information (ocean_static.nc and the rotation
+angle in ice_static.nc) of the CEFI regional mom6
+data once per process.
+
+The static grid is memoized by
+(region, subdomain, grid_type, release) and the
+arrays are read-only (optionally memory-mapped
+from the cache directory) so the same object can
+be shared by all modules without defensive copies.
+"""
+import os
+from typing import Optional, Dict, Callable, Tuple
+import numpy as np
+import xarray as xr
+from mom6.mom6_module.mom6_cache import default_cache_dir, hash_key
+from mom6.mom6_module import mom6_subset
+
+# static grid memoized per (region, subdomain, grid_type, release)
+_STATIC_GRID_CACHE : Dict[tuple, 'StaticGrid'] = {}
+
+# rotation file (ice_static) naming to the ocean_static naming
+ROTATION_RENAME = {
+    'yT':'yh',
+    'xT':'xh',
+    'GEOLON':'geolon',
+    'GEOLAT':'geolat',
+    'COSROT':'cosrot',
+    'SINROT':'sinrot'
+}
+
+
+def _read_only(ds:xr.Dataset, mmap_dir:Optional[str] = None) -> xr.Dataset:
+    """load all variables to read-only numpy arrays
+
+    Parameters
+    ----------
+    ds : xr.Dataset
+        dataset to load
+    mmap_dir : str, optional
+        directory storing the arrays as .npy files which are
+        then memory-mapped, by default None (arrays in memory)
+
+    Returns
+    -------
+    xr.Dataset
+        dataset backed by read-only arrays
+    """
+    ds = ds.load()
+    if mmap_dir is not None:
+        os.makedirs(mmap_dir, exist_ok=True)
+    for name, var in ds.variables.items():
+        if name in ds.dims:
+            # dimension coordinates are immutable pandas indexes
+            continue
+        data = var.values
+        if mmap_dir is not None and data.dtype.kind in 'biuf' and data.ndim > 0:
+            npy_file = os.path.join(mmap_dir, f'{name}.npy')
+            if not os.path.exists(npy_file):
+                tmp_file = f'{npy_file}.{os.getpid()}.tmp.npy'
+                np.save(tmp_file, data)
+                os.replace(tmp_file, npy_file)
+            data = np.load(npy_file, mmap_mode='r')
+        else:
+            data = np.array(data)
+            data.flags.writeable = False
+        var.data = data
+    return ds
+
+
+class StaticGrid:
+    """
+    Read-only static grid information of a CEFI release
+
+    Parameters
+    ----------
+    ds_static : xr.Dataset
+        ocean static dataset (ocean_static.nc)
+    ds_rotation : xr.Dataset, optional
+        dataset with the rotation angle (ice_static.nc),
+        by default None
+    signature : tuple, optional
+        identity of the source files (ex: path, mtime, size) used to
+        know when the memoized grid is outdated, by default None
+    mmap_dir : str, optional
+        directory to memory-map the arrays from, by default None
+
+    Attributes
+    ----------
+    dataset : xr.Dataset
+        static dataset without the 'time' dimension
+    rotation : xr.Dataset
+        'cosrot', 'sinrot', 'geolon' and 'geolat' on the (yh, xh) grid
+        or None when the rotation file is not available
+    """
+    def __init__(
+        self,
+        ds_static : xr.Dataset,
+        ds_rotation : Optional[xr.Dataset] = None,
+        signature : Optional[tuple] = None,
+        mmap_dir : Optional[str] = None
+    ) -> None:
+        # time dim not needed appeared in the first version of NWA data
+        ds_static = ds_static.drop_vars('time', errors='ignore')
+        self.dataset = _read_only(ds_static, mmap_dir)
+
+        self.rotation = None
+        if ds_rotation is not None:
+            ds_rotation = ds_rotation.rename({
+                name: new_name for name, new_name in ROTATION_RENAME.items()
+                if name in ds_rotation.variables
+            })
+            ds_rotation = ds_rotation.set_coords(
+                [coord for coord in ['geolon', 'geolat'] if coord in ds_rotation]
+            )
+            self.rotation = _read_only(
+                ds_rotation,
+                None if mmap_dir is None else os.path.join(mmap_dir, 'rotation')
+            )
+
+        self.signature = signature
+        self._grid_index = None
+        self._lon_360 = None
+
+    @property
+    def geolon(self) -> xr.DataArray:
+        """longitude of the tracer points"""
+        return self.dataset['geolon']
+
+    @property
+    def geolat(self) -> xr.DataArray:
+        """latitude of the tracer points"""
+        return self.dataset['geolat']
+
+    @property
+    def wet(self) -> xr.DataArray:
+        """ocean mask of the tracer points (1 for ocean)"""
+        return self.dataset['wet']
+
+    @property
+    def area(self) -> xr.DataArray:
+        """area of the tracer cells"""
+        return self.dataset['areacello']
+
+    @property
+    def cosrot(self) -> xr.DataArray:
+        """cosine of the grid rotation angle"""
+        if self.rotation is None:
+            raise KeyError('rotation angle (ice_static) not available')
+        return self.rotation['cosrot']
+
+    @property
+    def sinrot(self) -> xr.DataArray:
+        """sine of the grid rotation angle"""
+        if self.rotation is None:
+            raise KeyError('rotation angle (ice_static) not available')
+        return self.rotation['sinrot']
+
+    @property
+    def lon_360(self) -> np.ndarray:
+        """read-only tracer point longitude in 0-360"""
+        if self._lon_360 is None:
+            lon = self.geolon.values
+            lon_360 = np.where(lon < 0., lon + 360., lon)
+            lon_360.flags.writeable = False
+            self._lon_360 = lon_360
+        return self._lon_360
+
+    @property
+    def grid_index(self) -> mom6_subset.GridIndex:
+        """spatial index of the grid (built on first use)"""
+        if self._grid_index is None:
+            self._grid_index = mom6_subset.GridIndex(self.dataset)
+        return self._grid_index
+
+
+def get_static_grid(
+    key : tuple,
+    load : Callable[[], Tuple[xr.Dataset, Optional[xr.Dataset]]],
+    signature : Optional[tuple] = None,
+    mmap : bool = False
+) -> StaticGrid:
+    """get the memoized static grid or load it
+
+    Parameters
+    ----------
+    key : tuple
+        (region, subdomain, grid_type, release)
+    load : Callable[[], Tuple[xr.Dataset, Optional[xr.Dataset]]]
+        function returning the ocean static and the rotation
+        dataset (or None), only called when the grid is not memoized
+    signature : tuple, optional
+        identity of the source files, a memoized grid with a different
+        signature is reloaded, by default None
+    mmap : bool, optional
+        memory-map the arrays from the cache directory, by default False
+
+    Returns
+    -------
+    StaticGrid
+        static grid shared in the process
+    """
+    static_grid = _STATIC_GRID_CACHE.get(key)
+    if static_grid is None or static_grid.signature != signature:
+        mmap_dir = None
+        if mmap:
+            mmap_dir = os.path.join(
+                default_cache_dir(), 'static', hash_key(repr((key, signature)))
+            )
+        ds_static, ds_rotation = load()
+        static_grid = StaticGrid(ds_static, ds_rotation, signature, mmap_dir)
+        _STATIC_GRID_CACHE[key] = static_grid
+    return static_grid
+
+
+def clear_static_grids():
+    """drop all memoized static grids"""
+    _STATIC_GRID_CACHE.clear()
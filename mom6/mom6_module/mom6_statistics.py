@@ -7,13 +7,26 @@ based on the forecast(reforecast) and historical run
 that is generated by Andrew Ross at GFDL.
 
 """
+import os
+from typing import List, Optional
 import numpy as np
 import xarray as xr
-import dask
 from mom6.mom6_module import time_series_processes as tsp
+from mom6.mom6_module.mom6_cache import DerivedCache, source_files
+from mom6.mom6_module.util import lon_to_360
+from mom6.mom6_module.mom6_quantile import (
+    grouped_quantile,
+    sketch_grouped_quantile,
+    windowed_dayofyear_mean,
+    windowed_dayofyear_quantile,
+    pad_groups,
+    sorted_quantile
+)
 from mom6.mom6_module.mom6_types import (
     TimeGroupByOptions,
-    DaskOptions
+    DaskOptions,
+    QuantileMethodOptions,
+    StatisticOptions
 )
 
 xr.set_options(keep_attrs=True)
@@ -39,7 +52,7 @@ class CoordinateWrangle:
        ds_data : xr.Dataset,
     ) -> None:
 
-        self.dataset = ds_data.copy(deep=True)
+        self.dataset = ds_data
 
     def check_coord_name(self):
         """check coordinate name
@@ -73,21 +86,219 @@ class CoordinateWrangle:
         Returns
         -------
         xr.Dataset
-            the modified deep copied dataset
+            shallow copy of the dataset with the new lon
+            (the input dataset is not modified)
         """
         # check coord name first
         self.check_coord_name()
 
         # change longitude range from -180 180 to 0 360
-        lon = self.dataset['lon'].data
-        if np.min(lon)<0:
-            # perform where only if needed
-            lon_ind = np.where(lon<0)
-            lon[lon_ind] += 360.
-            self.dataset['lon'].data = lon
+        # (only the lon variable is replaced, data variables are shared)
+        self.dataset = lon_to_360(self.dataset, 'lon')
 
         return self.dataset
 
+class ClimatologyStatistics:
+    """
+    Sufficient statistics (mean, sum of squared deviations from
+    the mean 'm2' and count of the valid values) of each year and
+    time group
+
+    The statistics of each year are kept separately so the
+    climatology (and the standard deviation) of any period is
+    merged from the selected years (Chan et al. parallel update,
+    no cancellation of the sum of squares). Appending, removing
+    or sliding years only needs the statistics of the changed
+    years. The statistics are saved as a netCDF file next to the
+    derived climatology file.
+
+    The quantile thresholds are not incremental (the quantile of
+    a period can not be merged from the yearly sketches) and are
+    recalculated with `ForecastQuantile`/`HistoricalQuantile`.
+
+    Parameters
+    ----------
+    time_name : str, optional
+        time (or initialization) dimension name, by default 'time'
+    time_frequency : TimeGroupByOptions, optional
+        name in time frequency to do the time group, by default 'month'
+        'year', 'month', 'dayofyear' are the available options.
+    ds_stats : xr.Dataset, optional
+        existing statistics with the 'mean', 'm2' and 'count'
+        variables along the 'year' dimension, by default None
+    """
+    def __init__(
+        self,
+        time_name : str = 'time',
+        time_frequency : TimeGroupByOptions = 'month',
+        ds_stats : Optional[xr.Dataset] = None
+    ) -> None:
+        self.timename = time_name
+        self.tfreq = time_frequency
+        self.dataset = ds_stats
+
+    @property
+    def years(self) -> List[int]:
+        """years with statistics"""
+        if self.dataset is None:
+            return []
+        return [int(year) for year in self.dataset['year'].values]
+
+    def update(self, da_data : xr.DataArray) -> List[int]:
+        """calculate the statistics of each year in the data and
+        replace the statistics of the same years
+
+        Parameters
+        ----------
+        da_data : xr.DataArray
+            data of the new (or modified) years
+
+        Returns
+        -------
+        List[int]
+            updated years
+        """
+        da_year = da_data[f'{self.timename}.year']
+        years = np.unique(da_year.values)
+
+        # one groupby pass over all (year, time group) pairs
+        da_key = (da_year*10000 + da_data[f'{self.timename}.{self.tfreq}']).rename('year_group')
+        mean = da_data.groupby(da_key).mean(dim=self.timename, skipna=True)
+        ds_new = xr.Dataset()
+        ds_new['count'] = da_data.groupby(da_key).count(dim=self.timename)
+        ds_new['mean'] = mean.where(ds_new['count'] > 0, 0.)
+        ds_new['m2'] = (
+            (da_data.groupby(da_key) - mean)**2
+        ).groupby(da_key).sum(dim=self.timename, skipna=True)
+        keys = ds_new['year_group'].values
+        ds_new = ds_new.assign_coords(
+            year=('year_group', keys//10000),
+            **{self.tfreq: ('year_group', keys%10000)}
+        ).set_index(year_group=['year', self.tfreq]).unstack('year_group', fill_value=0)
+        ds_new = ds_new.compute()
+
+        if self.dataset is None:
+            self.dataset = ds_new
+        else:
+            ds_kept = self.dataset.drop_sel(
+                year=[year for year in ds_new['year'].values if year in self.years]
+            )
+            self.dataset = xr.concat(
+                [ds_kept, ds_new], dim='year', join='outer', fill_value=0
+            ).sortby('year')
+        self.dataset['count'] = self.dataset['count'].astype('int64')
+        return [int(year) for year in years]
+
+    def remove_years(self, years : List[int]):
+        """remove the statistics of the years
+
+        Parameters
+        ----------
+        years : List[int]
+            years to remove
+        """
+        if self.dataset is not None:
+            self.dataset = self.dataset.drop_sel(
+                year=[year for year in years if year in self.years]
+            )
+
+    def _period_stats(self, start_year : int, end_year : int) -> xr.Dataset:
+        """merge the yearly mean, m2 and count of the period"""
+        if self.dataset is None:
+            raise ValueError('no statistics available')
+        ds_period = self.dataset.sel(year=slice(start_year, end_year))
+        if len(ds_period['year']) == 0:
+            raise ValueError(
+                "The statistics are empty based on the kwarg "+
+                "start_year & end_year"
+            )
+        ds_merged = xr.Dataset()
+        ds_merged['count'] = ds_period['count'].sum(dim='year')
+        count = ds_merged['count'].where(ds_merged['count'] > 0)
+        ds_merged['mean'] = (ds_period['count']*ds_period['mean']).sum(dim='year')/count
+        ds_merged['m2'] = (
+            ds_period['m2'] +
+            ds_period['count']*(ds_period['mean'] - ds_merged['mean'])**2
+        ).sum(dim='year')
+        return ds_merged
+
+    def climatology(self, start_year : int, end_year : int) -> xr.DataArray:
+        """mean of each time group from start_year to end_year
+
+        Parameters
+        ----------
+        start_year : int
+            start year of the climatology
+        end_year : int
+            end year of the climatology
+
+        Returns
+        -------
+        xr.DataArray
+            climatology, NaN when no valid value
+        """
+        return self._period_stats(start_year, end_year)['mean']
+
+    def std(self, start_year : int, end_year : int) -> xr.DataArray:
+        """standard deviation of each time group from start_year to end_year
+
+        Parameters
+        ----------
+        start_year : int
+            start year of the period
+        end_year : int
+            end year of the period
+
+        Returns
+        -------
+        xr.DataArray
+            standard deviation (ddof=0), NaN when no valid value
+        """
+        ds_merged = self._period_stats(start_year, end_year)
+        return np.sqrt(ds_merged['m2']/ds_merged['count'].where(ds_merged['count'] > 0))
+
+    def save(self, stats_file : str):
+        """write the statistics through a temporary file and an atomic move
+
+        Parameters
+        ----------
+        stats_file : str
+            output netCDF file
+        """
+        tmp_file = f'{stats_file}.{os.getpid()}.tmp'
+        self.dataset.to_netcdf(tmp_file)
+        os.replace(tmp_file, stats_file)
+
+    @classmethod
+    def load(
+        cls,
+        stats_file : str,
+        time_name : str = 'time',
+        time_frequency : TimeGroupByOptions = 'month'
+    ) -> 'ClimatologyStatistics':
+        """read the statistics, missing file gives empty statistics
+
+        Parameters
+        ----------
+        stats_file : str
+            netCDF file from `ClimatologyStatistics.save`
+        time_name : str, optional
+            time (or initialization) dimension name, by default 'time'
+        time_frequency : TimeGroupByOptions, optional
+            name in time frequency to do the time group, by default 'month'
+
+        Returns
+        -------
+        ClimatologyStatistics
+            the statistics
+        """
+        ds_stats = None
+        if os.path.exists(stats_file):
+            with xr.open_dataset(stats_file) as ds_file:
+                ds_stats = ds_file.load()
+        return cls(time_name=time_name, time_frequency=time_frequency, ds_stats=ds_stats)
+
+
 class ForecastClimatology:
     """
     Class for calculating the climatology of forecast
@@ -106,6 +317,9 @@ class ForecastClimatology:
     time_frequency : TimeGroupByOptions, optional
         name in time frequency to do the time group, by default 'month'
         'year', 'month', 'dayofyear' are the available options.
+    derived_cache : DerivedCache, optional
+        on-disk cache of the climatology, by default None
+        (no caching)
 
     """
 
@@ -115,7 +329,8 @@ class ForecastClimatology:
         var_name : str,
         initialization_name : str = 'init',
         member_name : str = 'member',
-        time_frequency : TimeGroupByOptions = 'month'
+        time_frequency : TimeGroupByOptions = 'month',
+        derived_cache : Optional[DerivedCache] = None
     ) -> None:
 
         # self.dataset = CoordinateWrangle(ds_data).to_360()
@@ -124,6 +339,7 @@ class ForecastClimatology:
         self.init = initialization_name
         self.mem = member_name
         self.tfreq = time_frequency
+        self.derived_cache = derived_cache
 
     def generate_climo(
         self,
@@ -134,6 +350,10 @@ class ForecastClimatology:
         """Generate the climatology based on the input 
         dataset covered period
 
+        With a `derived_cache` the climatology is reused from
+        (and saved to) the cache so it is computed in memory
+        before the `dask_option` is applied.
+
         Parameters
         ----------
         climo_start_year : int, optional
@@ -174,24 +394,38 @@ class ForecastClimatology:
                 "climo_start_year & climo_end_year"
             )
 
-        if self.tfreq != 'dayofyear':
-            da_climo = (
-                da_data
-                .mean(dim=f'{self.mem}')
-                .groupby(f'{self.init}.{self.tfreq}')
-                .mean(dim=f'{self.init}')
-            )
-        else :
-            da_climo = tsp.cal_daily_climo(
-                da_data.mean(dim=f'{self.mem}'),
-                smooth = True,
-                dim = self.init,
-                nharm = 4,
-                apply_taper = False
+        # reuse the same climatology calculated before
+        da_climo = None
+        if self.derived_cache is not None:
+            cache_key = self.derived_cache.key(
+                'forecast_climatology',
+                da_data,
+                source_files(ds_data),
+                member=self.mem,
+                time_frequency=self.tfreq,
+                period=(climo_start_year, climo_end_year)
             )
+            da_climo = self.derived_cache.get(cache_key)
+        if da_climo is None:
+            if self.tfreq != 'dayofyear':
+                da_climo = (
+                    da_data
+                    .mean(dim=f'{self.mem}')
+                    .groupby(f'{self.init}.{self.tfreq}')
+                    .mean(dim=f'{self.init}')
+                )
+            else :
+                da_climo = tsp.cal_daily_climo(
+                    da_data.mean(dim=f'{self.mem}'),
+                    smooth = True,
+                    dim = self.init,
+                    nharm = 4,
+                    apply_taper = False
+                )
 
-
-        da_climo.attrs['period_of_climatology'] = f'year {climo_start_year} to {climo_end_year}'
+            da_climo.attrs['period_of_climatology'] = f'year {climo_start_year} to {climo_end_year}'
+            if self.derived_cache is not None:
+                da_climo = self.derived_cache.set(cache_key, da_climo)
 
         if dask_option == 'lazy' :
             return da_climo
@@ -200,6 +434,83 @@ class ForecastClimatology:
         elif dask_option == 'compute':
             return da_climo.compute()
 
+    def update_climo(
+        self,
+        stats_file : str,
+        climo_start_year : int = 1993,
+        climo_end_year : int = 2020,
+        recompute_years : Optional[List[int]] = None
+    ) -> xr.DataArray:
+        """Update the climatology from the sufficient statistics
+        (see `ClimatologyStatistics`) saved in `stats_file`.
+
+        Only the years in the dataset without saved statistics
+        (and the `recompute_years`) are read so appending a new
+        year or sliding the period is proportional to the new
+        data. The statistics are saved back to `stats_file`.
+
+        Parameters
+        ----------
+        stats_file : str
+            netCDF file of the sufficient statistics
+            (created when it does not exist)
+        climo_start_year : int, optional
+            start year to calculation the climatology, by default 1993
+        climo_end_year : int, optional
+            end year to calculation the climatology, by default 2020
+        recompute_years : List[int], optional
+            years recalculated even if the statistics exist
+            (ex: modified files), by default None
+
+        Returns
+        -------
+        xr.DataArray
+            in-memory climatology same as `generate_climo`
+
+        Raises
+        ------
+        ValueError
+            when the kwarg climo_start_year & climo_end_year result in 
+            empty array crop
+        """
+        stats = ClimatologyStatistics.load(stats_file, self.init, self.tfreq)
+
+        # crop data
+        da_data = self.dataset[self.varname].mean(dim=f'{self.mem}').sel(
+            {self.init :
+                slice(
+                f'{climo_start_year}-01',
+                f'{climo_end_year}-12')
+            }
+        )
+
+        # test if the da_data crop period exist
+        if len(da_data[self.init].data) == 0:
+            raise ValueError(
+                "The data array is empty based on the kwarg "+
+                "climo_start_year & climo_end_year"
+            )
+
+        # only read the years without statistics
+        data_years = da_data[f'{self.init}.year'].values
+        recompute_years = recompute_years or []
+        new_years = [
+            year for year in np.unique(data_years)
+            if year not in stats.years or year in recompute_years
+        ]
+        if new_years:
+            stats.update(da_data.isel({self.init: np.isin(data_years, new_years)}))
+            stats.save(stats_file)
+
+        da_climo = stats.climatology(climo_start_year, climo_end_year)
+        if self.tfreq == 'dayofyear':
+            da_climo = tsp.smooth_daily_climo(da_climo, nharm=4, apply_taper=False)
+
+        da_climo.name = self.varname
+        da_climo.attrs['period_of_climatology'] = f'year {climo_start_year} to {climo_end_year}'
+
+        return da_climo
+
     def generate_anom_batch(
         self,
         climo_start_year : int = 1993,
@@ -323,6 +634,9 @@ class ForecastQuantile:
     time_frequency : TimeGroupByOptions, optional
         name in time frequency to do the time group, by default 'month'
         'year', 'month', 'dayofyear' are the available options.
+    derived_cache : DerivedCache, optional
+        on-disk cache of the quantile, by default None
+        (no caching)
     """
     def __init__(
         self,
@@ -330,7 +644,8 @@ class ForecastQuantile:
         var_name : str,
         initialization_name : str = 'init',
         member_name : str = 'member',
-        time_frequency : TimeGroupByOptions = 'month'
+        time_frequency : TimeGroupByOptions = 'month',
+        derived_cache : Optional[DerivedCache] = None
     ) -> None:
         # self.dataset = CoordinateWrangle(ds_data).to_360()
         self.dataset = ds_data
@@ -338,13 +653,15 @@ class ForecastQuantile:
         self.init = initialization_name
         self.mem = member_name
         self.tfreq = time_frequency
+        self.derived_cache = derived_cache
 
     def generate_quantile(
         self,
         quantile_start_year : int = 1993,
         quantile_end_year : int = 2020,
         quantile_threshold : float = 90.,
-        dask_obj : bool = True
+        dask_obj : bool = True,
+        files : Optional[List[str]] = None
     ) -> xr.DataArray:
         """Generate the quantile based on the input 
         dataset covered period. The output will be 
@@ -360,6 +677,10 @@ class ForecastQuantile:
             quantile value that define the threshold, by default 90.
         dask_obj : bool, optional
             if the input dataset is a dask object or not
+            (the dask result is computed before returned)
+        files : List[str], optional
+            files the data is derived from (key of the `derived_cache`),
+            by default `source_files` of the dataset
 
         Returns
         -------
@@ -392,54 +713,41 @@ class ForecastQuantile:
                 "quantile_start_year & quantile_end_year"
             )
 
-        # getting unique initialized time for threshold statistic
-        init_freq = np.unique(
-            da_data[f'{self.init}.{self.tfreq}'].data
+        # reuse the same quantile calculated before
+        if self.derived_cache is not None:
+            if files is None:
+                files = source_files(self.dataset)
+            cache_key = self.derived_cache.key(
+                'forecast_quantile',
+                da_data,
+                files,
+                member=self.mem,
+                time_frequency=self.tfreq,
+                period=(quantile_start_year, quantile_end_year),
+                quantile=quantile_threshold
+            )
+            da_threshold = self.derived_cache.get(cache_key)
+            if da_threshold is not None:
+                return da_threshold
+
+        # quantile of all initialization groups in one vectorized call
+        # (samples pooled over the initializations and members of each group)
+        da_threshold = grouped_quantile(
+            da_data,
+            quantile_threshold*0.01,
+            group=self.tfreq,
+            dim=self.init,
+            sample_dims=[self.mem]
         )
-
-        result_list = []
         if dask_obj:
-            for init in init_freq:
-                result_list.append(
-                    da_data
-                    .where(
-                        da_data[f'{self.init}.{self.tfreq}'] == init,
-                        drop=True
-                    )
-                    .stack(allens=(self.init,self.mem))
-                    .chunk({"allens":-1})
-                    .quantile(
-                        quantile_threshold*0.01,
-                        dim = 'allens',
-                        method = 'linear',
-                        skipna = True
-                    )
-                )
-            da_threshold_list = dask.compute(*result_list)
-        else:
-            for init in init_freq:
-                result_list.append(
-                    da_data
-                    .where(
-                        da_data[f'{self.init}.{self.tfreq}'] == init,
-                        drop=True
-                    )
-                    .stack(allens=(self.init,self.mem))
-                    .quantile(
-                        quantile_threshold*0.01,
-                        dim = 'allens',
-                        method = 'linear',
-                        skipna = True
-                    )
-                )
-            da_threshold_list = result_list
-        da_threshold = xr.concat(da_threshold_list, dim=self.tfreq)
-        da_threshold[self.tfreq] = init_freq
+            da_threshold = da_threshold.compute()
 
         da_threshold.attrs['period_of_quantile'] = (
             f'The {quantile_threshold} quantile from '+
             f'year {quantile_start_year} to {quantile_end_year}'
         )
+        if self.derived_cache is not None:
+            da_threshold = self.derived_cache.set(cache_key, da_threshold)
 
         return da_threshold
 
@@ -462,6 +770,9 @@ class HindcastClimatology:
     time_frequency : TimeGroupByOptions, optional
         name in time frequency to do the time group, by default 'month'
         'year', 'month', 'dayofyear' are the available options.
+    derived_cache : DerivedCache, optional
+        on-disk cache of the climatology, by default None
+        (no caching)
 
     """
 
@@ -470,23 +781,31 @@ class HindcastClimatology:
         ds_data : xr.Dataset,
         var_name : str,
         time_name : str = 'time',
-        time_frequency : TimeGroupByOptions = 'month'
+        time_frequency : TimeGroupByOptions = 'month',
+        derived_cache : Optional[DerivedCache] = None
     ) -> None:
         # self.dataset = CoordinateWrangle(ds_data).to_360()
         self.dataset = ds_data
         self.varname = var_name
         self.timename = time_name
         self.tfreq = time_frequency
+        self.derived_cache = derived_cache
 
     def generate_climo(
         self,
         climo_start_year : int = 1993,
         climo_end_year : int = 2020,
-        dask_option : DaskOptions = 'lazy'
+        dask_option : DaskOptions = 'lazy',
+        slab_size : Optional[int] = None,
+        window_half_width : Optional[int] = None
     ) -> xr.DataArray:
         """Generate the climatology based on the input 
         dataset covered period
 
+        With a `derived_cache` the climatology is reused from
+        (and saved to) the cache so it is computed in memory
+        before the `dask_option` is applied.
+
         Parameters
         ----------
         climo_start_year : int, optional
@@ -496,6 +815,16 @@ class HindcastClimatology:
         dask_option : DaskOptions, optional
             flag to determine one want the return result
             to be 'compute', 'persist' or keep 'lazy', by default 'lazy'
+        slab_size : int, optional
+            accumulate the 'dayofyear' climatology eagerly by reading
+            `slab_size` time steps at once (bounded memory without a
+            dask cluster), by default None which keeps the grouped mean
+            and the harmonic smoothing lazy (dask).
+        window_half_width : int, optional
+            'dayofyear' climatology pooled over the days within
+            `window_half_width` days across all years (window wraps
+            across the year boundary, no harmonic smoothing, see
+            `mom6_quantile.windowed_dayofyear_mean`), by default None
         
         Returns
         -------
@@ -527,24 +856,48 @@ class HindcastClimatology:
                 "climo_start_year & climo_end_year"
             )
 
-        # monthly and daily implementation
-        if self.tfreq != 'dayofyear':
-            da_climo = (
-                da_data
-                .groupby(f'{self.timename}.{self.tfreq}')
-                .mean(dim=f'{self.timename}')
-            )
-        else :
-            da_climo = tsp.cal_daily_climo(
+        if window_half_width is not None and self.tfreq != 'dayofyear':
+            raise ValueError("window_half_width is only used by the 'dayofyear' climatology")
+
+        # reuse the same climatology calculated before
+        da_climo = None
+        if self.derived_cache is not None:
+            cache_key = self.derived_cache.key(
+                'hindcast_climatology',
                 da_data,
-                smooth = True,
-                dim = self.timename,
-                nharm = 4,
-                apply_taper = False
+                source_files(ds_data),
+                time_frequency=self.tfreq,
+                period=(climo_start_year, climo_end_year),
+                window_half_width=window_half_width
             )
-            print('forced compute due to fft in 4 harmonic calculation')
+            da_climo = self.derived_cache.get(cache_key)
+        if da_climo is None:
+            # monthly and daily implementation
+            if window_half_width is not None:
+                da_climo = windowed_dayofyear_mean(
+                    da_data,
+                    dim = self.timename,
+                    half_width = window_half_width
+                )
+            elif self.tfreq != 'dayofyear':
+                da_climo = (
+                    da_data
+                    .groupby(f'{self.timename}.{self.tfreq}')
+                    .mean(dim=f'{self.timename}')
+                )
+            else :
+                da_climo = tsp.cal_daily_climo(
+                    da_data,
+                    smooth = True,
+                    dim = self.timename,
+                    nharm = 4,
+                    apply_taper = False,
+                    slab_size = slab_size
+                )
 
-        da_climo.attrs['period_of_climatology'] = f'year {climo_start_year} to {climo_end_year}'
+            da_climo.attrs['period_of_climatology'] = f'year {climo_start_year} to {climo_end_year}'
+            if self.derived_cache is not None:
+                da_climo = self.derived_cache.set(cache_key, da_climo)
 
         if dask_option == 'lazy' :
             return da_climo
@@ -553,6 +906,83 @@ class HindcastClimatology:
         elif dask_option == 'compute':
             return da_climo.compute()
 
+    def update_climo(
+        self,
+        stats_file : str,
+        climo_start_year : int = 1993,
+        climo_end_year : int = 2020,
+        recompute_years : Optional[List[int]] = None
+    ) -> xr.DataArray:
+        """Update the climatology from the sufficient statistics
+        (see `ClimatologyStatistics`) saved in `stats_file`.
+
+        Only the years in the dataset without saved statistics
+        (and the `recompute_years`) are read so appending a new
+        year or sliding the period is proportional to the new
+        data. The statistics are saved back to `stats_file`.
+
+        Parameters
+        ----------
+        stats_file : str
+            netCDF file of the sufficient statistics
+            (created when it does not exist)
+        climo_start_year : int, optional
+            start year to calculation the climatology, by default 1993
+        climo_end_year : int, optional
+            end year to calculation the climatology, by default 2020
+        recompute_years : List[int], optional
+            years recalculated even if the statistics exist
+            (ex: modified files), by default None
+
+        Returns
+        -------
+        xr.DataArray
+            in-memory climatology same as `generate_climo`
+
+        Raises
+        ------
+        ValueError
+            when the kwarg climo_start_year & climo_end_year result in 
+            empty array crop
+        """
+        stats = ClimatologyStatistics.load(stats_file, self.timename, self.tfreq)
+
+        # crop data
+        da_data = self.dataset[self.varname].sel(
+            {self.timename :
+                slice(
+                f'{climo_start_year}-01',
+                f'{climo_end_year}-12')
+            }
+        )
+
+        # test if the da_data crop period exist
+        if len(da_data[self.timename].data) == 0:
+            raise ValueError(
+                "The data array is empty based on the kwarg "+
+                "climo_start_year & climo_end_year"
+            )
+
+        # only read the years without statistics
+        data_years = da_data[f'{self.timename}.year'].values
+        recompute_years = recompute_years or []
+        new_years = [
+            year for year in np.unique(data_years)
+            if year not in stats.years or year in recompute_years
+        ]
+        if new_years:
+            stats.update(da_data.isel({self.timename: np.isin(data_years, new_years)}))
+            stats.save(stats_file)
+
+        da_climo = stats.climatology(climo_start_year, climo_end_year)
+        if self.tfreq == 'dayofyear':
+            da_climo = tsp.smooth_daily_climo(da_climo, nharm=4, apply_taper=False)
+
+        da_climo.name = self.varname
+        da_climo.attrs['period_of_climatology'] = f'year {climo_start_year} to {climo_end_year}'
+
+        return da_climo
+
     def generate_anom_batch(
         self,
         climo_start_year : int = 1993,
@@ -720,7 +1150,9 @@ class HistoricalQuantile:
         quantile_start_year : int = 1993,
         quantile_end_year : int = 2020,
         quantile_threshold : float = 90.,
-        dask_obj : bool = True
+        dask_obj : bool = True,
+        method : QuantileMethodOptions = 'exact',
+        window_half_width : Optional[int] = None
     ) -> xr.DataArray:
         """Generate the quantile based on the input 
         dataset covered period. The output will be 
@@ -736,6 +1168,20 @@ class HistoricalQuantile:
             quantile value that define the threshold, by default 90.
         dask_obj : bool, optional
             if the input dataset is a dask object or not
+            (the dask result is computed before returned)
+        method : QuantileMethodOptions, optional
+            'exact' for the quantile of all time groups from one sort
+            of the samples (see `grouped_quantile`) or
+            'sketch' for the approximate quantile of all time groups
+            from the P-square estimators of each cell updated in one pass
+            over the time axis (fixed state of five markers per cell and
+            group, see `mom6_quantile.GroupedP2Quantile`), by default 'exact'
+        window_half_width : int, optional
+            'dayofyear' quantile pooled over the days within
+            `window_half_width` days across all years (Hobday et al. 2016
+            uses 5, window wraps across the year boundary, see
+            `mom6_quantile.windowed_dayofyear_quantile`), by default None
+            only the exact dayofyear is used
 
         Returns
         -------
@@ -768,49 +1214,48 @@ class HistoricalQuantile:
                 "quantile_start_year & quantile_end_year"
             )
 
-        # getting unique time for threshold statistic
-        time_group = np.unique(
-            da_data[f'{self.timename}.{self.tfreq}'].data
-        )
-
-        result_list = []
-        if dask_obj:
-            for time in time_group:
-                result_list.append(
-                    da_data
-                    .where(
-                        da_data[f'{self.timename}.{self.tfreq}'] == time,
-                        drop=True
-                    )
-                    .chunk({self.timename:-1})
-                    .quantile(
-                        quantile_threshold*0.01,
-                        dim = self.timename,
-                        method = 'linear',
-                        skipna = True
-                    )
-                )
-            da_threshold_list = dask.compute(*result_list)
-        else:
-            for time in time_group:
-                result_list.append(
-                    da_data
-                    .where(
-                        da_data[f'{self.timename}.{self.tfreq}'] == time,
-                        drop=True
-                    )
-                    .quantile(
-                        quantile_threshold*0.01,
-                        dim = self.timename,
-                        method = 'linear',
-                        skipna = True
-                    )
+        if window_half_width is not None:
+            if self.tfreq != 'dayofyear' or method != 'exact':
+                raise ValueError(
+                    "window_half_width is only used by the exact 'dayofyear' quantile"
                 )
-            da_threshold_list = result_list
+            da_threshold = windowed_dayofyear_quantile(
+                da_data,
+                quantile_threshold*0.01,
+                dim=self.timename,
+                half_width=window_half_width
+            )
+            if dask_obj:
+                da_threshold = da_threshold.compute()
+            da_threshold.attrs['period_of_quantile'] = (
+                f'The {quantile_threshold} quantile from '+
+                f'year {quantile_start_year} to {quantile_end_year} '+
+                f'(+-{window_half_width} day window)'
+            )
+            return da_threshold
 
-        # combined the threshold for different groupby time
-        da_threshold = xr.concat(da_threshold_list, dim=self.tfreq)
-        da_threshold[self.tfreq] = time_group
+        if method == 'sketch':
+            da_threshold = sketch_grouped_quantile(
+                da_data,
+                quantile_threshold*0.01,
+                self.tfreq,
+                dim=self.timename
+            )
+            da_threshold.attrs['period_of_quantile'] = (
+                f'The {quantile_threshold} quantile from '+
+                f'year {quantile_start_year} to {quantile_end_year}'
+            )
+            return da_threshold
+
+        # quantile of all time groups in one vectorized call
+        da_threshold = grouped_quantile(
+            da_data,
+            quantile_threshold*0.01,
+            group=self.tfreq,
+            dim=self.timename
+        )
+        if dask_obj:
+            da_threshold = da_threshold.compute()
 
         da_threshold.attrs['period_of_quantile'] = (
             f'The {quantile_threshold} quantile from '+
@@ -818,3 +1263,287 @@ class HistoricalQuantile:
         )
 
         return da_threshold
+
+
+def fused_statistics_kernel(
+    values : np.ndarray,
+    group_index : np.ndarray,
+    ngroups : int,
+    time_values : np.ndarray,
+    quantiles : np.ndarray,
+    statistics : List[StatisticOptions],
+    nmember : int = 1
+) -> tuple:
+    """all requested statistics of each group from one block of samples
+
+    Parameters
+    ----------
+    values : np.ndarray
+        samples along the last axis
+    group_index : np.ndarray
+        group index (0 to ngroups-1) of each sample
+    ngroups : int
+        number of groups
+    time_values : np.ndarray
+        time of each sample (ns since 1970-01-01) used by 'trend'
+    quantiles : np.ndarray
+        1D array of quantiles between 0 and 1 used by 'quantile' and 'tercile'
+    statistics : List[StatisticOptions]
+        requested statistics
+    nmember : int, optional
+        number of members of each time (samples ordered time
+        then member), by default 1
+
+    Returns
+    -------
+    tuple
+        arrays in the order of the statistics. 'mean' (mean of the
+        ensemble means as `ForecastClimatology`) and 'std' (around
+        'mean') are
+        (..., ngroups), 'quantile' and 'tercile' are (..., ngroups, nquantile)
+        and 'trend' is (..., 2) polyfit coefficients (degree 1, 0) of the
+        ensemble mean anomaly (ensemble mean - group mean)
+    """
+    padded = pad_groups(values, group_index, ngroups)
+    count = (~np.isnan(padded)).sum(axis=-1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        # ensemble mean of each time (group mean and trend)
+        members = values.reshape(values.shape[:-1] + (-1, nmember))
+        ens_mean = np.nansum(members, axis=-1)/(~np.isnan(members)).sum(axis=-1)
+        ens_group_index = group_index[::nmember]
+        padded_ens = pad_groups(ens_mean, ens_group_index, ngroups)
+        mean = np.nansum(padded_ens, axis=-1)/(~np.isnan(padded_ens)).sum(axis=-1)
+        anomaly = padded_ens - mean[..., None]
+
+        results = {}
+        if 'mean' in statistics:
+            results['mean'] = mean
+        if 'std' in statistics:
+            # spread of all members around the climatology ('mean')
+            results['std'] = np.sqrt(
+                np.nansum((padded - mean[..., None])**2, axis=-1)/count
+            )
+        if 'trend' in statistics:
+            # least squares line of the ensemble mean anomaly against time
+            time_values = time_values[::nmember]
+            time_offset = time_values.min()
+            padded_time = pad_groups(
+                (time_values - time_offset).astype('float64'), ens_group_index, ngroups
+            )
+            valid = ~np.isnan(anomaly)
+            time_valid = np.where(valid, padded_time, np.nan)
+            nvalid = valid.sum(axis=(-2, -1))
+            time_mean = np.nansum(time_valid, axis=(-2, -1))/nvalid
+            anomaly_mean = np.nansum(anomaly, axis=(-2, -1))/nvalid
+            time_anom = time_valid - time_mean[..., None, None]
+            slope = (
+                np.nansum(time_anom*anomaly, axis=(-2, -1))
+                / np.nansum(time_anom**2, axis=(-2, -1))
+            )
+            intercept = anomaly_mean - slope*(time_mean + time_offset)
+            results['trend'] = np.stack([slope, intercept], axis=-1)
+        if 'quantile' in statistics or 'tercile' in statistics:
+            padded.sort(axis=-1)
+            all_quantiles = sorted_quantile(padded, quantiles)
+            nquantile = len(quantiles) - 2*('tercile' in statistics)
+            results['quantile'] = all_quantiles[..., :nquantile]
+            results['tercile'] = all_quantiles[..., nquantile:]
+
+    return tuple(results[statistic] for statistic in statistics)
+
+
+class FusedStatistics:
+    """
+    Class for calculating several statistics (climatology, standard
+    deviation, quantile, tercile, linear trend) from one read of
+    the data
+
+    All statistics are calculated by one kernel on each spatial
+    dask chunk (see `fused_statistics_kernel`) so the data is read
+    once instead of once for each product. The kernel places the
+    samples of each time group in a NaN padded array once and all
+    statistics share it.
+
+    The method should be able to accommodate the
+    hindcast (time_name='time') and the forecast
+    (time_name='init', member_name='member')
+
+    Parameters
+    ----------
+    ds_data : xr.Dataset
+        The dataset one want to use to
+        derive the statistics.
+    var_name : str
+        The variable name in the dataset
+    time_name : str, optional
+        time (or initialization) dimension name, by default 'time'
+    member_name : str, optional
+        ensemble member dimension name pooled with the time samples,
+        by default None (no member dimension)
+    time_frequency : TimeGroupByOptions, optional
+        name in time frequency to do the time group, by default 'month'
+        'year', 'month', 'dayofyear' are the available options.
+    """
+    def __init__(
+        self,
+        ds_data : xr.Dataset,
+        var_name : str,
+        time_name : str = 'time',
+        member_name : Optional[str] = None,
+        time_frequency : TimeGroupByOptions = 'month'
+    ) -> None:
+        self.dataset = ds_data
+        self.varname = var_name
+        self.timename = time_name
+        self.mem = member_name
+        self.tfreq = time_frequency
+
+    def generate_statistics(
+        self,
+        statistics : List[StatisticOptions],
+        start_year : int = 1993,
+        end_year : int = 2020,
+        quantile_thresholds : Optional[List[float]] = None,
+        dask_option : DaskOptions = 'compute'
+    ) -> xr.Dataset:
+        """Generate all requested statistics based on the
+        input dataset covered period
+
+        Parameters
+        ----------
+        statistics : List[StatisticOptions]
+            statistics in the output dataset
+            - 'mean' : `{var_name}_climo` mean of the ensemble mean of
+              each time group (not smoothed for 'dayofyear')
+            - 'std' : `{var_name}_std` standard deviation of the
+              anomaly (all members minus the 'mean' climatology)
+              of each time group
+            - 'quantile' : `{var_name}_threshold` quantiles of each time group
+            - 'tercile' : `f_lowmid` and `f_midhigh` of each time group
+            - 'trend' : `polyfit_coefficients` of the ensemble mean
+              anomaly against time (same as `ForecastDetrend.polyfit_coef`)
+        start_year : int, optional
+            start year of the period, by default 1993
+        end_year : int, optional
+            end year of the period, by default 2020
+        quantile_thresholds : List[float], optional
+            quantile values (0-100) of 'quantile', by default [90.]
+        dask_option : DaskOptions, optional
+            flag to determine one want the return result
+            to be 'compute', 'persist' or keep 'lazy', by default 'compute'
+
+        Returns
+        -------
+        xr.Dataset
+            dataset of the requested statistics
+
+        Raises
+        ------
+        ValueError
+            when the kwarg start_year & end_year result in
+            empty array crop
+        """
+        if quantile_thresholds is None:
+            quantile_thresholds = [90.]
+        statistics = list(dict.fromkeys(statistics))
+
+        # crop data
+        da_data = self.dataset[self.varname].sel(
+            {self.timename : slice(f'{start_year}-01', f'{end_year}-12')}
+        )
+
+        # test if the da_data crop period exist
+        if len(da_data[self.timename].data) == 0:
+            raise ValueError(
+                "The data array is empty based on the kwarg "+
+                "start_year & end_year"
+            )
+
+        # shared group bookkeeping of all statistics
+        group_labels, group_index = np.unique(
+            da_data[f'{self.timename}.{self.tfreq}'].values, return_inverse=True
+        )
+        ngroups = len(group_labels)
+        sample_dims = [self.timename] + ([self.mem] if self.mem else [])
+        nmember = da_data.sizes[self.mem] if self.mem else 1
+        sample_group_index = np.repeat(group_index, nmember)
+        sample_time = np.repeat(
+            da_data[self.timename].values.astype('datetime64[ns]').astype('int64'),
+            nmember
+        )
+        quantiles = np.array(
+            [quantile*0.01 for quantile in quantile_thresholds]*('quantile' in statistics)
+            + [1./3., 2./3.]*('tercile' in statistics),
+            dtype='float64'
+        )
+
+        def _kernel(values):
+            values = values.reshape(values.shape[:-len(sample_dims)] + (-1,))
+            return fused_statistics_kernel(
+                values, sample_group_index, ngroups, sample_time, quantiles, statistics,
+                nmember
+            )
+
+        output_core_dims = {
+            'mean': [self.tfreq],
+            'std': [self.tfreq],
+            'quantile': [self.tfreq, 'quantile'],
+            'tercile': [self.tfreq, 'tercile'],
+            'trend': ['degree']
+        }
+        output_sizes = {
+            self.tfreq: ngroups,
+            'quantile': len(quantile_thresholds),
+            'tercile': 2,
+            'degree': 2
+        }
+        if da_data.chunks is not None:
+            da_data = da_data.chunk({dim: -1 for dim in sample_dims})
+
+        results = xr.apply_ufunc(
+            _kernel,
+            da_data,
+            input_core_dims=[sample_dims],
+            output_core_dims=[output_core_dims[statistic] for statistic in statistics],
+            dask='parallelized',
+            output_dtypes=['float64']*len(statistics),
+            dask_gufunc_kwargs={'output_sizes': output_sizes}
+        )
+        if len(statistics) == 1:
+            results = (results,)
+
+        period = f'year {start_year} to {end_year}'
+        ds_stats = xr.Dataset()
+        for statistic, result in zip(statistics, results):
+            if self.tfreq in result.dims:
+                result = result.assign_coords({self.tfreq: group_labels})
+                result = result.transpose(self.tfreq, ...)
+            if statistic == 'mean':
+                ds_stats[f'{self.varname}_climo'] = result
+                ds_stats[f'{self.varname}_climo'].attrs['period_of_climatology'] = period
+            elif statistic == 'std':
+                ds_stats[f'{self.varname}_std'] = result
+                ds_stats[f'{self.varname}_std'].attrs['period_of_climatology'] = period
+            elif statistic == 'quantile':
+                result = result.assign_coords(
+                    quantile=[quantile*0.01 for quantile in quantile_thresholds]
+                ).transpose('quantile', ...)
+                ds_stats[f'{self.varname}_threshold'] = result
+                ds_stats[f'{self.varname}_threshold'].attrs['period_of_quantile'] = (
+                    f'The {quantile_thresholds} quantile from {period}'
+                )
+            elif statistic == 'tercile':
+                ds_stats['f_lowmid'] = result.isel(tercile=0)
+                ds_stats['f_midhigh'] = result.isel(tercile=1)
+            elif statistic == 'trend':
+                ds_stats['polyfit_coefficients'] = (
+                    result.assign_coords(degree=[1, 0]).transpose('degree', ...)
+                )
+        ds_stats.attrs = self.dataset.attrs
+
+        if dask_option == 'lazy' :
+            return ds_stats
+        elif dask_option == 'persist':
+            return ds_stats.persist()
+        elif dask_option == 'compute':
+            return ds_stats.compute()
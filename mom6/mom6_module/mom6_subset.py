@@ -0,0 +1,368 @@
+#!/usr/bin/env python
+"""
+The module is created to turn a lon/lat bounding box,
+a polygon or a depth range into index slices of the
+CEFI regional mom6 grid (xh, yh, xq, yq, z_l, z_i).
+
+The slices are applied before any data is read so
+only the needed hyperslab is requested from the local
+file or the OPeNDAP server.
+
+The raw model grid is curvilinear so the points of
+the grid are placed in a KD-tree (unit sphere x,y,z)
+built once per static grid and cached by
+`mom6_static.StaticGrid.grid_index` (see `AccessFiles.grid_index`).
+"""
+from typing import Optional, List, Tuple, Dict
+import numpy as np
+import xarray as xr
+from mom6.mom6_module.util import lazy_import
+
+# KD-tree and polygon backends loaded on first use
+spatial = lazy_import('scipy.spatial')
+mpath = lazy_import('matplotlib.path')
+
+
+def lonlat_to_xyz(lon:np.ndarray, lat:np.ndarray) -> np.ndarray:
+    """convert lon/lat in degree to the points on a unit sphere
+
+    Parameters
+    ----------
+    lon : np.ndarray
+        longitude in degree
+    lat : np.ndarray
+        latitude in degree
+
+    Returns
+    -------
+    np.ndarray
+        array of shape (..., 3)
+    """
+    lon_rad = np.deg2rad(lon)
+    lat_rad = np.deg2rad(lat)
+    return np.stack(
+        [
+            np.cos(lat_rad)*np.cos(lon_rad),
+            np.cos(lat_rad)*np.sin(lon_rad),
+            np.sin(lat_rad)
+        ],
+        axis=-1
+    )
+
+
+def in_lon_range(lon:np.ndarray, lon_min:float, lon_max:float) -> np.ndarray:
+    """check the longitude is in the range independent of the
+    longitude convention (-180~180 or 0~360). Range crossing
+    the dateline is allowed ex: lon_min=170, lon_max=-170
+
+    Returns
+    -------
+    np.ndarray
+        boolean array
+    """
+    return (lon - lon_min) % 360. <= (lon_max - lon_min) % 360.
+
+
+def depth_slice(z:np.ndarray, z_min:float, z_max:float) -> slice:
+    """index slice of the depth levels in the range
+
+    Parameters
+    ----------
+    z : np.ndarray
+        depth of the layer (monotonic increasing) ex: z_l
+    z_min : float
+        shallowest depth
+    z_max : float
+        deepest depth
+
+    Returns
+    -------
+    slice
+        slice of the layers between z_min and z_max.
+        When no layer is in the range the nearest layer is used.
+    """
+    z = np.asarray(z)
+    index = np.nonzero((z >= z_min) & (z <= z_max))[0]
+    if len(index) == 0:
+        nearest = int(np.argmin(np.abs(z - 0.5*(z_min+z_max))))
+        return slice(nearest, nearest+1)
+    return slice(int(index[0]), int(index[-1])+1)
+
+
+class GridIndex:
+    """
+    Spatial index of the model grid used to convert the
+    geographical subset to index slices
+
+    The tracer points (geolon, geolat) define the selected
+    cells. The velocity/corner dimensions (xq, yq) are extended
+    to include all faces of the selected cells.
+
+    Parameters
+    ----------
+    ds_static : xr.Dataset
+        static grid dataset (ocean_static.nc) including
+        'geolon' and 'geolat' for the raw grid or
+        1D 'lon' and 'lat' for the regridded data
+
+    Raises
+    ------
+    ValueError
+        When the static dataset does not have the grid coordinates
+    """
+    def __init__(self, ds_static:xr.Dataset) -> None:
+        if 'geolon' in ds_static and 'geolat' in ds_static:
+            da_lon = ds_static['geolon']
+            da_lat = ds_static['geolat']
+            self.ydim, self.xdim = da_lon.dims
+            self.lon = np.asarray(da_lon.values, dtype='float64')
+            self.lat = np.asarray(da_lat.values, dtype='float64')
+        elif 'lon' in ds_static.dims and 'lat' in ds_static.dims:
+            self.ydim, self.xdim = 'lat', 'lon'
+            self.lon, self.lat = np.meshgrid(
+                ds_static['lon'].values.astype('float64'),
+                ds_static['lat'].values.astype('float64')
+            )
+        else:
+            raise ValueError(
+                "Static dataset should have 'geolon' & 'geolat' or 'lon' & 'lat'"
+            )
+
+        self.ny, self.nx = self.lon.shape
+        # ocean mask (1 for ocean) when available in the static file
+        if 'wet' in ds_static and ds_static['wet'].dims == (self.ydim, self.xdim):
+            self.wet = np.asarray(ds_static['wet'].values) > 0
+        else:
+            self.wet = np.isfinite(self.lon) & np.isfinite(self.lat)
+        # size of the face dimensions to know if the grid is symmetric
+        self.face_sizes = {
+            dim : ds_static.sizes[dim]
+            for dim in ['xq', 'yq'] if dim in ds_static.dims
+        }
+        self._tree = None
+
+    @property
+    def tree(self) -> 'spatial.cKDTree':
+        """KD-tree of the tracer points (built on first use)"""
+        if self._tree is None:
+            # land points in the static grid can be NaN
+            valid = np.isfinite(self.lon) & np.isfinite(self.lat)
+            self._valid_index = np.flatnonzero(valid)
+            self._tree = spatial.cKDTree(
+                lonlat_to_xyz(self.lon.ravel()[self._valid_index], self.lat.ravel()[self._valid_index])
+            )
+        return self._tree
+
+    def _query_circle(self, lon:np.ndarray, lat:np.ndarray) -> np.ndarray:
+        """flat index of the grid points within the circle
+        enclosing all the input points"""
+        xyz = lonlat_to_xyz(lon, lat)
+        center = xyz.mean(axis=0)
+        center /= np.linalg.norm(center)
+        radius = np.max(np.linalg.norm(xyz - center, axis=1))
+        candidates = self.tree.query_ball_point(center, radius*(1.+1e-9)+1e-12)
+        return self._valid_index[np.asarray(candidates, dtype=int)]
+
+    def _nearest(self, lon:float, lat:float) -> np.ndarray:
+        """flat index of the nearest grid point"""
+        _, index = self.tree.query(lonlat_to_xyz(np.array(lon), np.array(lat)))
+        return self._valid_index[np.atleast_1d(index)]
+
+    def _slices_from_flat_index(self, flat_index:np.ndarray) -> Dict[str, slice]:
+        """index slices covering all the selected tracer points"""
+        jj, ii = np.unravel_index(flat_index, (self.ny, self.nx))
+        jmin, jmax = int(jj.min()), int(jj.max())
+        imin, imax = int(ii.min()), int(ii.max())
+
+        slices = {
+            self.ydim : slice(jmin, jmax+1),
+            self.xdim : slice(imin, imax+1)
+        }
+        for qdim, (hmin, hmax, nh) in {
+            'xq' : (imin, imax, self.nx),
+            'yq' : (jmin, jmax, self.ny)
+        }.items():
+            if qdim not in self.face_sizes:
+                continue
+            if self.face_sizes[qdim] == nh + 1:
+                # symmetric grid : face index i and i+1 bound the cell i
+                slices[qdim] = slice(hmin, hmax+2)
+            else:
+                # non-symmetric grid : face index i is the east/north face of cell i
+                slices[qdim] = slice(max(hmin-1, 0), hmax+1)
+        return slices
+
+    def bbox_slices(
+        self,
+        lon_min : float,
+        lon_max : float,
+        lat_min : float,
+        lat_max : float
+    ) -> Dict[str, slice]:
+        """index slices of the smallest index box covering
+        all the grid points in the lon/lat bounding box
+
+        Parameters
+        ----------
+        lon_min : float
+            west boundary (either -180~180 or 0~360)
+        lon_max : float
+            east boundary (either -180~180 or 0~360)
+        lat_min : float
+            south boundary
+        lat_max : float
+            north boundary
+
+        Returns
+        -------
+        Dict[str, slice]
+            dimension name to index slice. When the box is smaller
+            than a grid cell the nearest grid point is used.
+        """
+        # dense sampling of the box boundary to find the enclosing circle
+        lon_span = (lon_max - lon_min) % 360.
+        edge = np.linspace(0., 1., 17)
+        lon_edge = lon_min + lon_span*edge
+        lat_edge = lat_min + (lat_max - lat_min)*edge
+        lon_boundary = np.concatenate([
+            lon_edge, lon_edge, np.full(17, lon_min), np.full(17, lon_min+lon_span)
+        ])
+        lat_boundary = np.concatenate([
+            np.full(17, lat_min), np.full(17, lat_max), lat_edge, lat_edge
+        ])
+
+        candidates = self._query_circle(lon_boundary, lat_boundary)
+        lon = self.lon.ravel()[candidates]
+        lat = self.lat.ravel()[candidates]
+        inside = candidates[
+            in_lon_range(lon, lon_min, lon_max) & (lat >= lat_min) & (lat <= lat_max)
+        ]
+        if len(inside) == 0:
+            inside = self._nearest(lon_min+0.5*lon_span, 0.5*(lat_min+lat_max))
+
+        return self._slices_from_flat_index(inside)
+
+    def _polygon_inside(self, polygon:List[Tuple[float, float]]) -> np.ndarray:
+        """flat index of the grid points inside the polygon"""
+        vertices = np.asarray(polygon, dtype='float64')
+        # unwrap the longitude around the first vertex
+        lon_ref = vertices[0, 0]
+        vertices[:, 0] = lon_ref + (vertices[:, 0] - lon_ref + 180.) % 360. - 180.
+
+        closed = np.vstack([vertices, vertices[:1]])
+        edge = np.linspace(0., 1., 9)[:-1, None]
+        boundary = np.vstack([
+            closed[n] + (closed[n+1]-closed[n])*edge for n in range(len(vertices))
+        ])
+
+        candidates = self._query_circle(boundary[:, 0], boundary[:, 1])
+        lon = self.lon.ravel()[candidates]
+        lon = lon_ref + (lon - lon_ref + 180.) % 360. - 180.
+        lat = self.lat.ravel()[candidates]
+        path = mpath.Path(vertices)
+        return candidates[path.contains_points(np.column_stack([lon, lat]))]
+
+    def polygon_slices(self, polygon:List[Tuple[float, float]]) -> Dict[str, slice]:
+        """index slices of the smallest index box covering
+        all the grid points inside the polygon
+
+        Parameters
+        ----------
+        polygon : List[Tuple[float, float]]
+            (lon, lat) vertices of the polygon
+
+        Returns
+        -------
+        Dict[str, slice]
+            dimension name to index slice. When no grid point is
+            inside the polygon the nearest grid point to the
+            first vertex is used.
+        """
+        inside = self._polygon_inside(polygon)
+        if len(inside) == 0:
+            inside = self._nearest(polygon[0][0], polygon[0][1])
+        return self._slices_from_flat_index(inside)
+
+    def polygon_mask(
+        self,
+        polygon : List[Tuple[float, float]],
+        slices : Optional[Dict[str, slice]] = None
+    ) -> xr.DataArray:
+        """mask of the tracer points inside the polygon
+
+        Parameters
+        ----------
+        polygon : List[Tuple[float, float]]
+            (lon, lat) vertices of the polygon
+        slices : Dict[str, slice], optional
+            index slices to subset the mask ex: the output of
+            `polygon_slices`, by default None (entire grid)
+
+        Returns
+        -------
+        xr.DataArray
+            boolean mask with the tracer dimensions
+        """
+        mask = np.zeros(self.ny*self.nx, dtype=bool)
+        mask[self._polygon_inside(polygon)] = True
+        da_mask = xr.DataArray(
+            mask.reshape(self.ny, self.nx),
+            dims=(self.ydim, self.xdim)
+        )
+        if slices is not None:
+            da_mask = da_mask.isel(
+                {dim: slices[dim] for dim in [self.ydim, self.xdim] if dim in slices}
+            )
+        return da_mask
+
+
+def subset_slices(
+    grid_index : Optional[GridIndex] = None,
+    bbox : Optional[Tuple[float, float, float, float]] = None,
+    polygon : Optional[List[Tuple[float, float]]] = None,
+    z_range : Optional[Tuple[float, float]] = None,
+    ds : Optional[xr.Dataset] = None
+) -> Dict[str, slice]:
+    """combine the horizontal and vertical subset to index slices
+
+    Parameters
+    ----------
+    grid_index : GridIndex, optional
+        grid index of the data needed for the `bbox` and
+        `polygon`, by default None
+    bbox : Tuple[float, float, float, float], optional
+        (lon_min, lon_max, lat_min, lat_max), by default None
+    polygon : List[Tuple[float, float]], optional
+        (lon, lat) vertices of the polygon, by default None
+    z_range : Tuple[float, float], optional
+        (z_min, z_max) depth range in meter, by default None
+    ds : xr.Dataset, optional
+        dataset with the vertical coordinates 'z_l'/'z_i'
+        needed for the `z_range`, by default None
+
+    Returns
+    -------
+    Dict[str, slice]
+        dimension name to index slice
+    """
+    if bbox is not None and polygon is not None:
+        raise ValueError('only one of bbox and polygon can be used')
+
+    if (bbox is not None or polygon is not None) and grid_index is None:
+        raise ValueError('grid_index is needed for bbox and polygon')
+
+    slices = {}
+    if bbox is not None:
+        slices.update(grid_index.bbox_slices(*bbox))
+    elif polygon is not None:
+        slices.update(grid_index.polygon_slices(polygon))
+
+    if z_range is not None:
+        if ds is None or 'z_l' not in ds.coords:
+            raise ValueError("z_range needs the dataset with 'z_l' coordinate")
+        zslice = depth_slice(ds['z_l'].values, *z_range)
+        slices['z_l'] = zslice
+        # interfaces bounding the selected layers
+        slices['z_i'] = slice(zslice.start, zslice.stop+1)
+
+    return slices
@@ -49,4 +49,20 @@ TimeGroupByOptions = Literal[
 
 DaskOptions = Literal[
     'lazy', 'persist', 'compute'
-]
\ No newline at end of file
+]
+
+QuantileMethodOptions = Literal[
+    'exact', 'sketch'
+]
+
+StatisticOptions = Literal[
+    'mean', 'std', 'quantile', 'tercile', 'trend'
+]
+
+RegridEngineOptions = Literal[
+    'xesmf', 'sparse'
+]
+
+RegridMethodOptions = Literal[
+    'bilinear', 'conservative', 'conservative_normed', 'patch', 'nearest_s2d'
+]
@@ -11,7 +11,11 @@ The steps are following the Ross et al 2023
 """
 
 import xarray as xr
-import xesmf as xe
+from mom6.mom6_module.util import lazy_import
+from mom6.mom6_module.mom6_regrid import get_regridder
+
+# xesmf (and ESMF) loaded on first use
+xe = lazy_import('xesmf')
 
 class VectorRotation:
     """
@@ -90,8 +94,9 @@ class VectorRotation:
     def generate_regridder(
         ds_ori : xr.Dataset,
         ds_regrid :xr.Dataset
-    )->xe.Regridder:
+    )->'xe.Regridder':
         """create regridder for interpolation
+        (weights reused through `get_regridder`)
 
         Parameters
         ----------
@@ -105,7 +110,7 @@ class VectorRotation:
         xe.Regridder
             regridder object used for regridding
         """
-        regridder = xe.Regridder(
+        regridder = get_regridder(
             ds_ori, ds_regrid, "bilinear", unmapped_to_nan=True
         )
         return regridder
@@ -2,7 +2,7 @@
 Include the useful time series processing functions
 """
 
-from typing import Hashable
+from typing import Hashable, Optional
 import numpy as np
 import xarray as xr
 from pandas import DateOffset
@@ -191,7 +191,8 @@ def cal_daily_climo(
         dim : Hashable = 'time',
         smooth : bool = True,
         nharm: int = 4,
-        apply_taper: bool = False
+        apply_taper: bool = False,
+        slab_size: Optional[int] = None
 ):
     """
     Calculate the smoothed daily climatology mimicing the
@@ -199,8 +200,9 @@ def cal_daily_climo(
     steps to get the daily smoothed annual signal.
     1. Calculate the daily climatology based on dayofyear along
         ``dim``. 
-    2. Use the scipy.fft.rfft and scipy.fft.irfft to preservered
-        the first ``nharm`` of harmonic from the daily climatology
+    2. Project the daily climatology onto the first ``nharm``
+        harmonics (same as numpy.fft.rfft, truncation and irfft)
+        chunk-wise with dask so the result stays lazy
     
 
     Parameters
@@ -226,6 +228,12 @@ def cal_daily_climo(
         If True, a minitaper like the NCL smthClmDayTLL is applied
         to the last preserved harmonic (half of the orignal amplituide). 
         If False (default), no taper is applied.
+    slab_size : int, optional
+        If given, the daily climatology is accumulated by reading
+        ``slab_size`` time steps at a time (see `stream_daily_climo`)
+        so the peak memory does not depend on the record length.
+        If None (default), the grouped mean and the smoothing stay
+        lazy for dask backed data.
 
     Returns
     -------
@@ -237,23 +245,174 @@ def cal_daily_climo(
     """
 
     # calculate the daily climatology
-    da_daily_climo = da_data.groupby(f'{dim}.dayofyear').mean(dim=f'{dim}').compute()
+    if slab_size is None:
+        da_daily_climo = da_data.groupby(f'{dim}.dayofyear').mean(dim=f'{dim}')
+    else:
+        da_daily_climo = stream_daily_climo(da_data, dim=dim, slab_size=slab_size)
     if not smooth:
         print('unsmoothed daily climatology')
         return da_daily_climo
     else:
-        # prepare the dataarray to be fft ready (last axis will be the dim of fft)
-        da_daily_climo = da_daily_climo.transpose(...,'dayofyear')
-
-        # perform real data fft/inverse fft (numpy array)
-        coeff = rfft(da_daily_climo.data)
-        coeff[...,nharm+1:] = 0
-        if apply_taper:
-            print('minitaper-applied')
-            coeff[...,nharm:] /= 2    # minitaper (in NCL smthClmDayTLL)
-        smoothed = irfft(coeff,n=len(da_daily_climo.dayofyear.data))
-
-        # put data to xr.DataArray
-        da_daily_climo.data = smoothed
-        print(f'smoothed daily climatology (preserve first {nharm} harmonics)')
-        return da_daily_climo
+        return smooth_daily_climo(da_daily_climo, nharm=nharm, apply_taper=apply_taper)
+
+
+def smooth_daily_climo(
+        da_daily_climo : xr.DataArray,
+        nharm : int = 4,
+        apply_taper : bool = False
+) -> xr.DataArray:
+    """
+    Smooth the daily climatology by only preserving the first
+    ``nharm`` harmonics (step 2 of `cal_daily_climo`)
+
+    The rfft, truncation and irfft along dayofyear is a linear
+    operator so it is applied as a product with the precomputed
+    (ndays x ndays) matrix `harmonic_projection_matrix` on each
+    dask chunk (dask backed input stays lazy).
+
+    Parameters
+    ----------
+    da_daily_climo : xarray.DataArray
+        daily climatology with the "dayofyear" dimension
+    nharm : int, default: 4
+        The number of first few harmonics preserved
+    apply_taper : bool, default: False
+        If True, a minitaper like the NCL smthClmDayTLL is applied
+        to the last preserved harmonic
+
+    Returns
+    -------
+    xarray.DataArray
+        the smoothed daily climatology ("dayofyear" as the last dimension)
+    """
+    # prepare the dataarray (last axis will be the dim of fft)
+    da_daily_climo = da_daily_climo.transpose(...,'dayofyear')
+    if da_daily_climo.chunks is not None:
+        da_daily_climo = da_daily_climo.chunk({'dayofyear': -1})
+
+    if apply_taper:
+        print('minitaper-applied')
+    projection = harmonic_projection_matrix(
+        len(da_daily_climo['dayofyear']), nharm, apply_taper
+    )
+
+    # x @ projection == irfft(truncated rfft(x)) along the last axis
+    da_smoothed = xr.apply_ufunc(
+        lambda values: values @ projection,
+        da_daily_climo,
+        input_core_dims=[['dayofyear']],
+        output_core_dims=[['dayofyear']],
+        dask='parallelized',
+        output_dtypes=[np.result_type(da_daily_climo.dtype, projection.dtype)],
+        keep_attrs=True
+    )
+    print(f'smoothed daily climatology (preserve first {nharm} harmonics)')
+    return da_smoothed
+
+
+def harmonic_projection_matrix(
+        ndays : int,
+        nharm : int = 4,
+        apply_taper : bool = False
+) -> np.ndarray:
+    """
+    Matrix of the harmonic smoothing along a ``ndays`` long axis
+
+    Row i is the smoothed unit impulse at day i so the smoothing
+    of x (last axis of length ndays) is ``x @ matrix``.
+
+    Parameters
+    ----------
+    ndays : int
+        length of the dayofyear axis
+    nharm : int, default: 4
+        The number of first few harmonics preserved
+    apply_taper : bool, default: False
+        If True, the last preserved harmonic is halved (minitaper)
+
+    Returns
+    -------
+    numpy.ndarray
+        (ndays, ndays) projection matrix
+    """
+    coeff = rfft(np.eye(ndays), axis=-1)
+    coeff[...,nharm+1:] = 0
+    if apply_taper:
+        coeff[...,nharm:] /= 2    # minitaper (in NCL smthClmDayTLL)
+    return irfft(coeff, n=ndays, axis=-1)
+
+
+def stream_daily_climo(
+        da_data : xr.DataArray,
+        dim : Hashable = 'time',
+        slab_size : int = 365
+) -> xr.DataArray:
+    """
+    Calculate the daily climatology (mean of each dayofyear) by
+    reading ``slab_size`` time steps at a time and keeping the
+    running sum and count of the valid values for each dayofyear.
+
+    Only one slab of the (lazy) data and the 366 sums/counts are
+    in memory so the peak memory is independent of the record length.
+    The result is the same as
+    ``da_data.groupby(f'{dim}.dayofyear').mean(dim=f'{dim}')``.
+
+    Parameters
+    ----------
+    da_data : xarray.DataArray
+        Timeseries data (can be multi-dimensional and dask backed)
+    dim : Hashable, default: "time"
+        The time dimension name
+    slab_size : int, default: 365
+        Number of time steps loaded at once
+
+    Returns
+    -------
+    xarray.DataArray
+        the daily climatology with "dayofyear" replacing ``dim``
+    """
+    if slab_size < 1:
+        raise ValueError('slab_size should be a positive integer')
+
+    axis = da_data.get_axis_num(dim)
+    dayofyear = da_data[dim].dt.dayofyear.values
+    other_shape = tuple(
+        size for ndim, size in enumerate(da_data.shape) if ndim != axis
+    )
+    sums = np.zeros((366,) + other_shape, dtype='float64')
+    counts = np.zeros((366,) + other_shape, dtype='int64')
+
+    for start in range(0, da_data.sizes[dim], slab_size):
+        slab = np.moveaxis(
+            np.asarray(da_data.isel({dim: slice(start, start+slab_size)}).values),
+            axis, 0
+        )
+        index = dayofyear[start:start+slab_size] - 1
+        valid = np.isfinite(slab)
+        values = np.where(valid, slab, 0.)
+        if len(np.unique(index)) == len(index):
+            sums[index] += values
+            counts[index] += valid
+        else:
+            np.add.at(sums, index, values)
+            np.add.at(counts, index, valid)
+
+    present = np.unique(dayofyear)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        climo = sums[present-1]/counts[present-1]
+    climo[counts[present-1] == 0] = np.nan
+    if np.issubdtype(da_data.dtype, np.floating):
+        climo = climo.astype(da_data.dtype)
+
+    coords = {
+        name: coord for name, coord in da_data.coords.items()
+        if dim not in coord.dims
+    }
+    coords['dayofyear'] = present
+    return xr.DataArray(
+        np.moveaxis(climo, 0, axis),
+        dims=[name if name != dim else 'dayofyear' for name in da_data.dims],
+        coords=coords,
+        attrs=da_data.attrs,
+        name=da_data.name
+    )
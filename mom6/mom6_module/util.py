@@ -4,6 +4,8 @@ import sys
 import logging
 import hashlib
 import shutil
+import types
+import importlib
 from pathlib import Path
 
 
@@ -126,3 +128,87 @@ def setup_logging(logfile):
             logging.StreamHandler(sys.stdout)
         ]
     )
+
+
+class LazyModule(types.ModuleType):
+    """module placeholder importing the real module on the
+    first attribute access (ex: `xe.Regridder`)
+
+    Attributes set on the placeholder (ex: `unittest.mock.patch`)
+    shadow the ones of the real module.
+
+    Parameters
+    ----------
+    name : str
+        absolute module name ex: 'xesmf' or 'scipy.spatial'
+    """
+    def __init__(self, name:str):
+        super().__init__(name)
+        self.__dict__['_lazy_module'] = None
+
+    def _load(self) -> types.ModuleType:
+        if self.__dict__['_lazy_module'] is None:
+            self.__dict__['_lazy_module'] = importlib.import_module(self.__name__)
+        return self.__dict__['_lazy_module']
+
+    def __getattr__(self, name:str):
+        return getattr(self._load(), name)
+
+    def __dir__(self):
+        return dir(self._load())
+
+    def __repr__(self):
+        status = 'not loaded' if self.__dict__['_lazy_module'] is None else 'loaded'
+        return f"<lazy module '{self.__name__}' ({status})>"
+
+
+def lazy_import(name:str) -> types.ModuleType:
+    """import the heavy optional backends only on first use
+
+    Parameters
+    ----------
+    name : str
+        absolute module name
+
+    Returns
+    -------
+    types.ModuleType
+        the module when already imported, otherwise a `LazyModule`
+    """
+    if name in sys.modules:
+        return sys.modules[name]
+    return LazyModule(name)
+
+
+def lon_to_360(ds_data, lon_name:str = 'lon'):
+    """change the longitude from -180-180 to 0-360 without
+    copying the data variables
+
+    Only the longitude variable is replaced (lazily for dask
+    backed longitude) in a shallow copy of the dataset so
+    the input dataset is not modified.
+
+    Parameters
+    ----------
+    ds_data : xr.Dataset
+        dataset with the longitude variable
+    lon_name : str, optional
+        longitude variable name, by default 'lon'
+
+    Returns
+    -------
+    xr.Dataset
+        shallow copy sharing the data variables with the input
+
+    Raises
+    ------
+    KeyError
+        when the longitude variable does not exist
+    """
+    da_lon = ds_data[lon_name]
+    da_lon_360 = da_lon.where(da_lon >= 0., da_lon + 360.)
+    da_lon_360.attrs = da_lon.attrs
+    da_lon_360.encoding = da_lon.encoding
+    if lon_name in ds_data.coords:
+        return ds_data.assign_coords({lon_name: da_lon_360})
+    return ds_data.assign({lon_name: da_lon_360})
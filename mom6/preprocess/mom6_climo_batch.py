@@ -2,8 +2,9 @@
 This script is designed to do batch climatology of the 
 regional mom6 output using the new mom6_read module
 
-!!!! possible daily calculation can only be done 
-one file at a time due to the memory limitation
+daily (dayofyear) climatology of the hindcast is accumulated
+one time slab at a time so the data is not loaded to memory
+even when "load_data_to_memory" is true
 
 """
 import os
@@ -105,7 +106,9 @@ def climo_batch(dict_json: dict) -> xr.Dataset:
                     if os.path.exists(new_file):
                         logging.info("%s: already exists. skipping...", new_file)
                     else:
-                        if load:
+                        climo_freq = dict_json['output']['climatology_groupby_frequency']
+                        # dayofyear climatology streams the time slabs
+                        if load and climo_freq != 'dayofyear':
                             ds_var = ds_var.load()
                         # find the variable dimension info (for chunking)
                         logging.info("processing %s", new_file)
@@ -116,14 +119,15 @@ def climo_batch(dict_json: dict) -> xr.Dataset:
                             ds_data=ds_var,
                             var_name=varname,
                             time_name='time',
-                            time_frequency=dict_json['output']['climatology_groupby_frequency']
+                            time_frequency=climo_freq
                         )
 
                         # calculate climatology
                         da_climo = class_climo.generate_climo(
                             climo_start_year=dict_json['output']['climatology_start_year'],
                             climo_end_year=dict_json['output']['climatology_end_year'],
-                            dask_option='persist'
+                            dask_option='persist',
+                            slab_size=365
                         )
 
                         # create output dataset
@@ -165,10 +169,7 @@ def climo_batch(dict_json: dict) -> xr.Dataset:
         # loop through all file in the original path
         for var in unique_var_list:
             # open the file
-            single_var_file_list = local_access.get(variable=var)
-            with xr.open_mfdataset(
-                single_var_file_list, combine='nested', concat_dim='init', chunks={}
-            ) as ds_var:
+            with local_access.open(var, merge_static=False) as ds_var:
                 varname = ds_var.attrs['cefi_variable']
                 new_varname = f'{varname}_climatology'
 
@@ -87,13 +87,8 @@ def ild_bbv_batch(dict_json:dict):
     so_path = local_access.get(variable='so')[0]
 
     if grid_type == 'raw':
-        statics_path = local_access.get(variable='ocean_static')[0]
-        # prepare static data and lazy load it
-        try:
-            # time dim not needed appeared in the first version of NWA data
-            ds_static = xr.open_dataset(statics_path,chunks={'yh': 50, 'xh': 50}).drop_vars('time')
-        except ValueError:
-            ds_static = xr.open_dataset(statics_path)
+        # prepare static data (loaded once per process and shared) and chunk it
+        ds_static = local_access.static_grid().dataset.chunk({'yh': 50, 'xh': 50})
         da_lon = ds_static['geolon']
         da_lat = ds_static['geolat']
         da_bottom = ds_static['deptho']
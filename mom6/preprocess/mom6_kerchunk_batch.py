@@ -0,0 +1,79 @@
+"""
+This script is designed to do batch generation of the
+kerchunk json references of the local regional mom6 output
+
+Each netcdf file in the release directory gets its own
+reference and the files of each variable are combined
+into one reference (along 'init' for forecast/reforecast
+and 'time' for the rest) so the whole variable can be
+opened lazily with `AccessFiles.open_references`.
+"""
+import os
+import sys
+import logging
+import warnings
+from mom6.mom6_module.mom6_kerchunk import build_release_references
+from mom6.mom6_module.util import load_json, setup_logging, log_filename
+
+warnings.simplefilter("ignore")
+
+def kerchunk_batch(dict_json:dict) -> list:
+    """perform the batch reference generation of the mom6 output
+
+    Parameters
+    ----------
+    dict_json : dict
+        dictionary that contain the constant setting in json
+
+    Returns
+    -------
+    list
+        all reference files of the release
+    """
+    references = build_release_references(
+        local_top_dir=dict_json['local_top_dir'],
+        region=dict_json['region'],
+        subdomain=dict_json['subdomain'],
+        experiment_type=dict_json['experiment_type'],
+        output_frequency=dict_json['output_frequency'],
+        grid_type=dict_json['grid_type'],
+        release=dict_json['release'],
+        output_dir=dict_json.get('output_dir', None),
+        overwrite=dict_json.get('overwrite', False)
+    )
+    for reference in references:
+        logging.info("Reference ready: %s", reference)
+
+    return references
+
+
+if __name__=="__main__":
+
+    # Ensure a JSON file is provided as an argument
+    if len(sys.argv) < 2:
+        print("Usage: python mom6_kerchunk_batch.py xxxx.json")
+        sys.exit(1)
+
+    # Get the JSON file path from command-line arguments
+    json_setting = sys.argv[1]
+
+    logfilename = log_filename(json_setting)
+    current_location = os.path.dirname(os.path.abspath(__file__))
+    logfilename = os.path.join(current_location,logfilename)
+
+    # remove previous log file if exists
+    if os.path.exists(logfilename):
+        os.remove(logfilename)
+
+    setup_logging(logfilename)
+
+    try:
+        # Load the settings
+        dict_json1 = load_json(json_setting,json_path=current_location)
+        kerchunk_batch(dict_json1)
+
+    except Exception as e:
+        logging.exception("An exception occurred")
+
+    finally:
+        logging.info("Kerchunk reference process finished.")
@@ -3,28 +3,193 @@ This script is designed to do batch regridf of the
 regional mom6 output usig the new mom6_read module
 
 The regridding is using the xesmf package with the bilinear method
-there are other more conservative way to doing the regriddeding 
+by default ("regrid_method" in the json selects the conservative,
+conservative_normed, patch or nearest_s2d method)
 https://xesmf.readthedocs.io/en/stable/notebooks/Compare_algorithms.html 
 """
 import os
 import sys
 import logging
 import warnings
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Optional, Callable
 import xarray as xr
 from dask.distributed import Client
 from mom6_rotate_batch import output_processed_data
 from mom6.data_structure import portal_data
 from mom6.mom6_module.mom6_read import AccessFiles
-from mom6.mom6_module.mom6_regrid import Regridding
+from mom6.mom6_module.mom6_regrid import (
+    Regridding,
+    BOUNDS_METHODS,
+    add_corner_bounds,
+    regrid_call_kwargs,
+    get_regridder,
+    get_sparse_regridder
+)
 from mom6.mom6_module.mom6_export import mom6_encode_attr
 from mom6.mom6_module.util import load_json, setup_logging, log_filename
 from mom6.data_structure.portal_data import DataStructure
 
 warnings.simplefilter("ignore")
 
+# static lon lat of the supported horizontal grids (x, y)
+GRID_COORDS = {
+    ('xh', 'yh'): ('geolon', 'geolat'),
+    ('xT', 'yT'): ('GEOLON', 'GEOLAT'),
+    ('xq', 'yh'): ('geolon_u', 'geolat_u'),
+    ('xh', 'yq'): ('geolon_v', 'geolat_v')
+}
+
+# static ocean (wet) mask of the supported tracer grids
+# (ice tracer points share the ocean tracer points)
+GRID_MASKS = {
+    ('xh', 'yh'): 'wet',
+    ('xT', 'yT'): 'tmask'
+}
+
+
+def find_grid(dims:list) -> Optional[tuple]:
+    """find the horizontal (x, y) dims of the file
+
+    Parameters
+    ----------
+    dims : list
+        dimensions of the dataset
+
+    Returns
+    -------
+    Optional[tuple]
+        key of `GRID_COORDS`, None for unknown grid
+    """
+    for grid_dims in GRID_COORDS:
+        if all(dim in dims for dim in grid_dims):
+            return grid_dims
+    return None
+
+
+def grid_mask(
+    grid_dims:tuple,
+    ds_grid_static:xr.Dataset,
+    ds_static:xr.Dataset
+) -> Optional[xr.Variable]:
+    """source ocean mask (1 ocean, 0 land) of the grid
+
+    Parameters
+    ----------
+    grid_dims : tuple
+        key of `GRID_COORDS`
+    ds_grid_static : xr.Dataset
+        static dataset of the grid (ocean_static or ice_static)
+    ds_static : xr.Dataset
+        ocean_static dataset ('wet' used for the ice grid
+        when the ice_static has no mask)
+
+    Returns
+    -------
+    Optional[xr.Variable]
+        mask on the grid dims, None when not found
+    """
+    maskname = GRID_MASKS.get(grid_dims)
+    if maskname in ds_grid_static:
+        mask = ds_grid_static[maskname].variable
+    elif grid_dims == ('xT', 'yT') and 'wet' in ds_static:
+        mask = xr.Variable(
+            ds_grid_static[GRID_COORDS[grid_dims][0]].dims,
+            ds_static['wet'].values
+        )
+    else:
+        return None
+    return (mask.fillna(0.) > 0).astype('int32')
+
+
+def regrid_filename(filename:str, cefi_grid_type:str) -> str:
+    """create new filename based on original filename"""
+    filename_seg = filename.split('.')
+    grid_type_index = filename_seg.index('raw')
+    filename_seg[grid_type_index] = cefi_grid_type
+    return '.'.join(filename_seg)
+
+
+def regrid_file(
+    file:str,
+    new_filename:str,
+    regridder:Callable,
+    dict_json:dict,
+    call_kwargs:Optional[dict] = None
+):
+    """regrid all variables of one file with the shared regridder
+    and output the regridded file
+
+    Parameters
+    ----------
+    file : str
+        raw file
+    new_filename : str
+        regridded file name
+    regridder : Callable
+        regridder of the file grid (`xe.Regridder` or `SparseRegridder`)
+    dict_json : dict
+        dictionary that contain the constant setting in json
+    call_kwargs : dict, optional
+        keyword arguments of the regridder call
+        (see `regrid_call_kwargs`), by default None
+    """
+    logging.info("processing %s", new_filename)
+    with xr.open_dataset(file, chunks={}) as ds_var:
+        varname = ds_var.attrs['cefi_variable']
+
+        # forecast/reforecast files has two varname in one single file
+        var_names = [var for var in [varname, f'{varname}_anom'] if var in ds_var]
+
+        # perform regridding of all variables at once
+        ds_regrid = regridder(ds_var[var_names], **(call_kwargs or {}))
+
+        # copy the encoding and attributes
+        ds_regrid = mom6_encode_attr(ds_var, ds_regrid, var_names=[varname])
+
+        # redefine new global attribute
+        # global attributes
+
+        # create new cefi_rel_path based on original cefi_rel_path
+        filepath = ds_var.attrs['cefi_rel_path']
+        filepath_seg = filepath.split('/')
+
+        # Change 'raw' to 'regrid'
+        for i, element in enumerate(filepath_seg):
+            if element == 'raw':
+                filepath_seg[i] = dict_json['output']['cefi_grid_type']
+
+        new_cefi_rel_path = '/'.join(filepath_seg)
+
+        ds_regrid.attrs['cefi_rel_path'] = new_cefi_rel_path
+        ds_regrid.attrs['cefi_filename'] = new_filename
+        ds_regrid.attrs['cefi_grid_type'] = dict_json['output']['cefi_grid_type']
+
+        # output the processed data
+        output_processed_data(
+            ds_regrid,
+            top_dir=dict_json['local_top_dir'],
+            dict_json_output=dict_json['output']
+        )
+
+
 def regrid_batch(dict_json:dict):
     """perform the batch regridding of the mom6 output
 
+    The files are grouped by the horizontal grid and every
+    group uses one regridder for all variables. The files of
+    a group are regridded concurrently by `max_workers` threads
+    (optional "max_workers" in the json, by default 4) and the
+    optional "regrid_engine" ('xesmf' or 'sparse') selects how
+    the weights are applied. The optional "regrid_method"
+    (by default 'bilinear', see `RegridMethodOptions`) selects
+    the regridding method. The conservative methods exclude the
+    land cells with the static mask and skip the missing source
+    values by renormalizing the weights. The optional
+    "regrid_na_thres" (by default 1.0) is the maximum fraction
+    of missing weight before a destination point is set to NaN.
+    The other methods keep the NaN of the land points.
+
     TODO: dealing with the ice_month static field and 
     also the ice_month field
 
@@ -81,13 +246,9 @@ def regrid_batch(dict_json:dict):
     )
 
     allfile_list = local_access.get()
-    statics = local_access.get(variable='ocean_static')
 
-    # prepare static data
-    try:
-        ds_static = xr.open_dataset(statics[0]).drop_vars('time') # time dim not needed appeared in the first version of NWA data
-    except ValueError:
-        ds_static = xr.open_dataset(statics[0])
+    # prepare static data (loaded once per process and shared)
+    ds_static = local_access.static_grid().dataset
 
     try:
         ice_statics = local_access.get(variable='ice_static')
@@ -96,117 +257,82 @@ def regrid_batch(dict_json:dict):
         ds_static_ice = None
         logging.warning("ice_static file not found")
 
-    # loop through all file in the original path
+    # group the files by the horizontal grid
+    grid_files = {}
     for file in allfile_list:
         filename = os.path.basename(file)
         # try to avoid the static file
-        if filename not in portal_data.StaticFile.filenames:
-            # open the file
-            with xr.open_dataset(file, chunks={}) as ds_var:
-                varname = ds_var.attrs['cefi_variable']
-
-                # create new filename based on original filename
-                filename = ds_var.attrs['cefi_filename']
-                filename_seg = filename.split('.')
-                grid_type_index = filename_seg.index('raw')
-                filename_seg[grid_type_index] = dict_json['output']['cefi_grid_type']
-                new_filename = '.'.join(filename_seg)
-
-                # find if new file name already exist
-                new_file = os.path.join(output_dir, new_filename)
-                if os.path.exists(new_file):
-                    logging.info("%s: already exists. skipping...", new_file)
-                else:
-                    # find the variable dimension info (for chunking)
-                    logging.info("processing %s", new_file)
-
-                    # get xname and yname (need expand if there are other grids)
-                    dims = list(ds_var.dims)
-                    if all(dim in dims for dim in ['xq', 'yh']):
-                        xname = 'geolon_u'
-                        yname = 'geolat_u'
-                        xdimorder = dims.index('xq')
-                        ydimorder = dims.index('yh')
-                        # stop regrid due to u grid need rotation first
-                        logging.info("Skipping file due to UGRID need rotation first")
-                        continue
-                    elif all(dim in dims for dim in ['xh', 'yh']):
-                        # currently only support tracer grid regridding
-                        xname = 'geolon'
-                        yname = 'geolat'
-                        xdimorder = dims.index('xh')
-                        ydimorder = dims.index('yh')
-                        # merge static field to include lon lat info
-                        ds_var = xr.merge([ds_var, ds_static], combine_attrs='override')
-                    elif all(dim in dims for dim in ['xh', 'yq']):
-                        xname = 'geolon_v'
-                        yname = 'geolat_v'
-                        xdimorder = dims.index('xh')
-                        ydimorder = dims.index('yq')
-                        # stop regrid due to v grid need rotation first
-                        logging.info("Skipping file due to VGRID need rotation first")
-                        continue
-                    elif all(dim in dims for dim in ['xT', 'yT']):
-                        if ds_static_ice is None:
-                            logging.warning("Skipping file due to ice static field not found")
-                            continue
-                        # ice month static field replace
-                        # currently only support ice tracer grid regridding
-                        xname = 'GEOLON'
-                        yname = 'GEOLAT'
-                        xdimorder = dims.index('xT')
-                        ydimorder = dims.index('yT')
-                        # merge static field to include lon lat info
-                        ds_var = xr.merge([ds_var, ds_static_ice], combine_attrs='override')
-                    else:
-                        try:
-                            raise ValueError("Unknown grid (need implementations)")
-                        except ValueError as e:
-                            logging.info("Skipping file due to error: %s",e)
-                            continue
-
-                    # call regridding class
-                    class_regrid = Regridding(ds_var, varname, xname, yname)
-                    nx = len(ds_var[dims[xdimorder]])
-                    ny = len(ds_var[dims[ydimorder]])
-                    # perform regridding
-                    ds_regrid = class_regrid.regrid_regular(nx, ny)
-                    # forecast/reforecast files has two varname in one single file
-                    try:
-                        class_regrid_anom = Regridding(ds_var, varname + '_anom', xname, yname)
-                        # perform regridding
-                        ds_regrid_anom = class_regrid_anom.regrid_regular(nx, ny)
-                        ds_regrid = xr.merge([ds_regrid, ds_regrid_anom])
-                    except KeyError:
-                        pass
-
-                    # copy the encoding and attributes
-                    ds_regrid = mom6_encode_attr(ds_var, ds_regrid, var_names=[varname])
-
-                    # redefine new global attribute
-                    # global attributes
-
-                    # create new cefi_rel_path based on original cefi_rel_path
-                    filepath = ds_var.attrs['cefi_rel_path']
-                    filepath_seg = filepath.split('/')
-
-                    # Change 'raw' to 'regrid'
-                    for i, element in enumerate(filepath_seg):
-                        if element == 'raw':
-                            filepath_seg[i] = dict_json['output']['cefi_grid_type']
-
-                    new_cefi_rel_path = '/'.join(filepath_seg)
-
-                    ds_regrid.attrs['cefi_rel_path'] = new_cefi_rel_path
-                    ds_regrid.attrs['cefi_filename'] = new_filename
-                    ds_regrid.attrs['cefi_grid_type'] = dict_json['output']['cefi_grid_type']
-
-                    # output the processed data
-                    output_processed_data(
-                        ds_regrid,
-                        top_dir=dict_json['local_top_dir'],
-                        dict_json_output=dict_json['output']
-                    )
+        if filename in portal_data.StaticFile.filenames:
+            continue
+        with xr.open_dataset(file, chunks={}) as ds_var:
+            new_filename = regrid_filename(
+                ds_var.attrs['cefi_filename'], dict_json['output']['cefi_grid_type']
+            )
+            grid_dims = find_grid(list(ds_var.dims))
+
+        # find if new file name already exist
+        new_file = os.path.join(output_dir, new_filename)
+        if os.path.exists(new_file):
+            logging.info("%s: already exists. skipping...", new_file)
+        elif grid_dims is None:
+            logging.info("Skipping file due to error: Unknown grid (need implementations)")
+        elif grid_dims in [('xq', 'yh'), ('xh', 'yq')]:
+            # stop regrid due to u v grid need rotation first
+            logging.info("Skipping %s due to %s grid need rotation first", file, grid_dims)
+        elif grid_dims == ('xT', 'yT') and ds_static_ice is None:
+            logging.warning("Skipping file due to ice static field not found")
+        else:
+            grid_files.setdefault(grid_dims, []).append((file, new_filename))
+
+    # one regridder per grid shared by all variables and files
+    max_workers = dict_json.get('max_workers', 4)
+    engine = dict_json.get('regrid_engine', 'xesmf')
+    method = dict_json.get('regrid_method', 'bilinear')
+    call_kwargs = regrid_call_kwargs(method, dict_json.get('regrid_na_thres', 1.0))
+    for grid_dims, files in grid_files.items():
+        xname, yname = GRID_COORDS[grid_dims]
+        if grid_dims == ('xT', 'yT'):
+            ds_grid_static = ds_static_ice
+        else:
+            ds_grid_static = ds_static
+        ds_grid = xr.Dataset(
+            coords={'lon': ds_grid_static[xname].variable, 'lat': ds_grid_static[yname].variable}
+        )
+        ds_regular = Regridding(ds_grid, None).regular_grid(
+            nx=ds_grid_static.sizes[grid_dims[0]],
+            ny=ds_grid_static.sizes[grid_dims[1]],
+            bounds=method in BOUNDS_METHODS
+        )
+        if method in BOUNDS_METHODS:
+            # cell bounds from the static corner coordinates
+            try:
+                ds_grid = add_corner_bounds(ds_grid, ds_corner=ds_grid_static)
+            except (KeyError, ValueError) as e:
+                logging.warning("Skipping %s grid due to error: %s", grid_dims, e)
+                continue
+            # land cells excluded from the conservative weights
+            mask = grid_mask(grid_dims, ds_grid_static, ds_static)
+            if mask is None:
+                logging.warning("%s grid mask not found, land cells are regridded", grid_dims)
+            else:
+                ds_grid['mask'] = mask
+        if engine == 'sparse':
+            regridder = get_sparse_regridder(
+                ds_grid, ds_regular, method, unmapped_to_nan=True
+            )
+        else:
+            regridder = get_regridder(ds_grid, ds_regular, method, unmapped_to_nan=True)
+        logging.info("regridding %d files on the %s grid", len(files), grid_dims)
+
+        # independent files processed concurrently
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [
+                executor.submit(
+                    regrid_file, file, new_filename, regridder, dict_json, call_kwargs
+                ) for file, new_filename in files
+            ]
+            for future in as_completed(futures):
+                future.result()
 
 def regrid_static(dict_json:dict):
     """perform the regridding for static file 
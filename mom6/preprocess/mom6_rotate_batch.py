@@ -62,22 +62,7 @@ def output_processed_data(
         if var not in dims and var not in coords:
             variables.append(var)
 
-    chunks = []
-    chunk_info = portal_data.FileChunking()
-    for dim in dims:
-        if isinstance(dim, str):
-            if 'z' in dim :
-                chunks.append(chunk_info.vertical)
-            elif 'time' in dim:
-                chunks.append(chunk_info.time)
-            elif 'lead' in dim:
-                chunks.append(chunk_info.lead)
-            elif 'member' in dim:
-                chunks.append(chunk_info.member)
-            elif 'init' in dim:
-                chunks.append(chunk_info.init)
-            else:
-                chunks.append(chunk_info.horizontal)
+    chunks = list(portal_data.FileChunking().dim_chunks(dims).values())
 
     for var in variables:
         if len(ds[var].dims) == len(chunks):
@@ -188,8 +173,8 @@ def rotate_batch(dict_json:dict)->tuple:
     )
 
     try:
-        ufile_list = local_access.get(variable=u_name)
-        vfile_list = local_access.get(variable=v_name)
+        local_access.get(variable=u_name)
+        local_access.get(variable=v_name)
     except FileNotFoundError as e:
         logging.error(
             "FileNotFoundError: %s\n"
@@ -197,43 +182,17 @@ def rotate_batch(dict_json:dict)->tuple:
             e
         )
         sys.exit(1)
-    statics = local_access.get(variable='ocean_static')
-    rotations = local_access.get(variable='ice_static')
-
-    ds_u = xr.open_mfdataset(
-        ufile_list,
-        combine='by_coords',
-        parallel=True
-    )
-
-    ds_v = xr.open_mfdataset(
-        vfile_list,
-        combine='by_coords',
-        parallel=True
-    )
-
-    # prepare static data
-    try:
-        ds_static = xr.open_dataset(statics[0]).drop_vars('time') # time dim not needed
-    except ValueError:
-        ds_static = xr.open_dataset(statics[0])
-
-    # prepare the rotation matrix to regular coord names
-
-    ds_rotate = xr.open_dataset(rotations[0])
-    ds_rotate = (ds_rotate
-        .rename({
-            'yT':'yh',
-            'xT':'xh',
-            'GEOLON':'geolon',
-            'GEOLAT':'geolat',
-            'COSROT':'cosrot',
-            'SINROT':'sinrot'
-        })
-        .set_coords(
-            ['geolon','geolat']
-        )
-    )
+    ds_u = local_access.open(u_name, merge_static=False)
+    ds_v = local_access.open(v_name, merge_static=False)
+
+    # static data and the rotation matrix with regular coord names
+    # (loaded once per process and shared)
+    static_grid = local_access.static_grid()
+    ds_static = static_grid.dataset
+    ds_rotate = static_grid.rotation
+    if ds_rotate is None:
+        logging.error("ice_static file with the rotation angle not found")
+        sys.exit(1)
 
 
     # merge static field to include lon lat info
@@ -97,8 +97,7 @@ def tercile_batch(dict_json:dict,logger_object)->xr.Dataset:
         # loop through all file in the original path
         for var in unique_var_list:
             # open the file
-            single_var_file_list = local_access.get(variable=var)
-            ds_var = xr.open_mfdataset(single_var_file_list,combine='nested',concat_dim='init',chunks={})
+            ds_var = local_access.open(var, merge_static=False)
             variable = ds_var.attrs['cefi_variable']
 
             # reforecast has two variables in one single file
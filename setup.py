@@ -24,6 +24,8 @@ setup(
         "gcsfs",
         "gsw",
         "kerchunk",
+        "aiohttp",
+        "scipy",
     ],
     long_description=open("README.md").read(),
     long_description_content_type="text/markdown",
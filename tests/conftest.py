@@ -8,7 +8,10 @@ To do pytest on the local machine
 `pytest --location local` (testing real index calculation)
 
 """
+import numpy as np
+import pandas as pd
 import pytest
+import xarray as xr
 
 # Pytest hook function to add command line options
 # This function is called before the test session starts
@@ -22,6 +25,15 @@ def pytest_ignore_collect(collection_path):
     """
     return "tests/deprecated" in str(collection_path)
 
+# Keep the on-disk caches (mom6_cache) of each test in a temporary directory
+@pytest.fixture(autouse=True)
+def isolated_cache_dir(tmp_path, monkeypatch):
+    """point the default cache directory to a per-test
+    temporary directory so the cached remote listing of
+    one test never leaks to another
+    """
+    monkeypatch.setenv('MOM6_CACHE_DIR', str(tmp_path / 'mom6_cache'))
+
 # Define the fixture that loads `location` from pytest command line arguments
 @pytest.fixture
 def location(request):
@@ -31,6 +43,19 @@ def location(request):
     return request.config.getoption("--location")
 
 
+@pytest.fixture
+def ds_forecast():
+    """monthly initialized ensemble forecast with land and missing values"""
+    init = pd.date_range('1993-01-01', '1998-12-01', freq='MS')
+    data = np.random.randn(len(init), 5, 3, 4, 3)
+    data[:, :, :, 0, 0] = np.nan
+    data[:10, 1, :, 1, 1] = np.nan
+    return xr.Dataset(
+        {'tos': (['init', 'member', 'lead', 'yh', 'xh'], data)},
+        coords={'init': init, 'lead': np.arange(3)}
+    ).chunk({'yh': 2})
+
+
 def pytest_collection_modifyitems(config, items):
     """avoid running tests with "localonly" markers when not on local machine
 
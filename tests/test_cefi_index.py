@@ -0,0 +1,102 @@
+"""
+Testing the module cefi_index
+"""
+import os
+import numpy as np
+import pandas as pd
+import pytest
+import xarray as xr
+from mom6.data_structure.cefi_index import CefiIndex
+from mom6.mom6_module import mom6_read as mr
+
+
+CEFI_ARGS = {
+    'region' : 'northwest_atlantic',
+    'subdomain' : 'full_domain',
+    'experiment_type' : 'hindcast',
+    'output_frequency' : 'monthly',
+    'grid_type' : 'raw',
+    'release' : 'r20230520'
+}
+
+
+def _write_hindcast(cefi_local_dir, variable, year):
+    ds = xr.Dataset(
+        {variable: (['time', 'yh', 'xh'], np.zeros((12, 2, 3), dtype='float32'))},
+        coords={'time': pd.date_range(f'{year}-01-15', periods=12, freq='MS')},
+        attrs={'cefi_variable': variable, 'title': 'test'}
+    )
+    filename = f'{variable}.nwa.full.hcast.monthly.raw.r20230520.{year}01-{year}12.nc'
+    ds.to_netcdf(cefi_local_dir / filename)
+    return cefi_local_dir / filename
+
+
+@pytest.fixture
+def local_tree(tmp_path):
+    """small local CEFI data structure"""
+    cefi_local_dir = tmp_path / (
+        'cefi_portal/northwest_atlantic/full_domain/hindcast/monthly/raw/r20230520'
+    )
+    cefi_local_dir.mkdir(parents=True)
+    for year in [1993, 1994]:
+        _write_hindcast(cefi_local_dir, 'tos', year)
+    _write_hindcast(cefi_local_dir, 'sos', 1993)
+    return tmp_path, cefi_local_dir
+
+
+class TestCefiIndex:
+    """Test the SQLite metadata index"""
+    def test_update_and_query(self, local_tree):
+        """test the header record, time query and incremental update"""
+        top_dir, cefi_local_dir = local_tree
+        with CefiIndex(str(top_dir), db_path=str(top_dir / 'index.sqlite')) as index:
+            assert index.update() == {'added': 3, 'updated': 0, 'removed': 0, 'unchanged': 0}
+
+            records = index.query(variable='tos', release='r20230520')
+            assert len(records) == 2
+            assert records[0]['region'] == 'northwest_atlantic'
+            assert records[0]['dims']['time'] == 12
+            assert records[0]['variables']['tos'] == ['time', 'yh', 'xh']
+            assert records[0]['attrs'] == {'cefi_variable': 'tos'}
+            assert records[0]['start_date'] == '1993-01-01'
+
+            assert index.distinct('variable') == ['sos', 'tos']
+            files = index.files(variable='tos', start='1994-03-01')
+            assert [os.path.basename(file) for file in files] == [
+                'tos.nwa.full.hcast.monthly.raw.r20230520.199401-199412.nc'
+            ]
+
+            # the end of the filename period is exclusive
+            files = index.files(variable='tos', start='1994-01-01')
+            assert files == mr.filter_files_by_time(
+                index.files(variable='tos'), start='1994-01-01'
+            )
+            assert [os.path.basename(file) for file in files] == [
+                'tos.nwa.full.hcast.monthly.raw.r20230520.199401-199412.nc'
+            ]
+            assert len(index.files(variable='tos', start='1993-12-31')) == 2
+            # month precision is normalized as in filter_files_by_time
+            assert index.files(variable='tos', start='1994-01') == files
+            assert index.files(variable='tos', start='1994-01') == mr.filter_files_by_time(
+                index.files(variable='tos'), start='1994-01'
+            )
+
+            # only the modified/new/removed files are processed
+            os.remove(cefi_local_dir / 'tos.nwa.full.hcast.monthly.raw.r20230520.199301-199312.nc')
+            _write_hindcast(cefi_local_dir, 'sos', 1994)
+            assert index.update() == {'added': 1, 'updated': 0, 'removed': 1, 'unchanged': 2}
+
+    def test_access_files_with_index(self, local_tree):
+        """test the local access lists the files from the index"""
+        top_dir, _ = local_tree
+        index = CefiIndex(str(top_dir), db_path=str(top_dir / 'index.sqlite'))
+        index.update()
+        local_access = mr.AccessFiles(
+            local_top_dir=str(top_dir), data_source='local', metadata_index=index, **CEFI_ARGS
+        )
+        assert local_access.get('tos') == mr.AccessFiles(
+            local_top_dir=str(top_dir), data_source='local', **CEFI_ARGS
+        ).get('tos')
+        with pytest.raises(FileNotFoundError):
+            local_access.get('thetao')
+        index.close()
@@ -0,0 +1,59 @@
+"""
+Testing the import time of the mom6 modules
+(heavy optional backends should only load on first use)
+"""
+import sys
+import json
+import subprocess
+import pytest
+from mom6.mom6_module.util import lazy_import, LazyModule
+
+MODULES = [
+    'mom6.mom6_module.mom6_read',
+    'mom6.mom6_module.mom6_regrid',
+    'mom6.mom6_module.mom6_vector_rotate',
+    'mom6.mom6_module.mom6_indexes',
+    'mom6.mom6_module.mom6_density'
+]
+LAZY_BACKENDS = [
+    'requests',
+    'fsspec',
+    'bs4',
+    'xesmf',
+    'ESMF',
+    'gsw',
+    'aiohttp',
+    'netCDF4',
+    'scipy.spatial',
+    'matplotlib'
+]
+# generous upper bound of the import time (s) to catch regressions
+MAX_IMPORT_TIME = 5.
+
+
+def test_import_time():
+    """test the backends are not imported and the import is fast"""
+    script = (
+        "import sys, json, time\n"
+        "start = time.perf_counter()\n"
+        f"for module in {MODULES!r}: __import__(module)\n"
+        "elapsed = time.perf_counter() - start\n"
+        f"loaded = [module for module in {LAZY_BACKENDS!r} if module in sys.modules]\n"
+        "print(json.dumps({'elapsed': elapsed, 'loaded': loaded}))\n"
+    )
+    result = subprocess.run(
+        [sys.executable, '-c', script], capture_output=True, text=True, check=True
+    )
+    output = json.loads(result.stdout.strip().splitlines()[-1])
+    assert output['loaded'] == []
+    assert output['elapsed'] < MAX_IMPORT_TIME
+
+
+def test_lazy_import():
+    """test the module is imported on first attribute access"""
+    assert lazy_import('json') is json
+    module = LazyModule('colorsys')
+    assert 'not loaded' in repr(module)
+    assert module.rgb_to_hsv(1., 0., 0.) == (0., 1., 1.)
+    with pytest.raises(ModuleNotFoundError):
+        LazyModule('not_a_module').anything
@@ -0,0 +1,210 @@
+"""
+Testing the module mom6_cache
+"""
+import os
+import time
+import pytest
+import requests
+import fsspec
+import numpy as np
+import pandas as pd
+import xarray as xr
+from unittest.mock import patch
+from mom6.mom6_module import mom6_read as mr
+from mom6.mom6_module.mom6_cache import CatalogCache, BlockCache, DerivedCache, source_files
+from mom6.mom6_module.mom6_statistics import HindcastClimatology
+from mom6.mom6_module.mom6_kerchunk import BlockCacheFileSystem
+
+
+@pytest.fixture
+def correct_arguments():
+    return {
+        'region' : 'northwest_atlantic',
+        'subdomain' : 'full_domain',
+        'experiment_type' : 'hindcast',
+        'output_frequency' : 'monthly',
+        'grid_type' : 'raw',
+        'release' : 'r20230520'
+    }
+
+CEFI_DIR = 'cefi_portal/northwest_atlantic/full_domain/hindcast/monthly/raw/r20230520'
+
+####### Test CatalogCache Class #######
+class TestCatalogCache:
+    """Test the CatalogCache class"""
+    def test_CatalogCache_set_get(self, tmp_path):
+        """test the cached listing is shared between instances"""
+        cache = CatalogCache(cache_dir=str(tmp_path))
+        assert cache.get('opendap', CEFI_DIR) is None
+
+        cache.set('opendap', CEFI_DIR, ['tos.nc', 'tob.nc'])
+        # a new instance (new process) read the same entry
+        assert CatalogCache(cache_dir=str(tmp_path)).get('opendap', CEFI_DIR) == ['tos.nc', 'tob.nc']
+        # store type is part of the key
+        assert cache.get('gcs', CEFI_DIR) is None
+
+    def test_CatalogCache_ttl(self, tmp_path):
+        """test the expired entry and the disabled cache"""
+        cache = CatalogCache(cache_dir=str(tmp_path), ttl=0.1)
+        cache.set('opendap', CEFI_DIR, ['tos.nc'])
+        time.sleep(0.2)
+        assert cache.get('opendap', CEFI_DIR) is None
+
+        cache_disabled = CatalogCache(cache_dir=str(tmp_path), ttl=0)
+        cache_disabled.set('opendap', CEFI_DIR, ['tos.nc'])
+        assert cache_disabled.get('opendap', CEFI_DIR) is None
+
+    def test_CatalogCache_evict(self, tmp_path):
+        """test the least recently used entries are evicted"""
+        cache = CatalogCache(cache_dir=str(tmp_path), max_entries=2)
+        cache.set('opendap', 'dir1', ['a.nc'])
+        cache.set('opendap', 'dir2', ['b.nc'])
+        # make dir1 older then use it so dir2 become the least recently used
+        for entry in os.listdir(cache.cache_dir):
+            os.utime(os.path.join(cache.cache_dir, entry), (0, 0))
+        assert cache.get('opendap', 'dir1') == ['a.nc']
+        cache.set('opendap', 'dir3', ['c.nc'])
+
+        assert cache.get('opendap', 'dir1') == ['a.nc']
+        assert cache.get('opendap', 'dir2') is None
+        assert cache.get('opendap', 'dir3') == ['c.nc']
+
+    def test_CatalogCache_invalidate(self, tmp_path):
+        """test the selective and full invalidation"""
+        cache = CatalogCache(cache_dir=str(tmp_path))
+        cache.set('opendap', 'dir1', ['a.nc'])
+        cache.set('gcs', 'dir1', ['a.json'])
+        cache.set('gcs', 'dir2', ['b.json'])
+
+        assert cache.invalidate(store_type='gcs', cefi_dir='dir1') == 1
+        assert cache.get('gcs', 'dir1') is None
+        assert cache.get('opendap', 'dir1') == ['a.nc']
+        assert cache.clear() == 2
+
+####### Test OpenDapStore with CatalogCache #######
+def test_OpenDapStore_cached_catalog(correct_arguments):
+    """test the OpenDapStore class use the cached listing without the server"""
+    CatalogCache().set('opendap', CEFI_DIR, ['tos.nwa.nc', 'tob.nwa.nc', 'catalog.xml'])
+
+    with patch("mom6.mom6_module.mom6_read.requests.get") as mock_get:
+        mock_get.side_effect = requests.exceptions.ConnectionError("Connection failed")
+        store = mr.OpenDapStore(**correct_arguments)
+        assert mock_get.call_count == 0
+        assert store.get_files(variable='tos') == [os.path.join(store.opendap_url, 'tos.nwa.nc')]
+        assert len(store.get_files()) == 2
+
+        # refresh must request the server again
+        with pytest.raises(ConnectionError):
+            store.refresh_catalog()
+        assert CatalogCache().get('opendap', CEFI_DIR) is None
+
+####### Test BlockCache Class #######
+class TestBlockCache:
+    """Test the BlockCache class and the file system reading through it"""
+    def test_BlockCache_set_get(self, tmp_path):
+        """test the block storage, integrity check and eviction"""
+        cache = BlockCache(cache_dir=str(tmp_path), max_bytes=250, block_size=100)
+        cache.set('gcs://bucket/a.nc', 0, b'a'*100)
+        assert cache.get('gcs://bucket/a.nc', 0) == b'a'*100
+        assert cache.get('gcs://bucket/a.nc', 1) is None
+
+        # corrupted block is dropped
+        with open(cache._block_file('gcs://bucket/a.nc', 0), 'wb') as f:
+            f.write(b'b'*100)
+        assert cache.get('gcs://bucket/a.nc', 0) is None
+        assert cache.total_bytes == 0
+
+        # least recently used block is evicted above max_bytes
+        for block in range(3):
+            cache.set('gcs://bucket/a.nc', block, b'a'*100)
+            os.utime(cache._block_file('gcs://bucket/a.nc', block), (block, block))
+        assert cache.get('gcs://bucket/a.nc', 0) is None
+        assert cache.total_bytes <= 250
+
+    def test_BlockCacheFileSystem(self, tmp_path):
+        """test the remote byte ranges are read once"""
+        memory_fs = fsspec.filesystem('memory')
+        memory_fs.pipe_file('/remote/a.nc', bytes(range(256))*10)
+        cache = BlockCache(cache_dir=str(tmp_path), block_size=64)
+        cached_fs = BlockCacheFileSystem(memory_fs, cache)
+
+        with patch.object(memory_fs, 'cat_ranges', wraps=memory_fs.cat_ranges) as mock_cat:
+            assert cached_fs.cat_file('/remote/a.nc', 10, 300) == (bytes(range(256))*10)[10:300]
+            assert mock_cat.call_count == 1
+            assert cached_fs.cat_file('/remote/a.nc', 20, 250) == (bytes(range(256))*10)[20:250]
+            # last short block of the file
+            assert cached_fs.cat_file('/remote/a.nc', 2500, 2600) == (bytes(range(256))*10)[2500:]
+            assert mock_cat.call_count == 2
+
+
+####### Test DerivedCache Class #######
+@pytest.fixture
+def hindcast_file(tmp_path):
+    """monthly hindcast file"""
+    file = tmp_path / 'tos.nc'
+    xr.Dataset(
+        {'tos': (['time', 'yh', 'xh'], np.random.rand(36, 3, 4))},
+        coords={'time': pd.date_range('1993-01-01', periods=36, freq='MS')}
+    ).to_netcdf(file)
+    return str(file)
+
+
+class TestDerivedCache:
+    """Test the DerivedCache class"""
+    def test_DerivedCache_set_get(self, tmp_path, hindcast_file):
+        """test the derived array round trip and the key"""
+        cache = DerivedCache(cache_dir=str(tmp_path))
+        with xr.open_dataset(hindcast_file, chunks={}) as ds:
+            key = cache.key('climatology', ds['tos'], source_files(ds), period=(1993, 1995))
+            assert cache.get(key) is None
+            da_climo = cache.set(key, ds['tos'].groupby('time.month').mean())
+            xr.testing.assert_identical(cache.get(key), da_climo)
+            assert cache.get(key).name == 'tos'
+
+            # parameters and data are part of the key
+            assert key != cache.key('climatology', ds['tos'], source_files(ds), period=(1993, 1994))
+            assert key != cache.key('climatology', ds['tos'].isel(xh=slice(0, 2)), source_files(ds))
+
+        # same file opened again gives the same key
+        with xr.open_dataset(hindcast_file, chunks={}) as ds:
+            assert key == cache.key('climatology', ds['tos'], source_files(ds), period=(1993, 1995))
+
+        # the dataset is stored as dataset
+        ds_coef = da_climo.to_dataset(name='coef')
+        cache.set('dataset', ds_coef)
+        xr.testing.assert_identical(cache.get('dataset'), ds_coef)
+
+    def test_DerivedCache_file_change(self, tmp_path, hindcast_file):
+        """test the modified input file does not reuse the entry"""
+        cache = DerivedCache(cache_dir=str(tmp_path))
+        da_data = xr.open_dataset(hindcast_file)['tos'].load()
+        key = cache.key('climatology', da_data, [hindcast_file])
+        os.utime(hindcast_file, (0, 0))
+        assert key != cache.key('climatology', da_data, [hindcast_file])
+
+    def test_DerivedCache_evict(self, tmp_path):
+        """test the least recently used entries are evicted above max_bytes"""
+        da_data = xr.DataArray(np.zeros(1000), dims='x')
+        cache = DerivedCache(cache_dir=str(tmp_path), max_bytes=10**9)
+        cache.set('a', da_data)
+        size = os.path.getsize(cache._entry_file('a'))
+        cache.max_bytes = int(2.5*size)
+        for key in ['b', 'c']:
+            os.utime(cache._entry_file('a'), (0, 0))
+            cache.set(key, da_data)
+        assert cache.get('a') is None
+        assert cache.get('c') is not None
+
+        # disabled cache
+        assert DerivedCache(cache_dir=str(tmp_path), max_bytes=0).get('c') is None
+
+    def test_HindcastClimatology_cached(self, tmp_path, hindcast_file):
+        """test the climatology is reused by a new instance"""
+        cache = DerivedCache(cache_dir=str(tmp_path))
+        with xr.open_dataset(hindcast_file, chunks={}) as ds:
+            da_climo = HindcastClimatology(ds, 'tos', derived_cache=cache).generate_climo(1993, 1995)
+            assert len(cache._all_entry_files()) == 1
+            with patch.object(xr.DataArray, 'groupby') as mock_groupby:
+                da_cached = HindcastClimatology(ds, 'tos', derived_cache=cache).generate_climo(1993, 1995)
+                mock_groupby.assert_not_called()
+        xr.testing.assert_identical(da_cached, da_climo)
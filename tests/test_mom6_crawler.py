@@ -0,0 +1,170 @@
+"""
+Testing the module mom6_crawler
+
+The THREDDS server is replaced by a local http server
+that serves the catalog.html of a small CEFI data structure
+"""
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import pytest
+from mom6.mom6_module import mom6_read as mr
+from mom6.mom6_module.mom6_cache import CatalogCache
+from mom6.mom6_module.mom6_crawler import CatalogCrawler
+
+CATALOG_PATH = '/thredds/catalog/Projects/CEFI/regional_mom6/'
+
+# small CEFI data structure served by the local http server
+CATALOG_TREE = {
+    'cefi_portal': {
+        'northwest_atlantic': {
+            'full_domain': {
+                'hindcast': {
+                    'monthly': {
+                        'raw': {
+                            'r20230520': [
+                                'tos.nwa.full.hcast.monthly.raw.r20230520.199301-201912.nc',
+                                'tob.nwa.full.hcast.monthly.raw.r20230520.199301-201912.nc',
+                                'ocean_static.nc'
+                            ],
+                            'latest': ['tos.nwa.full.hcast.monthly.raw.r20230520.199301-201912.nc']
+                        },
+                        'regrid': {
+                            'r20230520': [
+                                'tos.nwa.full.hcast.monthly.regrid.r20230520.199301-201912.nc'
+                            ]
+                        }
+                    }
+                },
+                'seasonal_reforecast': {
+                    'monthly': {
+                        'raw': {
+                            'r20240213': [
+                                'tos.nwa.full.ss_refcast.monthly.raw.r20240213.enss.i199303.nc'
+                            ]
+                        }
+                    }
+                }
+            }
+        },
+        'northeast_pacific': {
+            'full_domain': {
+                'hindcast': {
+                    'daily': {
+                        'raw': {
+                            'r20250509': ['tos.nep.full.hcast.daily.raw.r20250509.199301-199312.nc']
+                        }
+                    }
+                }
+            }
+        },
+        'not_a_region': {}
+    }
+}
+
+def catalog_html(items:list) -> str:
+    """mimic the THREDDS catalog.html"""
+    rows = ''.join(
+        f'<tr><td><a href="{item}"><code>{item}</code></a></td></tr>' for item in items
+    )
+    return f'<html><body><div class="content"><table>{rows}</table></div></body></html>'
+
+
+class CatalogHandler(BaseHTTPRequestHandler):
+    """serve the catalog.html of CATALOG_TREE"""
+    requested = []
+
+    def do_GET(self):
+        CatalogHandler.requested.append(self.path)
+        node = CATALOG_TREE
+        parts = self.path[len(CATALOG_PATH):].split('/')
+        if parts[-1] != 'catalog.html':
+            self.send_error(404)
+            return
+        for part in parts[:-1]:
+            if not isinstance(node, dict) or part not in node:
+                self.send_error(404)
+                return
+            node = node[part]
+        if isinstance(node, dict):
+            items = [f'{name}/' for name in node]
+        else:
+            items = node
+        body = catalog_html(items).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def catalog_server():
+    """local http server standing in for the THREDDS server"""
+    CatalogHandler.requested = []
+    server = ThreadingHTTPServer(('127.0.0.1', 0), CatalogHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{server.server_address[1]}/thredds/catalog/'
+    server.shutdown()
+    server.server_close()
+
+
+def test_CatalogCrawler_crawl(catalog_server):
+    """test the full inventory of the catalog tree"""
+    crawler = CatalogCrawler(catalog_head=catalog_server, max_concurrency=4)
+    inventory = crawler.crawl()
+
+    assert len(inventory) == 6
+    assert crawler.errors == []
+    # "latest" and directories outside the data structure are not crawled
+    assert all(record['release'] != 'latest' for record in inventory)
+    assert not any('not_a_region' in path for path in CatalogHandler.requested)
+
+    record = [r for r in inventory if r['variable'] == 'tob'][0]
+    assert record['region'] == 'northwest_atlantic'
+    assert record['grid_type'] == 'raw'
+    assert record['release'] == 'r20230520'
+    assert record['opendap_url'] == (
+        mr.OPENDAP_HEAD + 'Projects/CEFI/regional_mom6/'+
+        'cefi_portal/northwest_atlantic/full_domain/hindcast/monthly/raw/r20230520/'+
+        'tob.nwa.full.hcast.monthly.raw.r20230520.199301-201912.nc'
+    )
+
+def test_CatalogCrawler_filters(catalog_server):
+    """test the crawl limited to part of the tree"""
+    crawler = CatalogCrawler(
+        catalog_head=catalog_server,
+        region='northwest_atlantic',
+        experiment_type=('hindcast',),
+        grid_type='raw'
+    )
+    inventory = crawler.crawl()
+    assert sorted(record['variable'] for record in inventory) == ['ocean_static', 'tob', 'tos']
+
+    with pytest.raises(ValueError):
+        CatalogCrawler(catalog_head=catalog_server, region='northwest_atlantc')
+    with pytest.raises(ValueError):
+        CatalogCrawler(catalog_head=catalog_server, variable='tos')
+
+def test_CatalogCrawler_fill_cache(catalog_server):
+    """test the crawled release listing is reused by OpenDapStore"""
+    CatalogCrawler(catalog_head=catalog_server, region='northeast_pacific').crawl()
+    store = mr.OpenDapStore(
+        region='northeast_pacific',
+        subdomain='full_domain',
+        experiment_type='hindcast',
+        output_frequency='daily',
+        grid_type='raw',
+        release='r20250509'
+    )
+    assert len(store.get_files(variable='tos')) == 1
+    assert CatalogCache().get('opendap', store.cefi_rel_dir) is not None
+
+def test_CatalogCrawler_server_error():
+    """test unreachable server is reported instead of raised"""
+    crawler = CatalogCrawler(catalog_head='http://127.0.0.1:9/thredds/catalog/', timeout=5)
+    assert crawler.crawl() == []
+    assert len(crawler.errors) == 1
@@ -0,0 +1,65 @@
+"""
+Testing the module mom6_detrend
+"""
+import numpy as np
+import pandas as pd
+import pytest
+import xarray as xr
+from mom6.mom6_module.mom6_detrend import (
+    ForecastDetrend,
+    lstsq_polyfit,
+    lstsq_polyfit_kernel,
+    normal_equation_basis
+)
+
+
+@pytest.fixture
+def da_anom():
+    """reforecast anomaly with a trend, land and missing initializations"""
+    init = pd.date_range('1993-01-01', '2020-12-01', freq='MS')
+    data = (
+        np.random.randn(len(init), 4, 3, 4, 5)
+        + 0.01*np.arange(len(init))[:, None, None, None, None]
+    )
+    data[:, :, :, 0, 0] = np.nan
+    data[:50, :, 1, 1, 1] = np.nan
+    return xr.DataArray(
+        data,
+        dims=['init', 'member', 'lead', 'yh', 'xh'],
+        coords={'init': init, 'lead': np.arange(3)}
+    ).chunk({'yh': 2})
+
+
+@pytest.mark.parametrize('deg', [1, 2])
+def test_lstsq_polyfit(da_anom, deg):
+    """test the closed-form fit matches xarray polyfit"""
+    da_ensmean = da_anom.mean(dim='member')
+    ds_p = lstsq_polyfit(da_ensmean, 'init', deg)
+    ds_expected = da_ensmean.polyfit('init', deg, skipna=True)
+    xr.testing.assert_allclose(
+        xr.polyval(da_ensmean['init'], ds_p['polyfit_coefficients']).compute(),
+        xr.polyval(da_ensmean['init'], ds_expected['polyfit_coefficients']).compute()
+    )
+
+
+def test_lstsq_polyfit_few_samples():
+    """test the points with few valid samples (conditioning check)"""
+    x = np.arange(20.)
+    powers, transform = normal_equation_basis(x, 1)
+    values = np.tile(2.*x + 1., (3, 1))
+    values[1, 2:] = np.nan      # two samples, exact line
+    values[2, 1:] = np.nan      # one sample, not solvable
+    coef = lstsq_polyfit_kernel(values, powers, transform)
+    np.testing.assert_allclose(coef[:2], [[2., 1.], [2., 1.]])
+    assert np.isnan(coef[2]).all()
+
+
+def test_detrend_lazy(da_anom):
+    """test the detrended data is lazy and trend free"""
+    class_detrend = ForecastDetrend(da_anom)
+    da_detrend, _ = class_detrend.detrend_linear()
+    assert da_detrend.chunks is not None
+    ds_p = ForecastDetrend(da_detrend).polyfit_coef(deg=1)
+    np.testing.assert_allclose(
+        ds_p['polyfit_coefficients'].sel(degree=1).fillna(0.), 0., atol=1e-20
+    )
@@ -0,0 +1,126 @@
+"""
+Testing the module mom6_kerchunk
+"""
+import os
+import numpy as np
+import pandas as pd
+import xarray as xr
+import pytest
+from mom6.mom6_module import mom6_kerchunk
+from mom6.mom6_module.mom6_read import AccessFiles
+
+ARGS = {
+    'region' : 'northwest_atlantic',
+    'subdomain' : 'full_domain',
+    'experiment_type' : 'seasonal_reforecast',
+    'output_frequency' : 'monthly',
+    'grid_type' : 'raw',
+    'release' : 'r20250413'
+}
+CEFI_DIR = 'cefi_portal/northwest_atlantic/full_domain/seasonal_reforecast/monthly/raw/r20250413'
+INITS = ['1993-03-01', '1994-03-01', '1995-03-01']
+
+@pytest.fixture
+def local_reforecast(tmp_path):
+    """small reforecast files in the CEFI data structure
+    (one file per initialization)
+    """
+    cefi_local_dir = tmp_path / CEFI_DIR
+    cefi_local_dir.mkdir(parents=True)
+    ds_list = []
+    for ninit, init in enumerate(INITS):
+        data = np.arange(3*2*4*5, dtype='float32').reshape(3, 2, 4, 5) + ninit*100
+        ds = xr.Dataset(
+            {'tos': (['lead', 'member', 'yh', 'xh'], data)},
+            coords={
+                'lead': np.arange(3),
+                'member': np.arange(1, 3),
+                'yh': np.linspace(20., 23., 4),
+                'xh': np.linspace(-80., -76., 5),
+                'init': pd.Timestamp(init)
+            }
+        )
+        ds['init'].encoding['units'] = f'days since {init}'
+        filename = (
+            f'tos.nwa.full.ss_refcast.monthly.raw.r20250413.enss.i{init[:4]}{init[5:7]}.nc'
+        )
+        ds.to_netcdf(cefi_local_dir / filename)
+        ds_list.append(ds)
+    return str(tmp_path), xr.concat(ds_list, dim='init')
+
+
+def test_build_release_references(local_reforecast):
+    """test single and combined references are created"""
+    local_top_dir, _ = local_reforecast
+    references = mom6_kerchunk.build_release_references(local_top_dir, **ARGS)
+
+    assert len(references) == len(INITS) + 1
+    combined = [ref for ref in references if mom6_kerchunk.is_combined_reference(ref)]
+    assert [os.path.basename(ref) for ref in combined] == [
+        'tos.nwa.full.ss_refcast.monthly.raw.r20250413.enss.combined.json'
+    ]
+    # existing references are not regenerated
+    mtimes = [os.path.getmtime(ref) for ref in references]
+    mom6_kerchunk.build_release_references(local_top_dir, **ARGS)
+    assert mtimes == [os.path.getmtime(ref) for ref in references]
+
+
+def test_open_references(local_reforecast):
+    """test opening the combined reference and the single references"""
+    local_top_dir, ds_expected = local_reforecast
+    references = mom6_kerchunk.build_release_references(local_top_dir, **ARGS)
+
+    ds_combined = mom6_kerchunk.open_references(references)
+    single = [ref for ref in references if not mom6_kerchunk.is_combined_reference(ref)]
+    ds_single = mom6_kerchunk.open_references(single, concat_dim='init')
+
+    for ds in [ds_combined, ds_single]:
+        assert ds['tos'].chunks is not None
+        np.testing.assert_array_equal(ds['init'].values, ds_expected['init'].values)
+        np.testing.assert_array_equal(
+            ds['tos'].transpose('init', ...).values,
+            ds_expected['tos'].transpose('init', ...).values
+        )
+
+    with pytest.raises(ValueError):
+        mom6_kerchunk.open_references(single)
+
+
+def test_AccessFiles_open_references(local_reforecast):
+    """test the local AccessFiles use the generated references"""
+    local_top_dir, ds_expected = local_reforecast
+    local_access = AccessFiles(local_top_dir=local_top_dir, data_source='local', **ARGS)
+    with pytest.raises(FileNotFoundError):
+        local_access.open_references('tos')
+
+    mom6_kerchunk.build_release_references(local_top_dir, **ARGS)
+    ds = local_access.open_references('tos')
+    assert ds['tos'].sizes['init'] == len(INITS)
+    assert float(ds['tos'].sum()) == float(ds_expected['tos'].sum())
+    assert local_access.open('tos').encoding['source_files'] == local_access.get('tos')
+
+
+def test_stale_references(local_reforecast):
+    """test references older than the netcdf files are not used"""
+    local_top_dir, ds_expected = local_reforecast
+    mom6_kerchunk.build_release_references(local_top_dir, **ARGS)
+    local_access = AccessFiles(local_top_dir=local_top_dir, data_source='local', **ARGS)
+
+    # new initialization added after the references are built
+    ds_new = ds_expected.isel(init=[-1]).squeeze('init') + 100.
+    ds_new['init'] = pd.Timestamp('1996-03-01')
+    ds_new['init'].encoding['units'] = 'days since 1996-03-01'
+    ds_new.to_netcdf(
+        os.path.join(
+            local_top_dir, CEFI_DIR,
+            'tos.nwa.full.ss_refcast.monthly.raw.r20250413.enss.i199603.nc'
+        )
+    )
+    with pytest.raises(FileNotFoundError):
+        local_access.open_references('tos')
+
+    # rebuilt references cover the new file
+    mom6_kerchunk.build_release_references(local_top_dir, **ARGS)
+    ds = local_access.open_references('tos')
+    assert ds['tos'].sizes['init'] == len(INITS) + 1
+    assert float(ds['tos'].sum()) == float(ds_expected['tos'].sum() + ds_new['tos'].sum())
@@ -0,0 +1,81 @@
+"""
+Testing the module mom6_points
+"""
+import numpy as np
+import xarray as xr
+import pytest
+from mom6.mom6_module.mom6_subset import GridIndex
+from mom6.mom6_module.mom6_points import PointExtractor
+
+NY, NX = 30, 40
+
+@pytest.fixture
+def static_grid():
+    """small curvilinear (rotated) grid with land on the west edge"""
+    jj, ii = np.meshgrid(np.arange(NY), np.arange(NX), indexing='ij')
+    wet = np.ones((NY, NX))
+    wet[:, :3] = 0.
+    return xr.Dataset(
+        {
+            'geolon': (['yh', 'xh'], -80. + 0.25*ii + 0.05*jj),
+            'geolat': (['yh', 'xh'], 20. + 0.25*jj - 0.05*ii),
+            'wet': (['yh', 'xh'], wet)
+        },
+        coords={'xh': np.arange(NX)+0.5, 'yh': np.arange(NY)+0.5}
+    )
+
+def linear_field(ds_static, extra_dims=None):
+    """field linear in lon/lat (bilinear interpolation is exact)"""
+    field = 2.*ds_static['geolon'] + 3.*ds_static['geolat']
+    field = field.where(ds_static['wet'] > 0)
+    if extra_dims:
+        field = field.expand_dims(extra_dims)
+    return field.rename('tos')
+
+
+def test_PointExtractor_nearest(static_grid):
+    """test the nearest wet point extraction and the cache"""
+    grid_index = GridIndex(static_grid)
+    lon = static_grid['geolon'].values[[5, 10], [8, 20]]
+    lat = static_grid['geolat'].values[[5, 10], [8, 20]]
+    extractor = PointExtractor(grid_index, lon, lat)
+    da_station = extractor.extract(linear_field(static_grid))
+    np.testing.assert_allclose(da_station.values, 2.*lon + 3.*lat)
+
+    # station on land uses the nearest wet point
+    land = PointExtractor(grid_index, [static_grid['geolon'].values[5, 0]], [static_grid['geolat'].values[5, 0]])
+    assert land.i_index[0, 0] == 3
+    assert np.isfinite(land.extract(linear_field(static_grid)).values).all()
+
+    # station index is cached per grid
+    assert PointExtractor(grid_index, lon, lat).j_index is extractor.j_index
+
+
+def test_PointExtractor_bilinear(static_grid):
+    """test the bilinear extraction keeps the forecast dimensions"""
+    grid_index = GridIndex(static_grid)
+    rng = np.random.default_rng(0)
+    lon = rng.uniform(-78., -74., 50)
+    lat = rng.uniform(21., 25., 50)
+    extractor = PointExtractor(grid_index, lon, lat, method='bilinear', max_distance=50.)
+
+    da = linear_field(static_grid, {'init': 2, 'lead': 3, 'member': 4}).chunk({'init': 1})
+    da_station = extractor.extract(da)
+    assert da_station.dims == ('init', 'lead', 'member', 'station')
+    np.testing.assert_allclose(da_station.isel(init=0, lead=0, member=0).values, 2.*lon + 3.*lat)
+
+    # far away station returns NaN
+    far = PointExtractor(grid_index, [0.], [0.], method='bilinear', max_distance=50.)
+    assert np.isnan(far.extract(linear_field(static_grid)).values).all()
+
+    # weights renormalized over the corners with valid values
+    da_missing = linear_field(static_grid)
+    j_corner, i_corner = extractor.j_index[0, 0], extractor.i_index[0, 0]
+    da_missing[j_corner, i_corner] = np.nan
+    weights = extractor.weights[0].copy()
+    weights[0] = 0.
+    values = da_missing.values[extractor.j_index[0], extractor.i_index[0]]
+    np.testing.assert_allclose(
+        extractor.extract(da_missing).values[0],
+        np.nansum(values*weights)/weights.sum()
+    )
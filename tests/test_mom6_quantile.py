@@ -0,0 +1,133 @@
+"""
+Testing the module mom6_quantile
+"""
+import numpy as np
+import pandas as pd
+import pytest
+import xarray as xr
+from mom6.mom6_module import mom6_quantile
+from mom6.mom6_module.mom6_statistics import HistoricalQuantile, ForecastQuantile
+from mom6.mom6_module.mom6_forecast_tercile import Tercile
+
+
+@pytest.fixture
+def ds_daily():
+    """four years of daily data with land and missing values"""
+    time = pd.date_range('1993-01-01', '1996-12-31')
+    data = 15. + 3.*np.random.randn(len(time), 4, 5)
+    data[:, 0, 0] = np.nan
+    data[:100, 1, 1] = np.nan
+    return xr.Dataset(
+        {'tos': (['time', 'yh', 'xh'], data)},
+        coords={'time': time, 'geolon': (['yh', 'xh'], np.zeros((4, 5)))}
+    ).chunk({'time': 200})
+
+
+def loop_quantile(da_data, q, group, dim, sample_dims):
+    """reference quantile of each group from the where/drop loop"""
+    labels = np.unique(da_data[f'{dim}.{group}'])
+    result = xr.concat([
+        da_data
+        .where(da_data[f'{dim}.{group}'] == label, drop=True)
+        .stack(allens=[dim]+sample_dims)
+        .chunk({'allens': -1})
+        .quantile(q, dim='allens', method='linear', skipna=True)
+        for label in labels
+    ], dim=group)
+    result[group] = labels
+    return result.compute()
+
+
+@pytest.mark.parametrize('q', [0.9, [1./3., 2./3.]])
+def test_grouped_quantile(ds_forecast, q):
+    """test the vectorized kernel matches the per-group loop"""
+    da_quantile = mom6_quantile.grouped_quantile(
+        ds_forecast['tos'], q, 'month', dim='init', sample_dims=['member']
+    )
+    da_expected = loop_quantile(ds_forecast['tos'], q, 'month', 'init', ['member'])
+    xr.testing.assert_allclose(
+        da_quantile.compute(), da_expected.transpose(*da_quantile.dims)
+    )
+
+
+def test_forecast_quantile_tercile(ds_forecast):
+    """test the forecast quantile and tercile use the grouped quantile"""
+    da_threshold = ForecastQuantile(ds_forecast, 'tos').generate_quantile(1993, 1998, 90.)
+    xr.testing.assert_allclose(
+        da_threshold, loop_quantile(ds_forecast['tos'], 0.9, 'month', 'init', ['member'])
+    )
+    ds_tercile = Tercile(ds_forecast, 'tos').generate_tercile(1993, 1998)
+    assert (ds_tercile['f_lowmid'] <= ds_tercile['f_midhigh']).where(
+        ds_tercile['f_lowmid'].notnull(), True
+    ).all()
+    np.testing.assert_array_equal(ds_tercile['month'], np.arange(1, 13))
+
+
+@pytest.mark.parametrize('time_frequency', ['month', 'dayofyear'])
+def test_sketch_quantile(ds_daily, time_frequency):
+    """test the P-square estimate is close to the exact quantile"""
+    class_quantile = HistoricalQuantile(ds_daily, 'tos', time_frequency=time_frequency)
+    da_exact = class_quantile.generate_quantile(1993, 1996, 90.)
+    da_sketch = class_quantile.generate_quantile(1993, 1996, 90., method='sketch')
+
+    assert da_sketch.dims == da_exact.dims
+    np.testing.assert_array_equal(da_sketch[time_frequency], da_exact[time_frequency])
+    np.testing.assert_array_equal(np.isnan(da_sketch), np.isnan(da_exact))
+    error = np.abs(da_sketch - da_exact)
+    if time_frequency == 'dayofyear':
+        # less than five samples per group are exact
+        np.testing.assert_allclose(da_sketch, da_exact)
+    else:
+        assert float(error.mean()) < 0.1*float(ds_daily['tos'].std())
+    assert 'period_of_quantile' in da_sketch.attrs
+
+
+def test_p2_quantile_many_samples():
+    """test the P-square estimate converges for large groups"""
+    rng = np.random.default_rng(0)
+    values = rng.normal(size=(5000, 6))
+    values[:, 0] = np.nan
+    values[::2, 1] = np.nan
+    sketch = mom6_quantile.GroupedP2Quantile(0.9, ncell=6, ngroups=2)
+    groups = np.arange(5000) % 2
+    sketch.update(values[:2500], groups[:2500])
+    sketch.update(values[2500:], groups[2500:])
+    result = sketch.quantile()
+    assert sketch.heights.nbytes + sketch.positions.nbytes == 2*6*mom6_quantile.P2_STATE_BYTES
+
+    assert np.isnan(result[:, 0]).all()
+    assert np.isnan(result[0, 1])
+    for group in range(2):
+        expected = np.nanquantile(values[groups == group], 0.9, axis=0)
+        np.testing.assert_allclose(result[group, 2:], expected[2:], atol=0.1)
+    np.testing.assert_allclose(result[1, 1], expected[1], atol=0.1)
+
+
+def test_sketch_blocks(ds_daily):
+    """test the cell blocks give the same result as one block"""
+    da_one = mom6_quantile.sketch_grouped_quantile(ds_daily['tos'], 0.9, 'month')
+    da_blocks = mom6_quantile.sketch_grouped_quantile(
+        ds_daily['tos'], 0.9, 'month', slab_size=50, max_memory=1
+    )
+    xr.testing.assert_allclose(da_one, da_blocks)
+
+
+def test_windowed_dayofyear_quantile(ds_daily):
+    """test the circular window pools the days across the year boundary"""
+    da_data = ds_daily['tos']
+    da_threshold = HistoricalQuantile(
+        ds_daily, 'tos', time_frequency='dayofyear'
+    ).generate_quantile(1993, 1996, 90., window_half_width=5)
+    da_mean = mom6_quantile.windowed_dayofyear_mean(da_data, half_width=5).compute()
+
+    dayofyear = da_data['time.dayofyear'].values
+    for day in [1, 180, 366]:
+        distance = np.minimum((dayofyear - day) % 366, (day - dayofyear) % 366)
+        da_window = da_data.isel(time=distance <= 5)
+        xr.testing.assert_allclose(
+            da_threshold.sel(dayofyear=day, drop=True).drop_vars('quantile'),
+            da_window.quantile(0.9, dim='time').drop_vars('quantile').compute()
+        )
+        xr.testing.assert_allclose(
+            da_mean.sel(dayofyear=day, drop=True), da_window.mean(dim='time').compute()
+        )
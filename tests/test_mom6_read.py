@@ -297,3 +297,95 @@ class test_AccessFiles:
             mr.AccessFiles(**correct_arguments,data_source='local')
 
 
+
+
+@pytest.fixture
+def local_hindcast(tmp_path, correct_arguments):
+    """small hindcast files and static file in the CEFI data structure"""
+    import numpy as np
+    import pandas as pd
+    import xarray as xr
+
+    cefi_local_dir = tmp_path / (
+        'cefi_portal/northwest_atlantic/full_domain/hindcast/monthly/raw/r20230520'
+    )
+    cefi_local_dir.mkdir(parents=True)
+    coords = {'yh': np.linspace(20., 27., 8), 'xh': np.linspace(-80., -71., 10)}
+    for year in [1993, 1994]:
+        ds = xr.Dataset(
+            {'tos': (['time', 'yh', 'xh'], np.random.rand(12, 8, 10).astype('float32'))},
+            coords={'time': pd.date_range(f'{year}-01-15', periods=12, freq='MS'), **coords}
+        )
+        ds['tos'].encoding['chunksizes'] = (6, 4, 10)
+        ds.to_netcdf(cefi_local_dir / f'tos.nwa.full.hcast.monthly.raw.r20230520.{year}01-{year}12.nc')
+    ds_static = xr.Dataset(
+        {'deptho': (['yh', 'xh'], np.ones((8, 10))), 'time': 0.},
+        coords=coords
+    )
+    ds_static.to_netcdf(cefi_local_dir / 'ocean_static.nc')
+    return str(tmp_path)
+
+
+class TestAccessFilesOpen:
+    """Test the AccessFiles open method on local files"""
+    def test_AccessFiles_open(self, local_hindcast, correct_arguments):
+        """test the files are combined, merged with static and chunk aligned"""
+        local_access = mr.AccessFiles(
+            local_top_dir=local_hindcast, data_source='local', **correct_arguments
+        )
+        calls = []
+        get = local_access.get
+        local_access.get = lambda *args, **kwargs: calls.append(args) or get(*args, **kwargs)
+        ds = local_access.open('tos')
+        assert ds['tos'].sizes['time'] == 24
+        # the opened files are listed once
+        assert calls.count(('tos',)) == 1
+        assert ds.encoding['source_files'] == get('tos')
+        assert 'deptho' in ds and 'time' not in ds['deptho'].dims
+        # default chunks are multiples of the stored chunks
+        assert set(ds['tos'].chunks[0]) == {12}
+        assert ds['tos'].chunks[1] == (8,)
+
+        # merged static variables are writable copies of the shared static grid
+        ds['deptho'][0, 0] = 2.
+        assert float(local_access.static_grid().dataset['deptho'][0, 0]) == 1.
+
+        ds_nostatic = local_access.open('tos', merge_static=False, chunks={'time': 6})
+        assert 'deptho' not in ds_nostatic
+        assert set(ds_nostatic['tos'].chunks[0]) == {6}
+
+
+class TestTimeFilter:
+    """Test the time period filter based on the cefi filename"""
+    def test_filter_files_by_time(self):
+        """test the hindcast date range and forecast initialization filter"""
+        hindcast = [
+            f'tos.nwa.full.hcast.daily.raw.r20230520.{year}01-{year}12.nc'
+            for year in range(1993, 2023)
+        ] + ['ocean_static.nc']
+        files = mr.filter_files_by_time(hindcast, start='2000-06-15', end='2004-12-31')
+        assert files == hindcast[7:12] + ['ocean_static.nc']
+
+        forecast = [
+            f'tos.nwa.full.ss_refcast.monthly.raw.r20250413.enss.i{year}{month:02d}.json'
+            for year in range(1993, 1996) for month in [3, 6]
+        ] + ['tos.nwa.full.ss_refcast.monthly.raw.r20250413.enss.combined.json']
+        assert mr.filter_files_by_time(forecast, inits=['1994-06', 'i199503']) == [
+            forecast[3], forecast[4]
+        ]
+        assert len(mr.filter_files_by_time(forecast, start='1994-01-01')) == 4
+        # combined reference is only kept without the filter
+        assert mr.filter_files_by_time(forecast) == forecast
+
+        with pytest.raises(FileNotFoundError):
+            mr.filter_files_by_time(hindcast[:-1], start='2030-01-01')
+
+    def test_AccessFiles_time_filter(self, local_hindcast, correct_arguments):
+        """test the time filter on the local files"""
+        local_access = mr.AccessFiles(
+            local_top_dir=local_hindcast, data_source='local', **correct_arguments
+        )
+        assert len(local_access.get('tos')) == 2
+        assert len(local_access.get('tos', start='1994-02-01')) == 1
+        ds = local_access.open('tos', end='1993-12-31')
+        assert ds['tos'].sizes['time'] == 12
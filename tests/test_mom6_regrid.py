@@ -0,0 +1,279 @@
+"""
+Testing the module mom6_regrid
+"""
+import os
+import numpy as np
+import pytest
+import xarray as xr
+from mom6.mom6_module import mom6_regrid
+from mom6.mom6_module.mom6_regrid import (
+    Regridding,
+    add_corner_bounds,
+    center_bounds,
+    regrid_call_kwargs,
+    grid_fingerprint,
+    get_regridder,
+    get_sparse_regridder,
+    clear_regridders,
+    regrid_key,
+    weight_file_path
+)
+
+
+def grid(nx:int, ny:int, lon_min:float = 280.) -> xr.Dataset:
+    """regular lon lat grid"""
+    return xr.Dataset(
+        coords={
+            'lon': np.linspace(lon_min, lon_min + 10., nx),
+            'lat': np.linspace(20., 30., ny)
+        }
+    )
+
+
+def test_grid_fingerprint():
+    """test the fingerprint only depends on the grid values"""
+    ds_grid = grid(10, 8)
+    ds_data = ds_grid.assign(tos=(['lat', 'lon'], np.random.rand(8, 10))).chunk({'lat': 4})
+    assert grid_fingerprint(ds_grid) == grid_fingerprint(ds_data)
+    assert grid_fingerprint(ds_grid) != grid_fingerprint(grid(10, 8, lon_min=281.))
+    assert grid_fingerprint(ds_grid) != grid_fingerprint(
+        ds_grid.assign(mask=(['lat', 'lon'], np.ones((8, 10))))
+    )
+
+
+def test_get_regridder_reuse(tmp_path):
+    """test the weights are saved and reused"""
+    pytest.importorskip('xesmf')
+    clear_regridders()
+    ds_ori = grid(20, 15)
+    ds_ori['tos'] = (['lat', 'lon'], np.random.rand(15, 20))
+    ds_regrid = grid(10, 8)
+
+    regridder = get_regridder(ds_ori, ds_regrid, cache_dir=str(tmp_path), unmapped_to_nan=True)
+    assert get_regridder(ds_ori, ds_regrid, cache_dir=str(tmp_path), unmapped_to_nan=True) is regridder
+    weight_files = os.listdir(tmp_path / 'regrid_weights')
+    assert len(weight_files) == 1
+
+    # new process (no live regridder) reads the saved weights
+    clear_regridders()
+    regridder_file = get_regridder(ds_ori, ds_regrid, cache_dir=str(tmp_path), unmapped_to_nan=True)
+    assert regridder_file is not regridder
+    xr.testing.assert_allclose(regridder(ds_ori['tos']), regridder_file(ds_ori['tos']))
+    assert len(mom6_regrid._REGRIDDER_CACHE) == 1
+
+
+def test_sparse_regridder(tmp_path):
+    """test the saved weights are applied without ESMF"""
+    clear_regridders()
+    ds_ori = grid(8, 6)
+    ds_regrid = grid(4, 4)
+    data = np.random.rand(5, 2, 6, 8)
+    data[:, :, 0, 0] = np.nan
+    ds_ori['tos'] = (['time', 'z_l', 'lat', 'lon'], data)
+    ds_ori['sos'] = ds_ori['tos'] + 30.
+    ds_ori = ds_ori.chunk({'time': 2})
+
+    # 2x2 block average in the xesmf weight file format
+    # (destination row 3 without weight)
+    rows, cols = [], []
+    for j in range(3):
+        for i in range(4):
+            for dj in range(2):
+                for di in range(2):
+                    rows.append(j*4 + i + 1)
+                    cols.append((2*j + dj)*8 + 2*i + di + 1)
+    weight_file = weight_file_path(
+        regrid_key(ds_ori, ds_regrid, 'bilinear', unmapped_to_nan=True), str(tmp_path)
+    )
+    os.makedirs(os.path.dirname(weight_file))
+    xr.Dataset({
+        'S': ('n_s', np.full(len(rows), 0.25)),
+        'row': ('n_s', np.array(rows)),
+        'col': ('n_s', np.array(cols))
+    }).to_netcdf(weight_file)
+
+    regridder = get_sparse_regridder(
+        ds_ori, ds_regrid, cache_dir=str(tmp_path), unmapped_to_nan=True
+    )
+    ds_regridded = regridder(ds_ori, skipna=True)
+    assert ds_regridded['tos'].chunks[0] == (2, 2, 1)
+    assert ds_regridded['tos'].dims == ('time', 'z_l', 'lat', 'lon')
+
+    expected = np.full((5, 2, 4, 4), np.nan)
+    expected[:, :, :3, :] = np.nanmean(data.reshape(5, 2, 3, 2, 4, 2), axis=(3, 5))
+    np.testing.assert_allclose(ds_regridded['tos'], expected)
+    np.testing.assert_allclose(ds_regridded['sos'], expected + 30.)
+    np.testing.assert_allclose(ds_regridded['lon'], ds_regrid['lon'])
+
+    # missing values propagate without skipna
+    da_regridded = regridder(ds_ori['tos']).compute()
+    assert np.isnan(da_regridded[:, :, 0, 0]).all()
+    np.testing.assert_allclose(da_regridded[:, :, 1:3], expected[:, :, 1:3])
+
+
+def test_bilinear_keeps_land_nan():
+    """test the bilinear call keeps NaN next to the land"""
+    ds_ori = grid(8, 6)
+    ds_regrid = grid(4, 3)
+    data = np.random.rand(2, 6, 8)
+    data[:, :2, :3] = np.nan
+    da_data = xr.DataArray(data, dims=['time', 'lat', 'lon'])
+
+    # 2x2 corner weights of each destination point
+    rows, cols = [], []
+    for j in range(3):
+        for i in range(4):
+            for dj in range(2):
+                for di in range(2):
+                    rows.append(j*4 + i)
+                    cols.append((2*j + dj)*8 + 2*i + di)
+    weights = mom6_regrid.sparse.coo_matrix(
+        (np.full(len(rows), 0.25), (rows, cols)), shape=(12, 48)
+    )
+    regridder = mom6_regrid.SparseRegridder(weights, ds_ori, ds_regrid)
+
+    assert regrid_call_kwargs('bilinear') == {}
+    regridded = regridder(da_data, **regrid_call_kwargs('bilinear')).values
+    # land-adjacent points (any land corner) stay NaN
+    assert np.isnan(regridded[:, 0, :2]).all()
+    assert np.isfinite(regridded[:, 0, 2:]).all()
+    assert np.isfinite(regridded[:, 1:]).all()
+
+    # conservative methods skip the missing values
+    assert regrid_call_kwargs('conservative', 0.5) == {'skipna': True, 'na_thres': 0.5}
+    regridded = regridder(da_data, **regrid_call_kwargs('conservative')).values
+    assert np.isfinite(regridded[:, 0, 1]).all()
+
+
+def test_sparse_matches_xesmf(tmp_path):
+    """test the sparse regridder reproduces xesmf on the weights
+    written by xesmf (NaN entries of the unmapped points included)
+    """
+    xe = pytest.importorskip('xesmf')
+    clear_regridders()
+    ds_ori = grid(20, 15)
+    data = np.random.rand(4, 15, 20)
+    data[:, 3:5, 4:6] = np.nan
+    ds_ori['tos'] = (['time', 'lat', 'lon'], data)
+    # destination partly outside the source grid (unmapped points)
+    ds_regrid = grid(12, 10, lon_min=285.)
+
+    regridder = xe.Regridder(ds_ori, ds_regrid, 'bilinear', unmapped_to_nan=True)
+    weight_file = str(tmp_path / 'weights.nc')
+    regridder.to_netcdf(weight_file)
+    sparse_regridder = mom6_regrid.SparseRegridder.from_file(weight_file, ds_ori, ds_regrid)
+    assert sparse_regridder.unmapped.any()
+    for skipna in [False, True]:
+        np.testing.assert_allclose(
+            sparse_regridder(ds_ori['tos'], skipna=skipna).values,
+            regridder(ds_ori['tos'], skipna=skipna).values
+        )
+
+    # same default unmapped points as the sparse regridder
+    default_regridder = get_sparse_regridder(ds_ori, ds_regrid, cache_dir=str(tmp_path))
+    np.testing.assert_array_equal(default_regridder.unmapped, sparse_regridder.unmapped)
+
+
+@pytest.mark.filterwarnings('ignore:Mean of empty slice')
+def test_sparse_conservative_land(tmp_path):
+    """test the conservative weights of a masked grid skip the land cells"""
+    clear_regridders()
+    ds_ori = xr.Dataset(
+        coords={
+            'lon': np.arange(8.) + 0.5,
+            'lat': np.arange(6.) + 0.5,
+            'lon_b': np.arange(9.),
+            'lat_b': np.arange(7.)
+        }
+    )
+    ds_regrid = xr.Dataset(
+        coords={
+            'lon': np.arange(4.)*2. + 1.,
+            'lat': np.arange(3.)*2. + 1.,
+            'lon_b': np.arange(5.)*2.,
+            'lat_b': np.arange(4.)*2.
+        }
+    )
+    # land on the first destination cell and half of the second one
+    mask = np.ones((6, 8), dtype='int32')
+    mask[:2, :2] = 0
+    mask[:2, 2] = 0
+    ds_ori['mask'] = (['lat', 'lon'], mask)
+    data = np.random.rand(3, 6, 8)
+    data[:, mask == 0] = np.nan
+    ds_ori['tos'] = (['time', 'lat', 'lon'], data)
+
+    # conservative 2x2 block weights without the land cells
+    # (area fraction of the destination cell as written by ESMF)
+    rows, cols = [], []
+    for j in range(3):
+        for i in range(4):
+            for dj in range(2):
+                for di in range(2):
+                    if mask[2*j + dj, 2*i + di]:
+                        rows.append(j*4 + i + 1)
+                        cols.append((2*j + dj)*8 + 2*i + di + 1)
+    weight_file = weight_file_path(
+        regrid_key(ds_ori, ds_regrid, 'conservative', unmapped_to_nan=True), str(tmp_path)
+    )
+    os.makedirs(os.path.dirname(weight_file))
+    xr.Dataset({
+        'S': ('n_s', np.full(len(rows), 0.25)),
+        'row': ('n_s', np.array(rows)),
+        'col': ('n_s', np.array(cols))
+    }).to_netcdf(weight_file)
+    # the mask is part of the weight key
+    assert weight_file != weight_file_path(
+        regrid_key(ds_ori.drop_vars('mask'), ds_regrid, 'conservative', unmapped_to_nan=True),
+        str(tmp_path)
+    )
+
+    regridder = get_sparse_regridder(
+        ds_ori, ds_regrid, 'conservative', cache_dir=str(tmp_path), unmapped_to_nan=True
+    )
+    regridded = regridder(ds_ori['tos'], skipna=True).values
+    expected = np.nanmean(data.reshape(3, 3, 2, 4, 2), axis=(2, 4))
+    assert np.isnan(regridded[:, 0, 0]).all()
+    np.testing.assert_allclose(regridded[:, 0, 1:], expected[:, 0, 1:])
+    np.testing.assert_allclose(regridded[:, 1:], expected[:, 1:])
+    # the land does not spread into the coastal cell without skipna
+    # (partial ocean cover keeps the area fraction)
+    np.testing.assert_allclose(
+        regridder(ds_ori['tos']).values[:, 0, 1], expected[:, 0, 1]*0.5
+    )
+
+
+def test_corner_bounds():
+    """test the cell bounds from the static corner coordinates"""
+    lon_c, lat_c = np.meshgrid(np.arange(6.), np.arange(5.))
+    lon, lat = np.meshgrid(np.arange(5.) + 0.5, np.arange(4.) + 0.5)
+    ds_var = xr.Dataset(
+        {'tos': (['yh', 'xh'], np.random.rand(4, 5))},
+        coords={
+            'geolon': (['yh', 'xh'], lon),
+            'geolat': (['yh', 'xh'], lat),
+            'geolon_c': (['yq', 'xq'], lon_c),
+            'geolat_c': (['yq', 'xq'], lat_c)
+        }
+    )
+    class_regrid = Regridding(ds_var, 'tos', 'geolon', 'geolat')
+    ds_ori = class_regrid.source_grid('conservative')
+    np.testing.assert_array_equal(ds_ori['lon_b'], lon_c)
+    np.testing.assert_array_equal(ds_ori['lat_b'], lat_c)
+    assert 'lon_b' not in class_regrid.source_grid('patch').variables
+    assert grid_fingerprint(ds_ori) != grid_fingerprint(class_regrid.source_grid())
+
+    # non-symmetric corners
+    with pytest.raises(ValueError):
+        add_corner_bounds(ds_ori, ds_corner=ds_var.isel(xq=slice(1, None)))
+    with pytest.raises(KeyError):
+        Regridding(ds_var.drop_vars('geolon_c'), 'tos', 'geolon', 'geolat').source_grid(
+            'conservative_normed'
+        )
+
+    ds_regular = class_regrid.regular_grid(5, 4, bounds=True)
+    np.testing.assert_allclose(np.diff(ds_regular['lon_b']), np.diff(ds_regular['lon'])[0])
+    np.testing.assert_allclose(
+        center_bounds(ds_regular['lat'].values)[1:-1],
+        (ds_regular['lat'].values[1:] + ds_regular['lat'].values[:-1])/2.
+    )
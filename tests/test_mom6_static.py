@@ -0,0 +1,66 @@
+"""
+Testing the module mom6_static
+"""
+import numpy as np
+import pytest
+import xarray as xr
+from mom6.mom6_module import mom6_static
+from mom6.mom6_module import mom6_read as mr
+
+
+@pytest.fixture
+def local_static(tmp_path):
+    """ocean_static and ice_static files in the CEFI data structure"""
+    cefi_local_dir = tmp_path / (
+        'cefi_portal/northwest_atlantic/full_domain/hindcast/monthly/raw/r20230520'
+    )
+    cefi_local_dir.mkdir(parents=True)
+    lon, lat = np.meshgrid(np.linspace(-80., -71., 10), np.linspace(20., 27., 8))
+    xr.Dataset(
+        {
+            'geolon': (['yh', 'xh'], lon),
+            'geolat': (['yh', 'xh'], lat),
+            'wet': (['yh', 'xh'], np.ones((8, 10))),
+            'deptho': (['yh', 'xh'], np.ones((8, 10))),
+            'time': 0.
+        },
+        coords={'yh': np.arange(8.), 'xh': np.arange(10.)}
+    ).to_netcdf(cefi_local_dir / 'ocean_static.nc')
+    xr.Dataset(
+        {
+            'GEOLON': (['yT', 'xT'], lon),
+            'GEOLAT': (['yT', 'xT'], lat),
+            'COSROT': (['yT', 'xT'], np.ones((8, 10))),
+            'SINROT': (['yT', 'xT'], np.zeros((8, 10)))
+        },
+        coords={'yT': np.arange(8.), 'xT': np.arange(10.)}
+    ).to_netcdf(cefi_local_dir / 'ice_static.nc')
+    return str(tmp_path)
+
+
+def _access(local_top_dir):
+    return mr.AccessFiles(
+        region='northwest_atlantic',
+        subdomain='full_domain',
+        experiment_type='hindcast',
+        output_frequency='monthly',
+        grid_type='raw',
+        release='r20230520',
+        data_source='local',
+        local_top_dir=local_top_dir
+    )
+
+
+@pytest.mark.parametrize('mmap', [False, True])
+def test_static_grid(local_static, mmap):
+    """test the static grid is shared, read-only and includes the rotation"""
+    mom6_static.clear_static_grids()
+    static_grid = _access(local_static).static_grid(mmap=mmap)
+    assert static_grid is _access(local_static).static_grid()
+    assert 'time' not in static_grid.dataset
+    assert static_grid.cosrot.dims == ('yh', 'xh')
+    assert static_grid.lon_360.min() == 280.
+    assert static_grid.geolon.values.min() == -80.
+    with pytest.raises(ValueError):
+        static_grid.geolon.values[0, 0] = 0.
+    assert static_grid.grid_index is _access(local_static).grid_index()
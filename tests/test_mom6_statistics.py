@@ -0,0 +1,146 @@
+"""
+Testing the module mom6_statistics
+"""
+import os
+import numpy as np
+import pandas as pd
+import pytest
+import xarray as xr
+from mom6.mom6_module.mom6_detrend import ForecastDetrend
+from mom6.mom6_module.mom6_statistics import (
+    FusedStatistics,
+    ForecastClimatology,
+    ForecastQuantile,
+    HindcastClimatology,
+    ClimatologyStatistics,
+    CoordinateWrangle
+)
+
+
+def test_fused_statistics(ds_forecast):
+    """test the fused statistics match the separate calculations"""
+    ds_stats = FusedStatistics(
+        ds_forecast, 'tos', time_name='init', member_name='member'
+    ).generate_statistics(['mean', 'std', 'quantile', 'tercile', 'trend'], 1993, 1998)
+
+    da_climo = ForecastClimatology(ds_forecast, 'tos').generate_climo(1993, 1998, 'compute')
+    xr.testing.assert_allclose(ds_stats['tos_climo'], da_climo.transpose(*ds_stats['tos_climo'].dims))
+
+    da_threshold = ForecastQuantile(ds_forecast, 'tos').generate_quantile(1993, 1998, 90.)
+    np.testing.assert_allclose(
+        ds_stats['tos_threshold'].isel(quantile=0),
+        da_threshold.transpose(*ds_stats['tos_threshold'].isel(quantile=0).dims)
+    )
+
+    # std of the members around the climatology (with missing members)
+    da_anom = ds_forecast['tos'].groupby('init.month') - da_climo
+    assert ds_forecast['tos'].isel(yh=1, xh=1).isnull().any()
+    da_std = np.sqrt((da_anom**2).groupby('init.month').mean(dim=['init', 'member']))
+    np.testing.assert_allclose(ds_stats['tos_std'], da_std.transpose(*ds_stats['tos_std'].dims))
+
+    ds_p = ForecastDetrend(da_anom).polyfit_coef()
+    np.testing.assert_allclose(
+        ds_stats['polyfit_coefficients'],
+        ds_p['polyfit_coefficients'].transpose(*ds_stats['polyfit_coefficients'].dims),
+        rtol=1e-6
+    )
+    assert (ds_stats['f_lowmid'] <= ds_stats['f_midhigh']).where(
+        ds_stats['f_lowmid'].notnull(), True
+    ).all()
+
+
+@pytest.mark.parametrize('time_frequency', ['month', 'dayofyear'])
+def test_hindcast_update_climo(tmp_path, time_frequency):
+    """test the incremental climatology matches the full calculation"""
+    time = pd.date_range('1993-01-01', '1997-12-31')
+    data = np.random.rand(len(time), 3, 4)
+    data[:, 0, 0] = np.nan
+    ds_data = xr.Dataset({'tos': (['time', 'yh', 'xh'], data)}, coords={'time': time})
+    stats_file = str(tmp_path / 'tos_stats.nc')
+
+    # statistics of the first three years
+    HindcastClimatology(
+        ds_data.sel(time=slice('1993', '1995')), 'tos',
+        time_frequency=time_frequency
+    ).update_climo(stats_file, 1993, 1997)
+
+    # new years appended and the period slided
+    class_climo = HindcastClimatology(ds_data, 'tos', time_frequency=time_frequency)
+    da_expected = class_climo.generate_climo(1994, 1997, 'compute')
+
+    # the saved years are not read again
+    ds_changed = ds_data.copy(deep=True)
+    ds_changed['tos'].loc[{'time': slice('1993', '1995')}] = -1.
+    da_climo = HindcastClimatology(
+        ds_changed, 'tos', time_frequency=time_frequency
+    ).update_climo(stats_file, 1994, 1997)
+    xr.testing.assert_allclose(da_climo.transpose(*da_expected.dims), da_expected)
+
+    # modified years are recalculated when requested
+    da_climo = HindcastClimatology(
+        ds_changed, 'tos', time_frequency=time_frequency
+    ).update_climo(stats_file, 1994, 1997, recompute_years=[1994, 1995])
+    assert not np.allclose(da_climo.transpose(*da_expected.dims), da_expected, equal_nan=True)
+
+
+def test_statistics_std():
+    """test the merged standard deviation of data with a large offset"""
+    time = pd.date_range('1993-01-01', '1996-12-31')
+    data = 1.e8 + np.random.rand(len(time), 2, 3)
+    data[:40, 0, 0] = np.nan
+    da_data = xr.DataArray(data, dims=['time', 'yh', 'xh'], coords={'time': time})
+
+    stats = ClimatologyStatistics()
+    assert stats.update(da_data) == [1993, 1994, 1995, 1996]
+    da_expected = da_data.sel(time=slice('1994', '1996')).groupby('time.month')
+    xr.testing.assert_allclose(
+        stats.climatology(1994, 1996).transpose('month', ...), da_expected.mean('time')
+    )
+    xr.testing.assert_allclose(
+        stats.std(1994, 1996).transpose('month', ...), da_expected.std('time'), rtol=1.e-6
+    )
+
+
+def test_forecast_update_climo(tmp_path, ds_forecast):
+    """test the incremental forecast climatology matches the full calculation"""
+    class_climo = ForecastClimatology(ds_forecast, 'tos')
+    da_climo = class_climo.update_climo(str(tmp_path / 'tos_stats.nc'), 1993, 1998)
+    da_expected = class_climo.generate_climo(1993, 1998, 'compute')
+    xr.testing.assert_allclose(da_climo.transpose(*da_expected.dims), da_expected)
+
+    stats = ClimatologyStatistics.load(str(tmp_path / 'tos_stats.nc'), 'init')
+    assert stats.years == list(range(1993, 1999))
+    stats.remove_years([1993])
+    xr.testing.assert_allclose(
+        stats.climatology(1993, 1998).transpose(*da_expected.dims),
+        class_climo.generate_climo(1994, 1998, 'compute')
+    )
+
+
+@pytest.mark.parametrize('time_frequency', ['month', 'dayofyear'])
+def test_climo_lazy(tmp_path, monkeypatch, ds_forecast, time_frequency):
+    """test the climatology stays lazy and nothing is cached by default"""
+    monkeypatch.setenv('MOM6_CACHE_DIR', str(tmp_path))
+    ds_data = ds_forecast.isel(member=0, lead=0).rename({'init': 'time'})
+    da_climo = HindcastClimatology(
+        ds_data, 'tos', time_frequency=time_frequency
+    ).generate_climo(1993, 1998, 'lazy')
+    assert da_climo.chunks is not None
+    da_climo = ForecastClimatology(
+        ds_forecast, 'tos', time_frequency=time_frequency
+    ).generate_climo(1993, 1998, 'lazy')
+    assert da_climo.chunks is not None
+    assert not os.listdir(tmp_path)
+
+
+def test_coordinate_wrangle_no_copy():
+    """test the longitude change does not copy or modify the data"""
+    lon, lat = np.meshgrid(np.linspace(-80., 10., 5), np.linspace(20., 30., 3))
+    ds_data = xr.Dataset(
+        {'tos': (['yh', 'xh'], np.random.rand(3, 5))},
+        coords={'lon': (['yh', 'xh'], lon), 'lat': (['yh', 'xh'], lat)}
+    )
+    ds_360 = CoordinateWrangle(ds_data).to_360()
+    assert np.shares_memory(ds_360['tos'].values, ds_data['tos'].values)
+    np.testing.assert_array_equal(ds_data['lon'], lon)
+    np.testing.assert_array_equal(ds_360['lon'], np.where(lon < 0., lon + 360., lon))
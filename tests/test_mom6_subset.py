@@ -0,0 +1,115 @@
+"""
+Testing the module mom6_subset
+"""
+import numpy as np
+import pandas as pd
+import xarray as xr
+import pytest
+from mom6.mom6_module import mom6_subset
+from mom6.mom6_module.mom6_read import AccessFiles
+
+NY, NX = 30, 40
+
+def rotated_static() -> xr.Dataset:
+    """small curvilinear (rotated) grid with symmetric xq/yq"""
+    jj, ii = np.meshgrid(np.arange(NY), np.arange(NX), indexing='ij')
+    geolon = -80. + 0.25*ii + 0.05*jj
+    geolat = 20. + 0.25*jj - 0.05*ii
+    return xr.Dataset(
+        {
+            'geolon': (['yh', 'xh'], geolon),
+            'geolat': (['yh', 'xh'], geolat),
+            'deptho': (['yh', 'xh'], np.full((NY, NX), 100.)),
+            'geolon_c': (['yq', 'xq'], np.zeros((NY+1, NX+1)))
+        },
+        coords={
+            'xh': np.arange(NX)+0.5, 'yh': np.arange(NY)+0.5,
+            'xq': np.arange(NX+1), 'yq': np.arange(NY+1)
+        }
+    )
+
+
+class TestGridIndex:
+    """Test the GridIndex class"""
+    def test_bbox_slices(self):
+        """test the bbox slices cover exactly the points in the box"""
+        ds_static = rotated_static()
+        grid_index = mom6_subset.GridIndex(ds_static)
+        slices = grid_index.bbox_slices(-77., -74., 22., 24.)
+
+        inside = (
+            (ds_static.geolon >= -77.) & (ds_static.geolon <= -74.) &
+            (ds_static.geolat >= 22.) & (ds_static.geolat <= 24.)
+        ).values
+        jj, ii = np.nonzero(inside)
+        assert slices['yh'] == slice(jj.min(), jj.max()+1)
+        assert slices['xh'] == slice(ii.min(), ii.max()+1)
+        # symmetric grid include both faces
+        assert slices['xq'] == slice(ii.min(), ii.max()+2)
+
+        # 0~360 longitude gives the same slices
+        assert grid_index.bbox_slices(283., 286., 22., 24.) == slices
+
+        # box smaller than a grid cell gives the nearest point
+        tiny = grid_index.bbox_slices(-77.01, -77.005, 22.001, 22.002)
+        assert tiny['xh'].stop - tiny['xh'].start == 1
+
+    def test_polygon(self):
+        """test the polygon slices and mask"""
+        grid_index = mom6_subset.GridIndex(rotated_static())
+        polygon = [(-77., 22.), (-74., 22.), (-74., 24.), (-77., 24.)]
+        slices = grid_index.polygon_slices(polygon)
+        assert slices['xh'] == grid_index.bbox_slices(-77., -74., 22., 24.)['xh']
+
+        mask = grid_index.polygon_mask(polygon, slices)
+        assert mask.sizes['xh'] == slices['xh'].stop - slices['xh'].start
+        assert mask.any()
+
+    def test_depth_slice(self):
+        """test the depth slice"""
+        z_l = np.array([2.5, 10., 25., 50., 100., 200.])
+        assert mom6_subset.depth_slice(z_l, 0., 30.) == slice(0, 3)
+        assert mom6_subset.depth_slice(z_l, 60., 80.) == slice(3, 4)
+
+
+def test_AccessFiles_open_subset(tmp_path):
+    """test the subset in AccessFiles.open match the subset after reading"""
+    arguments = {
+        'region' : 'northwest_atlantic',
+        'subdomain' : 'full_domain',
+        'experiment_type' : 'hindcast',
+        'output_frequency' : 'monthly',
+        'grid_type' : 'raw',
+        'release' : 'r20230520'
+    }
+    cefi_local_dir = tmp_path / (
+        'cefi_portal/northwest_atlantic/full_domain/hindcast/monthly/raw/r20230520'
+    )
+    cefi_local_dir.mkdir(parents=True)
+    ds_static = rotated_static()
+    ds_static.to_netcdf(cefi_local_dir / 'ocean_static.nc')
+    z_l = np.array([2.5, 10., 25., 50.])
+    for year in [1993, 1994]:
+        ds = xr.Dataset(
+            {'thetao': (['time', 'z_l', 'yh', 'xh'], np.random.rand(12, 4, NY, NX))},
+            coords={
+                'time': pd.date_range(f'{year}-01-15', periods=12, freq='MS'),
+                'z_l': z_l, 'yh': ds_static.yh, 'xh': ds_static.xh
+            }
+        )
+        ds.to_netcdf(cefi_local_dir / f'thetao.nwa.full.hcast.monthly.raw.r20230520.{year}01-{year}12.nc')
+
+    local_access = AccessFiles(local_top_dir=str(tmp_path), data_source='local', **arguments)
+    ds_full = local_access.open('thetao')
+    ds_subset = local_access.open('thetao', bbox=(-77., -74., 22., 24.), z_range=(0., 20.))
+
+    assert ds_subset.sizes['z_l'] == 2
+    assert ds_subset.sizes['xq'] == ds_subset.sizes['xh'] + 1
+    slices = local_access.grid_index().bbox_slices(-77., -74., 22., 24.)
+    expected = ds_full['thetao'].isel(z_l=slice(0, 2), yh=slices['yh'], xh=slices['xh'])
+    np.testing.assert_array_equal(ds_subset['thetao'].values, expected.values)
+    # grid index is cached in the process
+    assert local_access.grid_index() is local_access.grid_index()
+
+    with pytest.raises(ValueError):
+        local_access.open('thetao', bbox=(-77., -74., 22., 24.), polygon=[(-77., 22.)])
@@ -0,0 +1,58 @@
+"""
+Testing the module time_series_processes
+"""
+import numpy as np
+import pandas as pd
+import pytest
+import xarray as xr
+from mom6.mom6_module import time_series_processes as tsp
+
+
+@pytest.fixture
+def da_daily():
+    """three years of daily data with land (all NaN) and missing values"""
+    data = np.random.rand(1200, 3, 4).astype('float32')
+    data[:, 0, 0] = np.nan
+    data[10:400, 1, 1] = np.nan
+    return xr.DataArray(
+        data,
+        dims=['time', 'yh', 'xh'],
+        coords={
+            'time': pd.date_range('1999-06-01', periods=1200),
+            'geolon': (['yh', 'xh'], np.zeros((3, 4)))
+        },
+        attrs={'units': 'degC'}
+    ).chunk({'time': 100})
+
+
+@pytest.mark.parametrize('slab_size', [1, 100, 365, 5000])
+def test_stream_daily_climo(da_daily, slab_size):
+    """test the streaming climatology matches the grouped mean"""
+    da_expected = da_daily.groupby('time.dayofyear').mean(dim='time').compute()
+    da_climo = tsp.stream_daily_climo(da_daily, slab_size=slab_size)
+    xr.testing.assert_allclose(da_climo, da_expected)
+    assert da_climo.dtype == da_expected.dtype
+    assert da_climo.attrs == da_daily.attrs
+
+
+def test_cal_daily_climo_slab(da_daily):
+    """test the smoothed climatology does not change when streamed"""
+    xr.testing.assert_allclose(
+        tsp.cal_daily_climo(da_daily, slab_size=365),
+        tsp.cal_daily_climo(da_daily)
+    )
+
+
+@pytest.mark.parametrize('apply_taper', [False, True])
+def test_smooth_daily_climo_lazy(da_daily, apply_taper):
+    """test the projection matches the fft smoothing and stays lazy"""
+    da_climo = da_daily.groupby('time.dayofyear').mean(dim='time')
+    da_smoothed = tsp.smooth_daily_climo(da_climo, nharm=4, apply_taper=apply_taper)
+    assert da_smoothed.chunks is not None
+
+    coeff = np.fft.rfft(da_climo.transpose(..., 'dayofyear').values)
+    coeff[..., 5:] = 0
+    if apply_taper:
+        coeff[..., 4:] /= 2
+    expected = np.fft.irfft(coeff, n=len(da_climo['dayofyear']))
+    np.testing.assert_allclose(da_smoothed.values, expected, rtol=1e-5, atol=1e-6)